@@ -0,0 +1,133 @@
+"""
+play_view の流量制御 (admission control)。
+
+処理中のリクエスト数と直近のレイテンシ (指数移動平均) を見て、負荷が上がるにつれて
+予測器を段階的に減らす (縮退レベルは game.ai.strategy.DEGRADE_* を参照)。
+処理中の数が上限を超えたときだけ 503 と Retry-After を返して受け付けを断る。
+縮退レベルはすべてのレスポンスのヘッダー (X-RPS-Degradation-Level) で確認できる。
+"""
+import functools
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.http import JsonResponse
+
+LEVEL_HEADER = "X-RPS-Degradation-Level"
+
+
+class AdmissionController:
+    def __init__(self, inflight_levels=(8, 16, 32), latency_levels=(0.5, 1.0, 2.0),
+                 max_inflight=64, retry_after=1, alpha=0.2):
+        """
+        Args:
+            inflight_levels (tuple): 縮退レベル 1, 2, 3 に入る処理中リクエスト数
+            latency_levels (tuple): 縮退レベル 1, 2, 3 に入るレイテンシの移動平均 (秒)
+            max_inflight (int): これ以上処理中なら 503 で断る
+            retry_after (int): 503 に付ける Retry-After (秒)
+            alpha (float): レイテンシの指数移動平均の重み
+        """
+        self.inflight_levels = tuple(inflight_levels)
+        self.latency_levels = tuple(latency_levels)
+        self.max_inflight = max_inflight
+        self.retry_after = retry_after
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.latency = 0.0
+        self.rejected = 0
+        self.levels = Counter()
+
+    def _level(self, in_flight):
+        level = sum(1 for limit in self.inflight_levels if in_flight >= limit)
+        latency_level = sum(1 for limit in self.latency_levels if self.latency >= limit)
+        return max(level, latency_level)
+
+    def enter(self):
+        """
+        リクエストの受け付けを試みる。受け付けたら縮退レベルを、断るなら None を返す。
+        受け付けたリクエストは終了時に必ず leave() を呼ぶこと。
+        """
+        with self._lock:
+            if self.in_flight >= self.max_inflight:
+                self.rejected += 1
+                return None
+            self.in_flight += 1
+            level = self._level(self.in_flight)
+            self.levels[level] += 1
+            return level
+
+    def leave(self, elapsed):
+        """処理の終了を記録し、レイテンシの移動平均を更新する"""
+        with self._lock:
+            self.in_flight -= 1
+            self.latency += self.alpha * (elapsed - self.latency)
+
+    def level(self):
+        """今リクエストが来たときの縮退レベル"""
+        with self._lock:
+            return self._level(self.in_flight + 1)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "latency_ewma": self.latency,
+                "level": self._level(self.in_flight + 1),
+                "rejected": self.rejected,
+                "admitted_by_level": dict(self.levels),
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    """プロセス内で共有する AdmissionController (初回呼び出し時に設定から作成)"""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(
+                inflight_levels=getattr(settings, "RPS_ADMISSION_INFLIGHT_LEVELS", (8, 16, 32)),
+                latency_levels=getattr(settings, "RPS_ADMISSION_LATENCY_LEVELS", (0.5, 1.0, 2.0)),
+                max_inflight=getattr(settings, "RPS_ADMISSION_MAX_INFLIGHT", 64),
+                retry_after=getattr(settings, "RPS_ADMISSION_RETRY_AFTER", 1),
+            )
+        return _controller
+
+
+def degradation_level(request):
+    """このリクエストに割り当てられた縮退レベル (admission_control を通っていなければ 0)"""
+    return getattr(request, "_rps_degradation_level", 0)
+
+
+def admission_control(view):
+    """ビューを流量制御の対象にするデコレーター"""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not getattr(settings, "RPS_ADMISSION_ENABLED", True):
+            return view(request, *args, **kwargs)
+
+        controller = get_controller()
+        level = controller.enter()
+        if level is None:
+            response = JsonResponse({"error": "Server overloaded"}, status=503)
+            response["Retry-After"] = str(controller.retry_after)
+            response[LEVEL_HEADER] = "reject"
+            return response
+
+        request._rps_degradation_level = level
+        started = time.monotonic()
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            controller.leave(time.monotonic() - started)
+        response[LEVEL_HEADER] = str(level)
+        return response
+    return wrapper
+
+
+def admission_metrics():
+    return _controller.metrics() if _controller is not None else None
@@ -0,0 +1,87 @@
+"""
+予測結果のプレイヤー間キャッシュ。
+
+短い履歴に対する決定的な予測器の結果は直近の手の並びだけで決まり、多くのプレイヤーが
+同じ並びを共有する。(予測器名, 予測器の memo_key) をキーに結果を LRU + TTL で保持し、
+同じ計算を辞書の参照で済ませる。値は predict_or_none の結果 (ランダムに決める場合は None)。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class PredictionCache:
+    def __init__(self, max_entries=100000, ttl=600):
+        """
+        Args:
+            max_entries (int): 保持する最大件数 (超えたら最も古く使われたものから捨てる)
+            ttl (float | None): 登録から捨てるまでの秒数 (None なら期限なし)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """(見つかったか, 値) を返す"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache(max_entries=100000, ttl=600):
+    """プロセス内で共有するキャッシュ (初回呼び出し時に作成)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PredictionCache(max_entries=max_entries, ttl=ttl)
+        return _cache
+
+
+def prediction_cache_metrics():
+    return _cache.metrics() if _cache is not None else None
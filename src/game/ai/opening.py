@@ -0,0 +1,77 @@
+import functools
+
+import numpy as np
+
+MOVES = ["R", "P", "S"]
+MOVE_TO_IDX = {"R": 0, "P": 1, "S": 2}
+BEATS_IDX = [1, 2, 0]  # R -> P, P -> S, S -> R
+
+
+class OpeningBook:
+    """
+    序盤定跡: 最初の depth 手未満のプレイヤーについて、これまでの手順から直接AIの手を引く表。
+
+    手順の長さ L ごとに 3^L 通りの枠を持ち、1次元配列に長さの短い順で並べる。
+    値はAIの手のインデックス (0: R, 1: P, 2: S)、データ不足の枠は -1。
+    """
+    def __init__(self, depth, table):
+        self.depth = depth
+        self.table = table
+        self.offsets = [(3 ** length - 1) // 2 for length in range(depth + 1)]
+
+    @staticmethod
+    def size(depth):
+        return (3 ** depth - 1) // 2
+
+    def index(self, moves):
+        """手順 (手のインデックス列) の配列上の位置"""
+        code = 0
+        for move in moves:
+            code = code * 3 + move
+        return self.offsets[len(moves)] + code
+
+    def lookup(self, history):
+        """履歴が depth 手未満で、表に手があればAIの手を返す (なければ None)"""
+        if len(history) >= self.depth:
+            return None
+        moves = []
+        for h in history:
+            move = MOVE_TO_IDX.get(h.get("user_move"))
+            if move is None:
+                return None
+            moves.append(move)
+        value = self.table[self.index(moves)]
+        return MOVES[value] if value >= 0 else None
+
+    @classmethod
+    def build(cls, sequences, depth, min_count=20):
+        """
+        プレイヤーごとの序盤の手順から表を作る。
+        各手順の次に最も多く出された手に勝つ手を登録する (min_count 回未満の手順は登録しない)。
+        """
+        book = cls(depth, np.full(cls.size(depth), -1, dtype=np.int8))
+        counts = np.zeros((cls.size(depth), 3), dtype=np.int64)
+        for sequence in sequences:
+            moves = [MOVE_TO_IDX[m] for m in sequence[:depth] if m in MOVE_TO_IDX]
+            for length in range(len(moves)):
+                counts[book.index(moves[:length]), moves[length]] += 1
+
+        enough = counts.sum(axis=1) >= min_count
+        predicted = counts.argmax(axis=1)
+        book.table[enough] = np.array(BEATS_IDX, dtype=np.int8)[predicted[enough]]
+        return book
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, depth=np.array([self.depth]), table=self.table)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(int(data["depth"][0]), data["table"].copy())
+
+
+@functools.lru_cache(maxsize=4)
+def load_opening_book(path):
+    """定跡ファイルを読み込む (プロセス内でキャッシュする)"""
+    return OpeningBook.load(path)
@@ -0,0 +1,125 @@
+"""
+全プレイヤー共通の n-gram 出現回数の索引。
+
+長さ 0 から order までの手順 (手のインデックス列) ごとの出現回数を、長さの短い順に
+3^L 通りずつ並べた1次元の NumPy 配列で持つ (位置の計算は OpeningBook と同じ)。
+長さ 0 の枠は全体の手数になる。
+
+ファイルは .npy 形式で保存し、各ワーカーはメモリマップ (r+) で開く。
+同じファイルを開いたワーカー同士はページキャッシュを共有するので、ラウンドの保存時に
+どのワーカーが加算しても他のワーカーからすぐに見える。
+加算はプロセス内ではロックするが、プロセス間では排他しない (まれに数え漏れが起きても構わない集計)。
+"""
+import functools
+import os
+import threading
+
+import numpy as np
+
+MOVE_TO_IDX = {"R": 0, "P": 1, "S": 2}
+
+
+class NgramIndex:
+    def __init__(self, counts):
+        """
+        Args:
+            counts (np.ndarray): 長さ (3^(order+1) - 1) / 2 の1次元配列 (メモリマップでもよい)
+        """
+        self.counts = counts
+        self.order = self.order_for(len(counts))
+        self.offsets = [(3 ** length - 1) // 2 for length in range(self.order + 2)]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def size(order):
+        return (3 ** (order + 1) - 1) // 2
+
+    @classmethod
+    def order_for(cls, size):
+        order = 0
+        while cls.size(order) < size:
+            order += 1
+        if cls.size(order) != size:
+            raise ValueError(f"Invalid n-gram index size: {size}")
+        return order
+
+    @classmethod
+    def empty(cls, order):
+        return cls(np.zeros(cls.size(order), dtype=np.int64))
+
+    @staticmethod
+    def encode(moves):
+        """手の並び ("R", "P", "S") を手のインデックス列にする (不明な手は除く)"""
+        return [MOVE_TO_IDX[m] for m in moves if m in MOVE_TO_IDX]
+
+    def _code(self, moves):
+        code = 0
+        for move in moves:
+            code = code * 3 + move
+        return code
+
+    def add(self, moves):
+        """
+        手の並びの最後の1手を数える (最後の手で終わる長さ 1 から order の n-gram すべてに加算する)。
+        moves は直前 order - 1 手と今回の手 (手のインデックス列)。
+        """
+        moves = moves[-self.order:]
+        positions = [0]
+        code = 0
+        for length in range(1, len(moves) + 1):
+            code += moves[-length] * 3 ** (length - 1)
+            positions.append(self.offsets[length] + code)
+        with self._lock:
+            self.counts[positions] += 1
+
+    def add_sequence(self, moves):
+        """1人分の手の並び全体をまとめて数える (索引の構築用)"""
+        moves = np.asarray(moves, dtype=np.int64)
+        if not len(moves):
+            return
+        with self._lock:
+            self.counts[0] += len(moves)
+            codes = moves
+            for length in range(1, min(self.order, len(moves)) + 1):
+                if length > 1:
+                    codes = codes[:-1] * 3 + moves[length - 1:]
+                start, end = self.offsets[length], self.offsets[length + 1]
+                self.counts[start:end] += np.bincount(codes, minlength=end - start)
+
+    def next_counts(self, context, min_count=1):
+        """
+        context (手のインデックス列) の次に出た手の回数 [R, P, S] を返す。
+        回数の合計が min_count に満たなければ、文脈を短くして探し直す (なければ None)。
+        """
+        context = context[-(self.order - 1):] if self.order > 1 else []
+        for length in range(len(context), -1, -1):
+            start = self.offsets[length + 1] + self._code(context[len(context) - length:]) * 3
+            counts = self.counts[start:start + 3]
+            if counts.sum() >= min_count:
+                return counts
+        return None
+
+    def save(self, path):
+        """原子的に書き出す (一時ファイルに書いてから置き換える)"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.asarray(self.counts, dtype=np.int64))
+        os.replace(tmp, path)
+
+    def flush(self):
+        if isinstance(self.counts, np.memmap):
+            self.counts.flush()
+
+    @classmethod
+    def open(cls, path, order=6):
+        """索引ファイルをメモリマップで開く。なければ空の索引を作る"""
+        if not os.path.exists(path):
+            cls.empty(order).save(path)
+        return cls(np.load(path, mmap_mode="r+"))
+
+
+@functools.lru_cache(maxsize=4)
+def load_population_index(path, order=6):
+    """索引ファイルを開く (プロセス内でキャッシュする)"""
+    return NgramIndex.open(path, order=order)
+
@@ -1,3 +1,5 @@
+import copy
+import io
 import random
 from abc import ABC, abstractmethod
 from collections import Counter, defaultdict
@@ -6,6 +8,7 @@ import torch.nn as nn
 import torch.optim as optim
 import numpy as np
 from .models import RPSLSTM
+from .population import NgramIndex
 
 class BasePredictor(ABC):
     """すべての予測器の基底クラス"""
@@ -22,19 +25,82 @@ class BasePredictor(ABC):
         """
         pass
 
+    def seed(self, summary) -> None:
+        """
+        圧縮済み履歴のサマリー (PlayerSummary) から事前知識を取り込む。
+        サマリーを活用できない予測器は何もしない。
+        """
+        pass
+
+    def memo_key(self, history: list):
+        """
+        予測結果をプレイヤー間で共有できる場合、その入力を表すキーを返す (共有できなければ None)。
+        同じキーなら同じ予測になることを保証できる予測器だけが実装する。
+        """
+        return None
+
+# 全履歴を見る予測器の結果を共有キャッシュに載せる履歴の最大長
+MEMO_MAX_HISTORY = 12
+
+class MemoizablePredictor(BasePredictor):
+    """
+    決定的な予測 (predict_or_none) と、予測できないときのランダムな手を分けた予測器。
+    predict_or_none の結果はキャッシュでき、キャッシュから引いた結果も or_random で仕上げる。
+    """
+    def predict(self, history: list) -> str:
+        return self.or_random(self.predict_or_none(history))
+
+    @abstractmethod
+    def predict_or_none(self, history: list):
+        """決定的に予測できれば手を、できなければ (ランダムに決める場合は) None を返す"""
+        pass
+
+    @staticmethod
+    def or_random(move):
+        return move if move is not None else random.choice(["R", "P", "S"])
+
+    def _history_key(self, history):
+        """履歴全体を文字列にしたキー (短い履歴のみ)"""
+        if len(history) > MEMO_MAX_HISTORY:
+            return None
+        moves = [h.get("user_move") for h in history]
+        if not all(moves):
+            return None
+        return "".join(moves)
+
 class RandomPredictor(BasePredictor):
     """ランダムに予測する (ベースライン)"""
     def predict(self, history: list) -> str:
         return random.choice(["R", "P", "S"])
 
-class MarkovPredictor(BasePredictor):
+class MarkovPredictor(MemoizablePredictor):
     """1次マルコフ連鎖: 直前の手から次の手の遷移確率を利用"""
-    def predict(self, history: list) -> str:
-        if len(history) < 2:
-            return random.choice(["R", "P", "S"])
+    def __init__(self):
+        # 圧縮済み履歴から引き継いだ遷移回数 {"RP": n, ...} と、その最後の手
+        self.prior_transitions = {}
+        self.prior_last_move = ""
+
+    def seed(self, summary) -> None:
+        self.prior_transitions = dict(summary.transition_counts)
+        self.prior_last_move = summary.last_user_move
+
+    def memo_key(self, history: list):
+        # 圧縮済み履歴を引き継いでいる場合は、履歴だけでは予測が決まらない
+        if self.prior_transitions:
+            return None
+        return self._history_key(history)
+
+    def predict_or_none(self, history: list):
+        if len(history) < 2 and not self.prior_transitions:
+            return None
         
         # 遷移データの構築
         transitions = defaultdict(lambda: defaultdict(int))
+        for pair, count in self.prior_transitions.items():
+            transitions[pair[0]][pair[1]] += count
+        # 圧縮済み部分と現在の履歴の境界の遷移
+        if self.prior_last_move and history and history[0].get("user_move"):
+            transitions[self.prior_last_move][history[0]["user_move"]] += 1
         
         for i in range(len(history) - 1):
             current_move = history[i].get("user_move")
@@ -43,39 +109,59 @@ class MarkovPredictor(BasePredictor):
                 transitions[current_move][next_move] += 1
         
         # 直前のユーザーの手
-        last_user_move = history[-1].get("user_move")
+        last_user_move = history[-1].get("user_move") if history else self.prior_last_move
         if not last_user_move or last_user_move not in transitions:
-            return random.choice(["R", "P", "S"])
+            return None
         
         candidates = transitions[last_user_move]
         if not candidates:
-             return random.choice(["R", "P", "S"])
+             return None
              
         predicted_move = max(candidates, key=candidates.get)
         return predicted_move
 
-class FrequencyPredictor(BasePredictor):
+class FrequencyPredictor(MemoizablePredictor):
     """頻度分析: 過去に最も多く出した手を予測"""
-    def predict(self, history: list) -> str:
-        if not history:
-             return random.choice(["R", "P", "S"])
-        
+    def __init__(self):
+        # 圧縮済み履歴から引き継いだ手ごとの回数
+        self.prior_counts = Counter()
+
+    def seed(self, summary) -> None:
+        self.prior_counts = Counter(summary.move_counts)
+
+    def memo_key(self, history: list):
+        if self.prior_counts:
+            return None
+        return self._history_key(history)
+
+    def predict_or_none(self, history: list):
         moves = [h.get("user_move") for h in history if h.get("user_move")]
-        if not moves:
-             return random.choice(["R", "P", "S"])
+        if not moves and not self.prior_counts:
+             return None
              
-        count = Counter(moves)
+        count = Counter(moves) + self.prior_counts
         return count.most_common(1)[0][0]
 
-class PatternMatcherPredictor(BasePredictor):
+class PatternMatcherPredictor(MemoizablePredictor):
     """パターンマッチング: 過去の履歴から最長一致するシーケンスを探し、その続きを予測"""
-    def predict(self, history: list) -> str:
+    def __init__(self, max_length=10):
+        """
+        Args:
+            max_length (int): 探すパターンの最大長
+        """
+        self.max_length = max_length
+
+    def memo_key(self, history: list):
+        key = self._history_key(history)
+        return None if key is None else (self.max_length, key)
+
+    def predict_or_none(self, history: list):
         moves = "".join([h.get("user_move", "") for h in history if h.get("user_move")])
         n = len(moves)
         if n < 4: 
-             return random.choice(["R", "P", "S"])
+             return None
         
-        for k in range(min(10, n - 1), 1, -1):
+        for k in range(min(self.max_length, n - 1), 1, -1):
             pattern = moves[-k:]
             search_text = moves[:-1] 
             idx = search_text.rfind(pattern)
@@ -85,14 +171,244 @@ class PatternMatcherPredictor(BasePredictor):
                     next_move = search_text[idx + k]
                     return next_move
                 
-        return random.choice(["R", "P", "S"])
+        return None
+
+class ContextTreePredictor(BasePredictor):
+    """
+    可変長文脈木 (PPM風): 直近 max_depth 手までの各次数の文脈で次の手を数え、
+    高次の文脈から順に混合して予測する。
+
+    木は配列で保持する (ノード番号で children / parent / counts を引く)。
+    1ラウンドあたりの更新・予測は O(max_depth)。ノード数が max_nodes に達すると
+    全体の回数を半減させ、回数が 0 になった部分木を取り除いてメモリを一定に保つ。
+    """
+    MOVES = ["R", "P", "S"]
+    MOVE_TO_IDX = {"R": 0, "P": 1, "S": 2}
+
+    def __init__(self, max_depth=6, max_nodes=4096, checkpoint=None):
+        """
+        Args:
+            max_depth (int): 文脈の最大長
+            max_nodes (int): ノード数の上限 (文脈1本分の max_depth + 1 以上)
+            checkpoint (bytes | None): 以前に dumps() で保存した状態。ウォームアップの後の本番の予測で
+                                       全履歴から作り直す代わりに、ここから差分だけを取り込む
+        """
+        if max_nodes < max_depth + 1:
+            raise ValueError(f"max_nodes ({max_nodes}) must be at least max_depth + 1 ({max_depth + 1})")
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.checkpoint = checkpoint
+        self._clear()
+
+    def _clear(self):
+        cap = self.max_nodes
+        self.children = np.full((cap, 3), -1, dtype=np.int32)  # 文脈を1手遡った子ノード
+        self.parent = np.full(cap, -1, dtype=np.int32)
+        self.counts = np.zeros((cap, 3), dtype=np.int32)      # この文脈の次に出た手の回数
+        self.size = 1       # ノード0は空文脈 (0次)
+        self.seen = 0       # 取り込み済みの履歴の件数
+        self.tail = []      # 取り込み済みの履歴の末尾 max_depth 件の手 (None は手なし)
+        self.prunes = 0
+
+    # --- 履歴との同期 ---
+
+    def _sync(self, history):
+        """
+        前回からの差分だけを木に取り込む。保存済みの状態の方が先まで取り込んでいて履歴と
+        噛み合えばそちらに切り替え、履歴が差し替わっていたら作り直す
+        """
+        restored = self._checkpoint_state()
+        if restored is not None and restored.seen > self.seen and restored._follows(history):
+            for attr in ("children", "parent", "counts", "size", "seen", "tail"):
+                setattr(self, attr, getattr(restored, attr))
+            self.checkpoint = None
+        elif not self._follows(history):
+            self._clear()
+        for h in history[self.seen:]:
+            self._update(h.get("user_move"))
+        self.seen = len(history)
+
+    def _follows(self, history):
+        """取り込み済みの部分が history の先頭と一致するか (末尾 max_depth 件で確かめる)"""
+        k = len(self.tail)
+        return len(history) >= self.seen and [h.get("user_move") for h in history[self.seen - k:self.seen]] == self.tail
+
+    def _checkpoint_state(self):
+        """checkpoint を展開した状態 (最初に必要になったときに1回だけ展開する)"""
+        if isinstance(self.checkpoint, bytes):
+            restored = self.loads(self.checkpoint)
+            compatible = (restored.max_depth, restored.max_nodes) == (self.max_depth, self.max_nodes)
+            self.checkpoint = restored if compatible else None
+        return self.checkpoint
+
+    def _context(self):
+        """直近の手から遡った文脈 (手のインデックス列)。手のない履歴で途切れる"""
+        context = []
+        for move in reversed(self.tail):
+            if move not in self.MOVE_TO_IDX:
+                break
+            context.append(self.MOVE_TO_IDX[move])
+        return context
+
+    def _update(self, move):
+        if move in self.MOVE_TO_IDX:
+            symbol = self.MOVE_TO_IDX[move]
+            node = 0
+            self.counts[0, symbol] += 1
+            for ctx in self._context():
+                child = self.children[node, ctx]
+                if child < 0:
+                    child = self._allocate(node, ctx)
+                    if child < 0:
+                        break
+                self.counts[child, symbol] += 1
+                node = child
+
+        self.tail.append(move)
+        if len(self.tail) > self.max_depth:
+            self.tail.pop(0)
+
+    def _allocate(self, parent, ctx):
+        if self.size >= self.max_nodes:
+            self._prune()
+            # 枝刈りで親ノード自体が消えていたら、今回はここで打ち切る
+            return -1
+        node = self.size
+        self.size += 1
+        self.children[parent, ctx] = node
+        self.parent[node] = parent
+        return node
+
+    def _prune(self):
+        """回数を半減させ、空になった部分木を取り除いて配列を詰める"""
+        self.prunes += 1
+        # 根だけは必ず残るので、目標は1ノード以上にする (小さい max_nodes で止まらなくならないように)
+        target = max(self.max_nodes * 3 // 4, 1)
+        while True:
+            size = self.size
+            self.counts[:size] >>= 1
+            keep = self.counts[:size].sum(axis=1) > 0
+            keep[0] = True
+            # 子の回数は常に親以下なので、消えるノードの子孫も必ず消える
+            if keep.sum() <= target:
+                break
+        remap = np.where(keep, np.cumsum(keep) - 1, -1).astype(np.int32)
+        new_size = int(keep.sum())
+
+        children = self.children[:size][keep]
+        parent = self.parent[:size][keep]
+        counts = self.counts[:size][keep]
+        self.children[:new_size] = np.where(children >= 0, remap[np.maximum(children, 0)], -1)
+        self.parent[:new_size] = np.where(parent >= 0, remap[np.maximum(parent, 0)], -1)
+        self.counts[:new_size] = counts
+        self.children[new_size:] = -1
+        self.parent[new_size:] = -1
+        self.counts[new_size:] = 0
+        self.size = new_size
+
+    # --- 予測 ---
+
+    def predict(self, history: list) -> str:
+        self._sync(history)
+
+        # 現在の文脈に一致するノードを低次から順に集める
+        path = [0]
+        node = 0
+        for ctx in self._context():
+            node = self.children[node, ctx]
+            if node < 0:
+                break
+            path.append(node)
+
+        # 高次から順に混合 (PPM の escape と同じ考え方で、残りの確率を低次へ回す)
+        probs = np.zeros(3)
+        escape = 1.0
+        for node in reversed(path):
+            counts = self.counts[node]
+            total = counts.sum()
+            if total == 0:
+                continue
+            probs += escape * counts / (total + 1)
+            escape *= 1 / (total + 1)
+
+        if not probs.any():
+            return random.choice(self.MOVES)
+        return self.MOVES[int(np.argmax(probs))]
+
+    # --- 永続化 ---
+
+    def dumps(self) -> bytes:
+        """プレイヤーごとに保存できるよう、状態をバイト列に変換する"""
+        buf = io.BytesIO()
+        np.savez_compressed(
+            buf,
+            meta=np.array([self.max_depth, self.max_nodes, self.size, self.seen], dtype=np.int64),
+            tail=np.array([self.MOVE_TO_IDX.get(m, -1) for m in self.tail], dtype=np.int8),
+            children=self.children[:self.size],
+            parent=self.parent[:self.size],
+            counts=self.counts[:self.size],
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def loads(cls, data: bytes) -> "ContextTreePredictor":
+        with np.load(io.BytesIO(data)) as arrays:
+            max_depth, max_nodes, size, seen = (int(v) for v in arrays["meta"])
+            predictor = cls(max_depth=max_depth, max_nodes=max_nodes)
+            predictor.size = size
+            predictor.seen = seen
+            predictor.tail = [cls.MOVES[i] if i >= 0 else None for i in arrays["tail"]]
+            predictor.children[:size] = arrays["children"]
+            predictor.parent[:size] = arrays["parent"]
+            predictor.counts[:size] = arrays["counts"]
+        return predictor
+
+class PopulationPriorPredictor(BasePredictor):
+    """全プレイヤーの n-gram 出現回数 (NgramIndex) から、直前の手の並びの次に最も多く出た手を予測"""
+    MOVES = ["R", "P", "S"]
 
-class RNNPredictor(BasePredictor):
+    def __init__(self, index, min_count=20):
+        """
+        Args:
+            index (NgramIndex): 全プレイヤー共通の索引
+            min_count (int): この回数に満たない文脈は短くして探し直す
+        """
+        self.index = index
+        self.min_count = min_count
+
+    def predict(self, history: list) -> str:
+        context = NgramIndex.encode(h.get("user_move") for h in history[-self.index.order:])
+        counts = self.index.next_counts(context, min_count=self.min_count)
+        if counts is None:
+            return random.choice(self.MOVES)
+        return self.MOVES[int(np.argmax(counts))]
+
+class RNNPredictor(MemoizablePredictor):
     """RNN (LSTM) を用いた予測"""
-    def __init__(self, seq_length=10, hidden_size=32):
+    def __init__(self, seq_length=10, hidden_size=32, base_model=None, model_version=None):
+        """
+        Args:
+            base_model (RPSLSTM | None): 学習済みの共有モデル。指定した場合、LSTM層は共有の重みを
+                                         読み取り専用で使い、出力層だけを複製してプレイヤーごとに学習する。
+            model_version (str | None): 共有モデルの版。予測をキャッシュするときのキーに含める
+        """
         self.seq_length = seq_length
-        self.model = RPSLSTM(input_size=3, hidden_size=hidden_size, output_size=3)
-        self.optimizer = optim.Adam(self.model.parameters(), lr=0.01)
+        self.base_model = base_model
+        self.model_version = model_version
+        # 出力層をまだ学習していない (重みが共有モデルと同じ) か
+        self.pristine = True
+        # False なら予測だけ行い、オンライン学習 (_train_step) を省く (高負荷時の縮退用)
+        self.train_online = True
+        if base_model is None:
+            self.model = RPSLSTM(input_size=3, hidden_size=hidden_size, output_size=3)
+        else:
+            self.model = RPSLSTM(input_size=3, hidden_size=base_model.hidden_size, output_size=3,
+                                 num_layers=base_model.num_layers)
+            self.model.lstm = base_model.lstm
+            self.model.fc = copy.deepcopy(base_model.fc)
+            self.model.fc.requires_grad_(True)
+        trainable = [p for p in self.model.parameters() if p.requires_grad]
+        self.optimizer = optim.Adam(trainable, lr=0.01)
         self.criterion = nn.CrossEntropyLoss()
         self.mapping = {'R': [1, 0, 0], 'P': [0, 1, 0], 'S': [0, 0, 1]}
         self.idx_to_move = {0: 'R', 1: 'P', 2: 'S'}
@@ -103,14 +419,37 @@ class RNNPredictor(BasePredictor):
         features = [self.mapping[m] for m in moves]
         return torch.tensor([features], dtype=torch.float32) # (1, seq, 3)
 
+    def memo_key(self, history: list):
+        # 共有モデルのまま (未学習) で、今回も学習しない場合だけ直近 seq_length 手で予測が決まる
+        if self.base_model is None or self.model_version is None or not self.pristine:
+            return None
+        if self.train_online and len(history) > self.seq_length + 1:
+            return None
+        moves = [h.get("user_move") for h in history[-self.seq_length:]]
+        if not all(moves):
+            return None
+        return (self.model_version, "".join(moves))
+
     def predict(self, history: list) -> str:
+        predicted_move = self.predict_or_none(history)
+        if predicted_move is None:
+            return self.or_random(None)
+            
+        # Train on the latest data if we have enough
+        if self.train_online and len(history) > self.seq_length + 1:
+            self._train_step(history)
+            
+        return predicted_move
+
+    def predict_or_none(self, history: list):
+        """推論のみ (学習はしない)"""
         if len(history) < self.seq_length:
-            return random.choice(['R', 'P', 'S'])
+            return None
             
         # Get last seq_length user moves
         user_moves = [h['user_move'] for h in history[-self.seq_length:] if h.get('user_move')]
         if len(user_moves) < self.seq_length:
-             return random.choice(['R', 'P', 'S'])
+             return None
 
         # Predict next user move
         self.model.eval()
@@ -119,11 +458,6 @@ class RNNPredictor(BasePredictor):
             output = self.model(input_tensor) # (1, 3)
             predicted_idx = torch.argmax(output).item()
             predicted_move = self.idx_to_move[predicted_idx]
-            
-        # Train on the latest data if we have enough
-        if len(history) > self.seq_length + 1:
-            self._train_step(history)
-            
         return predicted_move
 
     def _train_step(self, history):
@@ -145,6 +479,7 @@ class RNNPredictor(BasePredictor):
         input_tensor = self._moves_to_tensor(prev_seq)
         target_tensor = torch.tensor([self.move_to_idx[target_move]], dtype=torch.long)
         
+        self.pristine = False
         self.optimizer.zero_grad()
         output = self.model(input_tensor)
         loss = self.criterion(output, target_tensor)
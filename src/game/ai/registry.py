@@ -0,0 +1,195 @@
+"""
+ファイルシステム上のモデルレジストリ。
+
+    <root>/<name>/versions/<version>/<ファイル名>   成果物 (重みファイル・定跡表など)
+    <root>/<name>/versions/<version>/manifest.json  sha256・サイズ・登録順など
+    <root>/<name>/CURRENT                           現在有効な版
+
+登録 (publish) は一時ディレクトリに書いてから rename し、CURRENT の切り替えも一時ファイルからの
+os.replace で行うので、読み取り側が書きかけの状態を見ることはない。
+ワーカーは RegistryWatcher で CURRENT を定期的に確認し、変わっていればチェックサムを検証してから
+読み込み直す (再起動は不要)。
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+
+
+class RegistryError(Exception):
+    pass
+
+
+def sha256sum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _versions_dir(self, name):
+        return self.root / name / "versions"
+
+    def publish(self, name, path, version=None, activate=True, metadata=None):
+        """成果物を新しい版として登録する。activate=True なら有効な版にする。登録した版を返す"""
+        path = Path(path)
+        checksum = sha256sum(path)
+        if version is None:
+            version = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{checksum[:8]}"
+        target = self._versions_dir(name) / version
+        if target.exists():
+            raise RegistryError(f"{name} version {version} already exists")
+
+        manifest = {
+            "name": name,
+            "version": version,
+            "file": path.name,
+            "sha256": checksum,
+            "size": path.stat().st_size,
+            "sequence": max((m["sequence"] for m in self.versions(name)), default=0) + 1,
+            "published_at": datetime.now(timezone.utc).isoformat(),
+            "metadata": metadata or {},
+        }
+        staging = self._versions_dir(name) / f".{version}.{uuid.uuid4().hex}.tmp"
+        staging.mkdir(parents=True)
+        try:
+            shutil.copyfile(path, staging / path.name)
+            (staging / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+            os.rename(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(name, version)
+        return version
+
+    def versions(self, name):
+        """登録済みの版のマニフェストを登録順に返す"""
+        directory = self._versions_dir(name)
+        if not directory.is_dir():
+            return []
+        manifests = []
+        for entry in directory.iterdir():
+            manifest = entry / MANIFEST
+            if not entry.name.startswith(".") and manifest.is_file():
+                manifests.append(json.loads(manifest.read_text(encoding="utf-8")))
+        return sorted(manifests, key=lambda m: m["sequence"])
+
+    def manifest(self, name, version):
+        manifest = self._versions_dir(name) / version / MANIFEST
+        if not manifest.is_file():
+            raise RegistryError(f"{name} version {version} not found")
+        return json.loads(manifest.read_text(encoding="utf-8"))
+
+    def current(self, name):
+        """現在有効な版 (なければ None)"""
+        try:
+            return (self.root / name / CURRENT).read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    def verified_path(self, name, version):
+        """チェックサムを検証した成果物のパス"""
+        manifest = self.manifest(name, version)
+        path = self._versions_dir(name) / version / manifest["file"]
+        if not path.is_file() or sha256sum(path) != manifest["sha256"]:
+            raise RegistryError(f"{name} version {version} failed checksum verification")
+        return path
+
+    def activate(self, name, version):
+        self.verified_path(name, version)
+        _write_atomic(self.root / name / CURRENT, version + "\n")
+
+    def rollback(self, name, version=None):
+        """
+        指定の版 (省略時は現在の版の1つ前に登録された版) に戻す。戻した版を返す
+        """
+        if version is None:
+            current = self.current(name)
+            earlier = []
+            for manifest in self.versions(name):
+                if manifest["version"] == current:
+                    break
+                earlier.append(manifest["version"])
+            if not earlier:
+                raise RegistryError(f"No earlier version of {name} to roll back to")
+            version = earlier[-1]
+        self.activate(name, version)
+        return version
+
+
+class RegistryWatcher:
+    """
+    レジストリの CURRENT を一定間隔で確認し、版が変わっていれば handler(path, version) で読み込む。
+    poll() はリクエストの合間 (AI を組み立てる前) に呼ぶ想定で、間隔内の呼び出しはすぐに戻る。
+    """
+    def __init__(self, registry, handlers, interval=2.0):
+        self.registry = registry
+        self.handlers = handlers
+        self.interval = interval
+        self.loaded = {}    # name -> (version, path)
+        self.failed = {}    # name -> 読み込みに失敗した版 (CURRENT が変わるまで再試行しない)
+        self.reloads = 0
+        self.last_error = None
+        self._last_check = None
+        self._lock = threading.Lock()
+
+    def poll(self, force=False):
+        now = time.monotonic()
+        if not force and self._last_check is not None and now - self._last_check < self.interval:
+            return
+        # 他のスレッドが確認中なら待たずに戻る (そのリクエストは今のモデルを使う)
+        if not self._lock.acquire(blocking=force):
+            return
+        try:
+            self._last_check = now
+            for name, handler in self.handlers.items():
+                self._refresh(name, handler)
+        finally:
+            self._lock.release()
+
+    def _refresh(self, name, handler):
+        version = self.registry.current(name)
+        if version is None or version == self.loaded.get(name, (None,))[0] or version == self.failed.get(name):
+            return
+        try:
+            path = self.registry.verified_path(name, version)
+            handler(path, version)
+        except Exception as e:
+            logger.exception("Failed to load %s version %s", name, version)
+            self.failed[name] = version
+            self.last_error = f"{name} {version}: {e}"
+            return
+        self.loaded[name] = (version, path)
+        self.failed.pop(name, None)
+        self.reloads += 1
+
+    def metrics(self):
+        return {
+            "loaded": {name: version for name, (version, _) in self.loaded.items()},
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
@@ -2,6 +2,19 @@ import random
 from collections import Counter
 
 class SafetyMechanism:
+    def __init__(self, spam_window=10, spam_threshold=8, stop_loss_window=20, stop_loss_min_wins=5):
+        """
+        Args:
+            spam_window (int): Anti-Spam で見る直近の手数
+            spam_threshold (int): 同一の手がこの回数以上ならスパムとみなす
+            stop_loss_window (int): Stop-Loss で見る直近の手数
+            stop_loss_min_wins (int): AIの勝ち数がこれ未満なら乱数へ切り替える
+        """
+        self.spam_window = spam_window
+        self.spam_threshold = spam_threshold
+        self.stop_loss_window = stop_loss_window
+        self.stop_loss_min_wins = stop_loss_min_wins
+
     def get_winning_move(self, move):
         mapping = {"R": "P", "P": "S", "S": "R"}
         return mapping.get(move, "R") # fallback
@@ -15,28 +28,28 @@ class SafetyMechanism:
         if not history:
             return None, None
             
-        # 1. Anti-Spam (直近10手)
-        recent_10 = history[-10:]
-        if len(recent_10) >= 10:
-            moves = [h.get("user_move") for h in recent_10 if h.get("user_move")]
+        # 1. Anti-Spam (直近 spam_window 手、既定は10手)
+        recent = history[-self.spam_window:]
+        if len(recent) >= self.spam_window:
+            moves = [h.get("user_move") for h in recent if h.get("user_move")]
             if moves:
                 count = Counter(moves)
                 most_common_move, freq = count.most_common(1)[0]
                 
-                # 同一の手が8割以上
-                if freq >= 8:
+                # 同一の手が spam_threshold 回以上 (既定は8割以上)
+                if freq >= self.spam_threshold:
                     # スパム検知。その手に勝つ手を出す
                     return self.get_winning_move(most_common_move), "Safety_AntiSpam"
 
-        # 2. Stop-Loss (直近20手)
-        recent_20 = history[-20:]
-        if len(recent_20) >= 20:
+        # 2. Stop-Loss (直近 stop_loss_window 手、既定は20手)
+        recent = history[-self.stop_loss_window:]
+        if len(recent) >= self.stop_loss_window:
             # AIの勝利数をカウント
             # ユーザーのresultが "lose" なら AIの勝ち
-            ai_wins = sum(1 for h in recent_20 if h.get("result") == "lose")
+            ai_wins = sum(1 for h in recent if h.get("result") == "lose")
             
-            # 勝率が25%未満 (20戦中5勝未満)
-            if ai_wins < 5:
+            # AIの勝ちが stop_loss_min_wins 未満 (既定は20戦中5勝未満)
+            if ai_wins < self.stop_loss_min_wins:
                 # 乱数へ切り替え
                 return random.choice(["R", "P", "S"]), "Safety_StopLoss"
                 
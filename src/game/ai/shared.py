@@ -0,0 +1,64 @@
+"""
+学習済み RPSLSTM の重みをワーカープロセス間で共有する。
+
+- "mmap": 重みファイルをメモリマップで読み込む。同じファイルを開いた全プロセスが
+          OS のページキャッシュを共有するため、fork していないワーカーでも1つ分で済む。
+- "shm":  重みを共有メモリ (share_memory_) に置く。gunicorn の --preload などで
+          マスタープロセスが読み込んでから fork する場合に、ワーカー側で複製されない。
+
+共有する重みは読み取り専用とし、プレイヤーごとの追加学習は RNNPredictor 側で
+出力層だけを複製して行う。
+"""
+import threading
+
+import torch
+
+from .models import RPSLSTM
+
+SHARING_MODES = ("mmap", "shm")
+
+_lock = threading.Lock()
+_shared = (None, None)  # (version, model)
+
+
+def save_lstm_weights(model, path):
+    """RPSLSTM の重みを保存する"""
+    torch.save(model.state_dict(), path)
+
+
+def load_lstm_weights(path, mode="mmap"):
+    """重みファイルから読み取り専用の RPSLSTM を作る"""
+    if mode not in SHARING_MODES:
+        raise ValueError(f"Unknown sharing mode: {mode}")
+
+    state = torch.load(path, map_location="cpu", weights_only=True, mmap=(mode == "mmap"))
+    hidden_size = state["fc.weight"].shape[1]
+    num_layers = sum(1 for key in state if key.startswith("lstm.weight_ih_l"))
+    model = RPSLSTM(input_size=3, hidden_size=hidden_size, output_size=3, num_layers=num_layers)
+    # assign=True でメモリマップされたテンソルをそのまま使う (コピーしない)
+    model.load_state_dict(state, assign=True)
+    model.eval()
+    for param in model.parameters():
+        param.requires_grad_(False)
+    if mode == "shm":
+        model.share_memory()
+    return model
+
+
+def set_shared_lstm(model, version=None):
+    """推論に使う共有モデルを差し替える (参照の入れ替えのみなのでアトミック)"""
+    global _shared
+    with _lock:
+        _shared = (version, model)
+
+
+def get_shared_lstm():
+    """(version, model) を返す。共有モデルがなければ (None, None)"""
+    return _shared
+
+
+def load_shared_lstm(path, mode="mmap", version=None):
+    """重みファイルを読み込んで共有モデルとして登録する"""
+    model = load_lstm_weights(path, mode=mode)
+    set_shared_lstm(model, version=version or str(path))
+    return model
@@ -1,21 +1,128 @@
 import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from game.ai.predictors import (
     RandomPredictor,
     MarkovPredictor,
     FrequencyPredictor,
     PatternMatcherPredictor,
+    ContextTreePredictor,
+    PopulationPriorPredictor,
     RNNPredictor
 )
 
+# 予測器を並列に実行する共有スレッドプール (プロセス内で1つ)
+_executor = None
+_executor_lock = threading.Lock()
+
+# プロセス全体での締め切り超過の記録 (予測器名ごと)
+_metrics_lock = threading.Lock()
+_deadline_misses = Counter()   # 締め切りに間に合わなかった回数
+_fallbacks = Counter()         # 前回の予測で代用した回数
+_skips = Counter()             # 代用できる予測もなく、その回は除外した回数
+
+# プロセス全体での予測器の刈り込みの記録 (予測器名ごと)
+_suspensions = Counter()       # 劣勢が続いて休止させた回数
+_pruned_rounds = Counter()     # 休止中で実行しなかったラウンド数
+_costs = {}                    # 1回の予測にかかった時間の移動平均 (秒)
+COST_ALPHA = 0.1               # 移動平均の重み
+
+# 縮退レベル (admission control から指定される)
+DEGRADE_NONE = 0              # すべての予測器を使う
+DEGRADE_NO_RNN_TRAINING = 1   # RNN のオンライン学習を省く
+DEGRADE_NO_RNN = 2            # RNN を使わない
+DEGRADE_CHEAP_ONLY = 3        # 計算の軽い予測器だけで答える
+
+# DEGRADE_CHEAP_ONLY で残す予測器
+CHEAP_PREDICTORS = ("Random", "Markov", "Frequency", "Population")
+
+def get_executor(max_workers=8):
+    """共有スレッドプールを返す (初回呼び出し時に作成)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rps-predictor")
+        return _executor
+
+def predictor_metrics():
+    """締め切り超過に関するプロセス全体の集計を返す"""
+    with _metrics_lock:
+        return {
+            "deadline_misses": dict(_deadline_misses),
+            "fallbacks": dict(_fallbacks),
+            "skips": dict(_skips),
+            "pruning": {
+                "suspensions": dict(_suspensions),
+                "skipped_rounds": dict(_pruned_rounds),
+                "avg_cost_ms": {name: cost * 1000 for name, cost in _costs.items()},
+                # 休止中のラウンドも平均どおりの時間がかかっていたとした場合の節約分
+                "estimated_saved_ms": {
+                    name: rounds * _costs.get(name, 0) * 1000 for name, rounds in _pruned_rounds.items()
+                },
+            },
+        }
+
 class StrategySelector:
-    def __init__(self):
+    def __init__(self, deadlines=None, max_workers=8, rnn_model=None, population_index=None,
+                 rnn_version=None, prediction_cache=None, pattern_max_length=10, score_decay=None,
+                 rnn_seq_length=10, rnn_hidden_size=32, prune_margin=None, prune_patience=10,
+                 prune_probe_interval=20):
+        """
+        Args:
+            deadlines (dict | None): 予測器ごとの応答締め切り (秒)。"default" は個別指定のない予測器に適用。
+                                     None の場合は従来通り直列に実行する。
+            max_workers (int): 共有スレッドプールのスレッド数
+            rnn_model (RPSLSTM | None): RNNPredictor の土台にする学習済みの共有モデル
+            population_index (NgramIndex | None): 指定すれば全プレイヤーの n-gram から予測する
+                                                   PopulationPriorPredictor を加える
+            rnn_version (str | None): rnn_model の版 (予測のキャッシュのキーに使う)
+            prediction_cache (PredictionCache | None): 指定すれば、予測器を呼ぶ前にプレイヤー間で
+                                                       共有する予測のキャッシュを引く
+            pattern_max_length (int): PatternMatcherPredictor が探すパターンの最大長
+            score_decay (float | None): 毎ラウンド戦略のスコアに掛ける減衰率 (None なら減衰しない)
+            rnn_seq_length (int): RNNPredictor の入力の手数
+            rnn_hidden_size (int): RNNPredictor の隠れ層の大きさ (rnn_model を使う場合はそちらに従う)
+            prune_margin (float | None): 最良の戦略のスコアをこれ以上下回った予測器を劣勢とみなす
+                                         (None なら刈り込まない)
+            prune_patience (int): 劣勢が何ラウンド続いたら予測器を休止させるか
+            prune_probe_interval (int): 休止させた予測器を何ラウンド後に1ラウンドだけ実行し直すか
+        """
+        self.deadlines = deadlines
+        self.max_workers = max_workers
+        self.prediction_cache = prediction_cache
+        # RNNPredictor が使う共有モデルの版 (レスポンスで報告する)
+        self.model_version = rnn_version
+        self.score_decay = score_decay
+        # 締め切りに間に合わなかったときに代用する、各予測器の直近の予測
+        self.last_predictions = {}
+        # 締め切りを過ぎてもまだ実行中の予測 (終わるまで再投入しない)
+        self.running = {}
+        self.deadline_misses = Counter()
+        # 直近の select_move で予測が得られた予測器
+        self.last_predicted = []
+
+        # 予測器の刈り込み (_update_pruning を参照)
+        self.prune_margin = prune_margin
+        self.prune_patience = prune_patience
+        self.prune_probe_interval = prune_probe_interval
+        self.round = 0
+        self.dominated = Counter()      # 予測器ごとの劣勢の連続ラウンド数
+        self.suspended = {}             # 休止中の予測器 -> 再び実行するラウンド
+        self.pruned_rounds = Counter()  # 休止中で実行しなかったラウンド数
+
         self.predictors = {
             "Random": RandomPredictor(),
             "Markov": MarkovPredictor(),
             "Frequency": FrequencyPredictor(),
-            "Pattern": PatternMatcherPredictor(),
-            "RNN": RNNPredictor(),
+            "Pattern": PatternMatcherPredictor(max_length=pattern_max_length),
+            "ContextTree": ContextTreePredictor(),
+            "RNN": RNNPredictor(seq_length=rnn_seq_length, hidden_size=rnn_hidden_size,
+                                base_model=rnn_model, model_version=rnn_version),
         }
+        if population_index is not None:
+            self.predictors["Population"] = PopulationPriorPredictor(population_index)
         
         # 戦略キー: "PredictorName_Type" (Type: P0, P1)
         self.strategies = []
@@ -33,14 +140,31 @@ class StrategySelector:
         mapping = {"R": "P", "P": "S", "S": "R"}
         return mapping.get(move, random.choice(["R", "P", "S"]))
 
-    def select_move(self, history):
+    def seed(self, summary):
+        """圧縮済み履歴のサマリーを各予測器に渡す"""
+        for predictor in self.predictors.values():
+            predictor.seed(summary)
+
+    def degrade(self, level):
+        """
+        負荷に応じて使う予測器を減らす (DEGRADE_* を参照)。
+        外した予測器の戦略は select_move の候補に出てこなくなるだけで、スコアは残る。
+        """
+        if level >= DEGRADE_NO_RNN_TRAINING and "RNN" in self.predictors:
+            self.predictors["RNN"].train_online = False
+        if level >= DEGRADE_NO_RNN:
+            self.predictors.pop("RNN", None)
+        if level >= DEGRADE_CHEAP_ONLY:
+            self.predictors = {name: p for name, p in self.predictors.items() if name in CHEAP_PREDICTORS}
+
+    def select_move(self, history, parallel=True):
         """
-        履歴に基づいて学習・予測を行い、最終的な手を決定する
+        履歴に基づいて学習・予測を行い、最終的な手を決定する。
+        parallel=False なら締め切りの設定にかかわらず直列に実行する (ウォームアップの再生用)。
         """
         # 各予測器からの予測を取得
-        predictions = {}
-        for name, predictor in self.predictors.items():
-            predictions[name] = predictor.predict(history)
+        predictions = self._collect_predictions(history, parallel)
+        self.last_predicted = list(predictions)
             
         # 各戦略ごとの「次の手」を算出
         strategy_moves = {}
@@ -58,15 +182,133 @@ class StrategySelector:
         # 直近の戦略の手を保存（後でupdate_scoresで使う）
         self.last_strategy_moves = strategy_moves
         
-        # 最高スコアの戦略を選択
+        if not strategy_moves:
+            # すべての予測器が締め切りに間に合わなかった
+            return random.choice(["R", "P", "S"]), "Random_P0"
+
+        # 最高スコアの戦略を選択 (今回予測が得られなかった予測器の戦略は除く)
         # スコアが同じ場合はランダム、あるいは固定順
-        best_strategy = max(self.scores, key=self.scores.get)
+        best_strategy = max(strategy_moves, key=self.scores.get)
         
         # 稀にランダムウォーク (Exploration) を入れるのもありだが、
         # ここでは純粋にスコアが高いものを選ぶ
         
         return strategy_moves[best_strategy], best_strategy
 
+    def _collect_predictions(self, history, parallel=True):
+        """
+        各予測器の予測を集める。
+        締め切りが設定されていれば (parallel=False でなければ) 共有スレッドプールで並列に実行し、
+        締め切りに間に合わない予測器は前回の予測で代用する (前回の予測もなければ今回は除外する)。
+        """
+        if self.deadlines is None or not parallel:
+            predictions = {}
+            for name, predictor in self._active_predictors().items():
+                key = self._cache_key(name, predictor, history)
+                found, move = self._cached(key, predictor)
+                move = move if found else self._predict(name, predictor, history, key)
+                # 直列に実行したとき (ウォームアップ) の予測も、締め切り超過時の代用に使う
+                predictions[name] = self.last_predictions[name] = move
+            return predictions
+
+        executor = get_executor(self.max_workers)
+        # 呼び出し側が履歴に追記しても影響しないよう、スナップショットを渡す
+        snapshot = list(history)
+        started = time.monotonic()
+
+        futures = {}
+        predictions = {}
+        for name, predictor in self._active_predictors().items():
+            key = self._cache_key(name, predictor, snapshot)
+            found, move = self._cached(key, predictor)
+            if found:
+                predictions[name] = self.last_predictions[name] = move
+                continue
+            previous = self.running.get(name)
+            if previous is not None:
+                if not previous.done():
+                    # 前回の実行がまだ終わっていない
+                    self._miss(name, predictions)
+                    continue
+                del self.running[name]
+                if previous.exception() is None:
+                    self.last_predictions[name] = previous.result()
+            futures[name] = executor.submit(self._predict, name, predictor, snapshot, key)
+
+        default = self.deadlines.get("default")
+        for name, future in futures.items():
+            deadline = self.deadlines.get(name, default)
+            try:
+                if deadline is None:
+                    predictions[name] = future.result()
+                else:
+                    remaining = started + deadline - time.monotonic()
+                    predictions[name] = future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                self.running[name] = future
+                self._miss(name, predictions)
+                continue
+            self.last_predictions[name] = predictions[name]
+
+        # 戦略の並び (同点時の優先順) が変わらないよう、登録順に並べ直す
+        return {name: predictions[name] for name in self.predictors if name in predictions}
+
+    def _active_predictors(self):
+        """休止中でない予測器 (休止中の予測器は実行しなかったラウンドとして数える)"""
+        if not self.suspended:
+            return self.predictors
+        active = {}
+        for name, predictor in self.predictors.items():
+            if name in self.suspended:
+                self.pruned_rounds[name] += 1
+                with _metrics_lock:
+                    _pruned_rounds[name] += 1
+            else:
+                active[name] = predictor
+        return active
+
+    def _cache_key(self, name, predictor, history):
+        """予測のキャッシュのキー (キャッシュなし・キャッシュできない予測器なら None)"""
+        if self.prediction_cache is None:
+            return None
+        key = predictor.memo_key(history)
+        return None if key is None else (name, key)
+
+    def _cached(self, key, predictor):
+        """(見つかったか, 予測) を返す"""
+        if key is None:
+            return False, None
+        found, move = self.prediction_cache.get(key)
+        return found, predictor.or_random(move) if found else None
+
+    def _predict(self, name, predictor, history, key):
+        """予測器を実行し、キャッシュできる予測なら結果を登録する"""
+        started = time.perf_counter()
+        if key is None:
+            move = predictor.predict(history)
+        else:
+            move = predictor.predict_or_none(history)
+            self.prediction_cache.put(key, move)
+            move = predictor.or_random(move)
+        elapsed = time.perf_counter() - started
+        with _metrics_lock:
+            previous = _costs.get(name)
+            _costs[name] = elapsed if previous is None else previous + COST_ALPHA * (elapsed - previous)
+        return move
+
+    def _miss(self, name, predictions):
+        """締め切り超過を記録し、前回の予測があれば代用する"""
+        self.deadline_misses[name] += 1
+        cached = self.last_predictions.get(name)
+        with _metrics_lock:
+            _deadline_misses[name] += 1
+            if cached is not None:
+                _fallbacks[name] += 1
+            else:
+                _skips[name] += 1
+        if cached is not None:
+            predictions[name] = cached
+
     def update_scores(self, user_move):
         """
         ユーザーが実際に出した手を受け取り、前回の戦略の勝敗を評価してスコアを更新
@@ -89,5 +331,42 @@ class StrategySelector:
                      self.scores[strategy] += 1
                      
         # 減衰処理 (過去の栄光を引きずりすぎないように)
-        # for s in self.scores:
-        #     self.scores[s] *= 0.95
+        if self.score_decay is not None:
+            for s in self.scores:
+                self.scores[s] *= self.score_decay
+
+        self.round += 1
+        if self.prune_margin is not None:
+            self._update_pruning()
+
+    def _update_pruning(self):
+        """
+        最良の戦略にスコアで prune_margin 以上離された状態が prune_patience ラウンド続いた予測器を
+        休止させる。休止中の予測器は prune_probe_interval ラウンドごとに1ラウンドだけ実行し直し、
+        その時点でもまだ劣勢ならすぐ休止に戻す。休止中の戦略のスコアはそのまま残るので、
+        プレイヤーの傾向が変わって最良の戦略のスコアが落ちてくれば実行を再開する。
+        """
+        best = {
+            name: max(self.scores[f"{name}_P0"], self.scores[f"{name}_P1"])
+            for name in self.predictors
+        }
+        if not best:
+            return
+        leader = max(best.values())
+        for name, score in best.items():
+            wake = self.suspended.get(name)
+            if wake is not None:
+                if self.round < wake:
+                    continue
+                # 次のラウンドで様子を見る (劣勢のままならそのラウンドの後で休止に戻る)
+                del self.suspended[name]
+                self.dominated[name] = self.prune_patience - 1
+                continue
+            if leader - score < self.prune_margin:
+                self.dominated[name] = 0
+                continue
+            self.dominated[name] += 1
+            if self.dominated[name] >= self.prune_patience:
+                self.suspended[name] = self.round + self.prune_probe_interval
+                with _metrics_lock:
+                    _suspensions[name] += 1
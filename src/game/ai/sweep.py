@@ -0,0 +1,221 @@
+"""
+StrategySelector / SafetyMechanism のパラメーター探索。
+
+記録済みのユーザーの手の並びを、設定ごとに AI を作り直して再生し、AIの勝率と
+1ラウンドあたりの計算時間で設定を順位付けする。
+
+- 手の並びは1本の int8 配列にまとめて共有メモリ (multiprocessing.shared_memory) に置き、
+  ワーカープロセスは名前で参照する (タスクごとに pickle しない)。
+- 1タスクは (設定, プレイヤーの範囲)。プロセスプールで並列に評価し、設定ごとに合算する。
+- 再生はユーザーの手を記録通りに固定し、AIの手と勝敗だけを設定に応じて計算し直す
+  (ユーザーがAIの手に反応していた分は再現できない)。
+- mode="stateless" は play_view と同じく毎ラウンド AI を作り直してウォームアップする。
+  mode="session" は WebSocket セッションと同じく1つの AI を使い続ける。
+"""
+import itertools
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+MOVES = ["R", "P", "S"]
+BEATS = {"R": "P", "P": "S", "S": "R"}
+
+SELECTOR_PARAMS = ("pattern_max_length", "score_decay", "rnn_seq_length", "rnn_hidden_size",
+                   "prune_margin", "prune_patience", "prune_probe_interval")
+SAFETY_PARAMS = ("spam_window", "spam_threshold", "stop_loss_window", "stop_loss_min_wins")
+WARMUP_PARAM = "warmup_rounds"
+PARAMS = SELECTOR_PARAMS + SAFETY_PARAMS + (WARMUP_PARAM,)
+MODES = ("stateless", "session")
+
+
+def configurations(grid, samples=None, seed=0):
+    """
+    グリッド {パラメーター名: [値, ...]} の全組み合わせを返す。
+    samples を指定すると、その中からランダムに samples 個を選ぶ (ランダムサーチ)。
+    """
+    unknown = set(grid) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+    names = sorted(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    if samples is not None and samples < len(configs):
+        configs = random.Random(seed).sample(configs, samples)
+    return configs
+
+
+class SharedHistories:
+    """プレイヤーごとの手の並び (0: R, 1: P, 2: S) を共有メモリに置く"""
+    def __init__(self, sequences):
+        lengths = np.array([len(s) for s in sequences], dtype=np.int64)
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        self.players = len(sequences)
+        self.rounds = int(offsets[-1])
+
+        self._moves = shared_memory.SharedMemory(create=True, size=max(self.rounds, 1))
+        self._offsets = shared_memory.SharedMemory(create=True, size=offsets.nbytes)
+        moves = np.ndarray((self.rounds,), dtype=np.int8, buffer=self._moves.buf)
+        for sequence, start in zip(sequences, offsets[:-1]):
+            moves[start:start + len(sequence)] = sequence
+        np.ndarray(offsets.shape, dtype=np.int64, buffer=self._offsets.buf)[:] = offsets
+
+    @property
+    def names(self):
+        return self._moves.name, self._offsets.name, self.rounds, self.players
+
+    def close(self):
+        for shm in (self._moves, self._offsets):
+            shm.close()
+            shm.unlink()
+
+
+# ワーカープロセス側で参照する共有メモリ
+_worker = {}
+
+
+def _attach(names, rnn_weights):
+    import torch
+    # プロセスを並べて使うので、各ワーカーの torch は1スレッドに抑える
+    torch.set_num_threads(1)
+
+    moves_name, offsets_name, rounds, players = names
+    moves_shm = shared_memory.SharedMemory(name=moves_name)
+    offsets_shm = shared_memory.SharedMemory(name=offsets_name)
+    _worker["shm"] = (moves_shm, offsets_shm)
+    _worker["moves"] = np.ndarray((rounds,), dtype=np.int8, buffer=moves_shm.buf)
+    _worker["offsets"] = np.ndarray((players + 1,), dtype=np.int64, buffer=offsets_shm.buf)
+    _worker["rnn_model"] = None
+    if rnn_weights:
+        from .shared import load_lstm_weights
+        _worker["rnn_model"] = load_lstm_weights(rnn_weights, mode="mmap")
+
+
+def _judge(user_move, ai_move):
+    if user_move == ai_move:
+        return "draw"
+    return "lose" if BEATS[user_move] == ai_move else "win"
+
+
+def replay(moves, config, mode="stateless", rnn_model=None, seed=0):
+    """
+    1人分の手の並びを設定 config で再生し、(AIの勝ち, AIの負け, 引き分け, 経過秒) を返す。
+    """
+    import torch
+    from .safety import SafetyMechanism
+    from .strategy import StrategySelector
+
+    random.seed(seed)
+    torch.manual_seed(seed)
+    selector_options = {k: v for k, v in config.items() if k in SELECTOR_PARAMS}
+    safety = SafetyMechanism(**{k: v for k, v in config.items() if k in SAFETY_PARAMS})
+    warmup = config.get(WARMUP_PARAM, 50)
+
+    wins = losses = draws = 0
+    history = []
+    selector = None
+    started = time.perf_counter()
+    for code in moves:
+        user_move = MOVES[code]
+        if mode == "stateless" or selector is None:
+            selector = StrategySelector(rnn_model=rnn_model, **selector_options)
+        if mode == "stateless":
+            # play_view と同じウォームアップ (engine.warm_up)
+            temp_hist = []
+            for h in history[-warmup:] if warmup > 0 else []:
+                selector.select_move(temp_hist)
+                selector.update_scores(h["user_move"])
+                temp_hist.append(h)
+
+        ai_move, _ = selector.select_move(history)
+        override_move, _ = safety.check_override(history)
+        if override_move:
+            ai_move = override_move
+
+        result = _judge(user_move, ai_move)
+        if result == "lose":
+            wins += 1
+        elif result == "win":
+            losses += 1
+        else:
+            draws += 1
+        if mode == "session":
+            selector.update_scores(user_move)
+        history.append({"user_move": user_move, "result": result})
+    return wins, losses, draws, time.perf_counter() - started
+
+
+def _evaluate(index, config, start, end, mode, seed):
+    """ワーカーで実行するタスク: プレイヤー [start, end) を再生して合算する"""
+    moves, offsets = _worker["moves"], _worker["offsets"]
+    totals = np.zeros(4)
+    for player in range(start, end):
+        sequence = moves[offsets[player]:offsets[player + 1]]
+        totals += replay(sequence, config, mode=mode, rnn_model=_worker["rnn_model"], seed=seed + player)
+    return index, totals
+
+
+def summarize(config, totals):
+    wins, losses, draws, seconds = (float(v) for v in totals)
+    rounds = wins + losses + draws
+    decided = wins + losses
+    return {
+        "config": config,
+        "rounds": int(rounds),
+        "ai_wins": int(wins),
+        "ai_losses": int(losses),
+        "draws": int(draws),
+        "ai_win_rate": wins / decided if decided else 0,
+        "ms_per_round": seconds * 1000 / rounds if rounds else 0,
+    }
+
+
+def rank(results):
+    """
+    AIの勝率の高い順 (同率なら計算時間の短い順) に並べ、勝率と計算時間の両方で
+    他の設定に負けていないもの (パレート最適) に pareto=True を付ける。
+    """
+    ranked = sorted(results, key=lambda r: (-r["ai_win_rate"], r["ms_per_round"]))
+    best_cost = float("inf")
+    for result in ranked:
+        result["pareto"] = result["ms_per_round"] < best_cost
+        best_cost = min(best_cost, result["ms_per_round"])
+    return ranked
+
+
+def run_sweep(sequences, configs, mode="stateless", workers=None, chunk_size=10, rnn_weights=None, seed=0):
+    """
+    各設定で全プレイヤーの手の並びを再生し、順位付けした結果を返す。
+
+    Args:
+        sequences (list): プレイヤーごとの手のコードの並び
+        configs (list[dict]): configurations() の戻り値
+        workers (int | None): ワーカープロセス数 (None なら CPU 数)
+        chunk_size (int): 1タスクで再生するプレイヤー数
+        rnn_weights (str | None): RNNPredictor の土台にする重みファイル
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+    histories = SharedHistories(sequences)
+    totals = [np.zeros(4) for _ in configs]
+    try:
+        # torch を読み込んだプロセスを fork しないよう spawn で起動する
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_attach,
+            initargs=(histories.names, rnn_weights),
+        ) as pool:
+            futures = [
+                pool.submit(_evaluate, index, config, start, min(start + chunk_size, histories.players), mode, seed)
+                for index, config in enumerate(configs)
+                for start in range(0, histories.players, chunk_size)
+            ]
+            for future in futures:
+                index, partial = future.result()
+                totals[index] += partial
+    finally:
+        histories.close()
+    return rank([summarize(config, total) for config, total in zip(configs, totals)])
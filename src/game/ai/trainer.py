@@ -0,0 +1,179 @@
+"""
+RPSLSTM のバックグラウンド学習。
+
+リクエストの処理中に1件ずつ逆伝播するかわりに、(直前 seq_length 手, 次の手) のサンプルを
+上限付きのキューへ積むだけにする。学習スレッドがキューから複数プレイヤー分をまとめて取り出し、
+ミニバッチで共有モデルを更新する。
+
+学習スレッドは自分専用のモデルを更新し、推論側へは凍結したコピーを set_shared_lstm で
+参照ごと差し替えて公開する。推論中のリクエストが持っているモデルが書き換わることはない。
+重みはプロセスごとに学習されるので、複数ワーカー間では一致しない。
+"""
+import copy
+import logging
+import queue
+import threading
+import time
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+from .models import RPSLSTM
+from .shared import get_shared_lstm, set_shared_lstm
+
+logger = logging.getLogger(__name__)
+
+MOVE_TO_IDX = {"R": 0, "P": 1, "S": 2}
+
+
+class BackgroundTrainer:
+    def __init__(self, seq_length=10, hidden_size=32, batch_size=64, max_queue=10000, max_wait=0.05,
+                 publish_every=50, lr=0.001):
+        """
+        Args:
+            seq_length (int): 入力に使う直前の手数 (RNNPredictor と合わせる)
+            hidden_size (int): 共有モデルがないときに作るモデルの隠れ層の大きさ (RNNPredictor と合わせる)
+            batch_size (int): ミニバッチの最大サンプル数
+            max_queue (int): キューに積めるサンプル数の上限 (超えた分は捨てる)
+            max_wait (float): 最初のサンプルが届いてから後続を待つ最大時間 (秒)
+            publish_every (int): 何ステップごとに推論側へ重みを公開するか
+                (公開するたびにモデルの版が変わり、RNN の予測のキャッシュが効かなくなる)
+            lr (float): 学習率
+        """
+        self.seq_length = seq_length
+        self.hidden_size = hidden_size
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.publish_every = publish_every
+        self.lr = lr
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self.model = None
+        self.optimizer = None
+        self.criterion = nn.CrossEntropyLoss()
+        self.base_version = None
+        self.version = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.steps = 0
+        self.samples = 0
+        self.last_loss = None
+
+    def submit(self, moves):
+        """
+        手の並び (古い順) の末尾から1サンプルを作ってキューに積む。
+        キューが一杯なら捨てる (リクエストを待たせない)。積んだら True を返す。
+        """
+        moves = [MOVE_TO_IDX[m] for m in moves[-(self.seq_length + 1):] if m in MOVE_TO_IDX]
+        if len(moves) < self.seq_length + 1:
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((moves[:-1], moves[-1]))
+        except queue.Full:
+            with self._metrics_lock:
+                self.dropped += 1
+            return False
+        with self._metrics_lock:
+            self.enqueued += 1
+        return True
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "pending": self._queue.qsize(),
+                "steps": self.steps,
+                "samples": self.samples,
+                "avg_batch": self.samples / self.steps if self.steps else 0,
+                "last_loss": self.last_loss,
+                "version": self.version,
+            }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="rps-rnn-trainer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            try:
+                self.train_batch(batch)
+            except Exception:
+                logger.exception("RNN training step failed (%d samples)", len(batch))
+
+    def _prepare(self):
+        """
+        学習用のモデルを用意する。共有モデルが外から差し替えられていたら (重みの再読み込みなど)
+        そちらを土台に学習し直す。
+        """
+        version, shared = get_shared_lstm()
+        if self.model is not None and version == self.version:
+            return
+        if shared is None:
+            shared = RPSLSTM(input_size=3, hidden_size=self.hidden_size, output_size=3)
+        self.model = copy.deepcopy(shared)
+        self.model.requires_grad_(True)
+        self.optimizer = optim.Adam(self.model.parameters(), lr=self.lr)
+        self.base_version = version or "random"
+        self.version = version
+
+    def train_batch(self, batch):
+        """ミニバッチ1つ分の学習を行い、必要なら推論側へ公開する"""
+        self._prepare()
+        sequences = torch.tensor([s for s, _ in batch], dtype=torch.long)
+        inputs = nn.functional.one_hot(sequences, num_classes=3).float()
+        targets = torch.tensor([t for _, t in batch], dtype=torch.long)
+
+        self.model.train()
+        self.optimizer.zero_grad()
+        loss = self.criterion(self.model(inputs), targets)
+        loss.backward()
+        self.optimizer.step()
+
+        with self._metrics_lock:
+            self.steps += 1
+            self.samples += len(batch)
+            self.last_loss = loss.item()
+        if self.steps % self.publish_every == 0:
+            self._publish()
+
+    def _publish(self):
+        snapshot = copy.deepcopy(self.model)
+        snapshot.eval()
+        snapshot.requires_grad_(False)
+        version = f"{self.base_version}+online{self.steps}"
+        set_shared_lstm(snapshot, version=version)
+        with self._metrics_lock:
+            self.version = version
+
+
+_trainer = None
+_trainer_lock = threading.Lock()
+
+
+def get_trainer(**options):
+    """プロセス内で共有する BackgroundTrainer (初回呼び出し時に options で作成)"""
+    global _trainer
+    with _trainer_lock:
+        if _trainer is None:
+            _trainer = BackgroundTrainer(**options)
+        return _trainer
+
+
+def trainer_metrics():
+    return _trainer.metrics() if _trainer is not None else None
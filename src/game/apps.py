@@ -4,3 +4,27 @@ from django.apps import AppConfig
 class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'game'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.models.signals import post_migrate
+
+        # flush (テストの後始末など) でテーブルが空になったら戦略名のキャッシュも捨てる
+        post_migrate.connect(_clear_strategy_cache, sender=self)
+
+        # 学習済みRNNの重みは起動時に一度だけ読み込み、ワーカー間で共有する
+        # (gunicorn --preload ならマスタープロセスで読み込んでから fork される)
+        weights = getattr(settings, "RPS_RNN_WEIGHTS", None)
+        if weights:
+            from .ai.shared import load_shared_lstm
+            load_shared_lstm(weights, mode=getattr(settings, "RPS_RNN_WEIGHTS_SHARING", "mmap"))
+
+        # モデルレジストリがあれば有効な版を読み込む (以降はリクエストの合間に切り替わりを確認する)
+        if getattr(settings, "RPS_MODEL_REGISTRY", None):
+            from .engine import refresh_models
+            refresh_models(force=True)
+
+
+def _clear_strategy_cache(**kwargs):
+    from .models import Strategy
+    Strategy.clear_cache()
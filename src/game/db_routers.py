@@ -0,0 +1,72 @@
+"""
+対戦 (書き込み) と分析系の読み取りを別のDBに分けるためのルーター。
+
+分析・エクスポート・統計のコードは analytics_reads() の中で読み取りを行う。
+DATABASES に "analytics" が設定されていればそちら (読み取り専用の複製) から読み、
+なければ従来通り default を使う。書き込みは常に default に向ける。
+複製は sync_analytics_db コマンド (SQLite のオンラインバックアップ) で更新する。
+"""
+import contextvars
+import os
+import sqlite3
+from contextlib import contextmanager
+
+from django.conf import settings
+
+ANALYTICS_DB = "analytics"
+
+_analytics_reads = contextvars.ContextVar("rps_analytics_reads", default=False)
+
+
+def analytics_configured():
+    return ANALYTICS_DB in settings.DATABASES
+
+
+@contextmanager
+def analytics_reads():
+    """このブロック内の読み取りを分析用DBへ向ける"""
+    token = _analytics_reads.set(True)
+    try:
+        yield
+    finally:
+        _analytics_reads.reset(token)
+
+
+class AnalyticsRouter:
+    def db_for_read(self, model, **hints):
+        if _analytics_reads.get() and analytics_configured():
+            return ANALYTICS_DB
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 複製は default と同じ内容なので、どちらから読んだオブジェクト同士も関連付けてよい
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+def copy_sqlite_database(source, target, pages=256, sleep=0.01):
+    """
+    SQLite のオンラインバックアップで source を target に複製する。
+
+    pages ページごとにロックを手放しながらコピーするため、その間も source への書き込みは進められる。
+    一時ファイルにコピーしてから置き換えるので、target を読んでいる側が書きかけの状態を見ることはない。
+    """
+    tmp = f"{target}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    src = sqlite3.connect(source)
+    try:
+        dst = sqlite3.connect(tmp)
+        try:
+            src.backup(dst, pages=pages, sleep=sleep)
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    os.replace(tmp, target)
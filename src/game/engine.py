@@ -0,0 +1,378 @@
+"""
+1ラウンドの対戦処理 (履歴の取得・AIの準備・勝敗判定・保存)。
+HTTP の play_view と WebSocket セッションの両方から使う。
+"""
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Player, GameLog, PlayerSummary, MOVE_LABELS, RESULT_LABELS
+from . import stats
+from .writer import run_write
+from .ai.strategy import StrategySelector
+from .ai.safety import SafetyMechanism
+from .ai.shared import get_shared_lstm, load_shared_lstm
+from .ai.registry import ModelRegistry, RegistryWatcher
+from .ai.trainer import get_trainer
+from .ai.memo import PredictionCache, get_prediction_cache
+from .ai.opening import load_opening_book
+from .ai.population import NgramIndex, load_population_index
+
+# ウォームアップに使う直近の履歴数 (RPS_WARMUP_ROUNDS で変更できる)
+WARMUP_ROUNDS = 50
+
+# 序盤定跡で手を決めたときの戦略名
+OPENING_BOOK_STRATEGY = "OpeningBook"
+
+# モデルレジストリ上の成果物の名前
+RNN_MODEL = "rnn"
+OPENING_BOOK_MODEL = "opening_book"
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+# プレイヤーごとの ContextTreePredictor の状態 (context_tree_store を参照)
+_context_trees = None
+_context_trees_lock = threading.Lock()
+
+
+def get_or_create_player(player_id):
+    """IDからPlayerを取得する。存在しない・無効なIDなら新規作成する"""
+    player = None
+    if player_id:
+        try:
+            player = Player.objects.get(id=player_id)
+        except Player.DoesNotExist:
+            pass # Invalid IDなら新規作成へ
+    if not player:
+        player = Player.objects.create()
+    return player
+
+
+def load_history(player):
+    """現在の世代の履歴を古い順に取得する (AI入力用)"""
+    logs = GameLog.objects.current(player).order_by('timestamp').values_list("user_move_code", "result_code")
+    return [{"user_move": MOVE_LABELS[move], "result": RESULT_LABELS[result]} for move, result in logs]
+
+
+def _load_rnn(path, version):
+    load_shared_lstm(path, mode=getattr(settings, "RPS_RNN_WEIGHTS_SHARING", "mmap"), version=version)
+
+
+def _load_opening_book(path, version):
+    load_opening_book(str(path))
+
+
+def model_watcher():
+    """モデルレジストリの監視 (RPS_MODEL_REGISTRY が未設定なら None)"""
+    global _watcher
+    root = getattr(settings, "RPS_MODEL_REGISTRY", None)
+    if not root:
+        return None
+    with _watcher_lock:
+        if _watcher is None or _watcher.registry.root != Path(root):
+            _watcher = RegistryWatcher(
+                ModelRegistry(root),
+                {RNN_MODEL: _load_rnn, OPENING_BOOK_MODEL: _load_opening_book},
+                interval=getattr(settings, "RPS_MODEL_REGISTRY_POLL_INTERVAL", 2.0),
+            )
+        return _watcher
+
+
+def refresh_models(force=False):
+    """
+    レジストリで有効な版が切り替わっていれば読み込み直す (リクエストの合間に呼ぶ)。
+    共有モデルは参照ごと差し替えるので、処理中のリクエストは読み込み前のモデルを使い続ける。
+    """
+    watcher = model_watcher()
+    if watcher is not None:
+        watcher.poll(force=force)
+
+
+def model_metrics():
+    watcher = _watcher if getattr(settings, "RPS_MODEL_REGISTRY", None) else None
+    return {
+        "rnn_version": get_shared_lstm()[0],
+        "registry": watcher.metrics() if watcher is not None else None,
+    }
+
+
+def opening_move(player, history):
+    """
+    序盤定跡が設定されていて、まだ序盤のプレイヤーなら (定跡の手, 定跡表の版) を返す (なければ (None, None))。
+    圧縮などで履歴が欠けているプレイヤーには使わない。
+    レジストリに定跡表が登録されていれば、RPS_OPENING_BOOK よりそちらを優先する
+    (版はレジストリから読み込んだ定跡表のときだけ返す)。
+    """
+    watcher = model_watcher()
+    if watcher is not None and OPENING_BOOK_MODEL in watcher.loaded:
+        version, path = watcher.loaded[OPENING_BOOK_MODEL]
+    else:
+        version, path = None, getattr(settings, "RPS_OPENING_BOOK", None)
+    if not path or len(history) != player.total_games:
+        return None, None
+    move = load_opening_book(str(path)).lookup(history)
+    return move, version if move else None
+
+
+def population_index():
+    """全プレイヤー共通の n-gram 索引 (RPS_POPULATION_INDEX が未設定なら None)"""
+    path = getattr(settings, "RPS_POPULATION_INDEX", None)
+    if not path:
+        return None
+    return load_population_index(str(path), order=getattr(settings, "RPS_POPULATION_ORDER", 6))
+
+
+def recent_moves(history):
+    """n-gram 索引の更新に使う直前の手の並び (索引が未設定なら空)"""
+    index = population_index()
+    if index is None or index.order < 2:
+        return []
+    return [h["user_move"] for h in history[-(index.order - 1):]]
+
+
+def prediction_cache():
+    """プレイヤー間で共有する予測のキャッシュ (RPS_PREDICTION_CACHE_SIZE が 0 なら None)"""
+    size = getattr(settings, "RPS_PREDICTION_CACHE_SIZE", 0)
+    if not size:
+        return None
+    return get_prediction_cache(max_entries=size, ttl=getattr(settings, "RPS_PREDICTION_CACHE_TTL", 600))
+
+
+def build_selector(player, parallel=True, degradation_level=0, history=None):
+    """
+    設定に従って StrategySelector を作り、圧縮済み履歴のサマリーがあれば渡す。
+    parallel=False なら予測器を呼び出し元のスレッドで直列に実行する (プロファイル時など)。
+    degradation_level が 0 より大きければ、そのレベルに応じて予測器を減らす。
+    history を渡すと、保存しておいた ContextTreePredictor の状態を引き継ぐ (save_context_tree を参照)。
+    """
+    rnn_version, rnn_model = get_shared_lstm()
+    selector = StrategySelector(
+        deadlines=getattr(settings, "RPS_PREDICTOR_DEADLINES", None) if parallel else None,
+        max_workers=getattr(settings, "RPS_PREDICTOR_WORKERS", 8),
+        rnn_model=rnn_model,
+        population_index=population_index(),
+        rnn_version=rnn_version,
+        prediction_cache=prediction_cache(),
+        **{**pruning_options(), **getattr(settings, "RPS_SELECTOR_OPTIONS", {})},
+    )
+    if degradation_level:
+        selector.degrade(degradation_level)
+    if background_training() and "RNN" in selector.predictors:
+        # RNN の学習はバックグラウンドの学習スレッドに任せる (submit_training を参照)
+        selector.predictors["RNN"].train_online = False
+    summary = PlayerSummary.objects.filter(player=player, epoch=player.epoch).first()
+    if summary:
+        selector.seed(summary)
+    if history is not None:
+        restore_context_tree(selector, player, history)
+    return selector
+
+
+def context_tree_store():
+    """プレイヤーごとの ContextTreePredictor の状態の保存先 (RPS_CONTEXT_TREE_CACHE_SIZE が 0 なら None)"""
+    global _context_trees
+    size = getattr(settings, "RPS_CONTEXT_TREE_CACHE_SIZE", 0)
+    if not size:
+        return None
+    with _context_trees_lock:
+        if _context_trees is None:
+            _context_trees = PredictionCache(
+                max_entries=size, ttl=getattr(settings, "RPS_CONTEXT_TREE_CACHE_TTL", 3600)
+            )
+        return _context_trees
+
+
+def _context_tree_key(player, history):
+    # 圧縮で古いログが消えると履歴の位置がずれるので、欠けている手数もキーに含める
+    return (str(player.id), player.epoch, player.total_games - len(history))
+
+
+def restore_context_tree(selector, player, history):
+    """
+    保存しておいた状態を ContextTreePredictor に渡す。ウォームアップの後、本番の予測で
+    全履歴から木を作り直す代わりに、保存時からの差分だけを取り込むようになる。
+    """
+    store = context_tree_store()
+    predictor = selector.predictors.get("ContextTree")
+    if store is None or predictor is None:
+        return
+    found, checkpoint = store.get(_context_tree_key(player, history))
+    if found:
+        predictor.checkpoint = checkpoint
+
+
+def save_context_tree(selector, player, history):
+    """
+    本番の予測で全履歴を取り込んだ ContextTreePredictor の状態を保存する。
+    apply_result でカウンタを進める前に呼ぶこと。
+    """
+    store = context_tree_store()
+    predictor = selector.predictors.get("ContextTree")
+    if store is None or predictor is None:
+        return
+    running = selector.running.get("ContextTree")
+    # 締め切りを過ぎてまだ実行中なら、書き換え途中の木は保存しない
+    if (running is not None and not running.done()) or predictor.seen != len(history):
+        return
+    store.put(_context_tree_key(player, history), predictor.dumps())
+
+
+def context_tree_metrics():
+    return _context_trees.metrics() if _context_trees is not None else None
+
+
+def pruning_options():
+    """RPS_PREDICTOR_PRUNING を StrategySelector の引数にする (未設定なら刈り込まない)"""
+    pruning = getattr(settings, "RPS_PREDICTOR_PRUNING", None)
+    if not pruning:
+        return {}
+    return {
+        "prune_margin": pruning.get("margin", 5),
+        "prune_patience": pruning.get("patience", 10),
+        "prune_probe_interval": pruning.get("probe_interval", 20),
+    }
+
+
+def background_training():
+    return getattr(settings, "RPS_RNN_BACKGROUND_TRAINING", False)
+
+
+def submit_training(history, user_move):
+    """
+    バックグラウンド学習が有効なら、今回のラウンド (直前の手の並び → user_move) を
+    学習用のサンプルとしてキューに積む。学習自体はリクエストの外で行われる。
+    """
+    if not background_training():
+        return
+    options = getattr(settings, "RPS_SELECTOR_OPTIONS", {})
+    trainer = get_trainer(
+        # 本番の RNNPredictor と同じ手数の並び・同じ大きさのモデルで学習する
+        seq_length=options.get("rnn_seq_length", 10),
+        hidden_size=options.get("rnn_hidden_size", 32),
+        batch_size=getattr(settings, "RPS_RNN_TRAINER_BATCH_SIZE", 64),
+        max_queue=getattr(settings, "RPS_RNN_TRAINER_MAX_QUEUE", 10000),
+        max_wait=getattr(settings, "RPS_RNN_TRAINER_MAX_WAIT", 0.05),
+        publish_every=getattr(settings, "RPS_RNN_TRAINER_PUBLISH_EVERY", 50),
+    )
+    trainer.submit([h["user_move"] for h in history[-trainer.seq_length:]] + [user_move])
+
+
+def build_safety():
+    """設定 (RPS_SAFETY_OPTIONS) に従って SafetyMechanism を作る"""
+    return SafetyMechanism(**getattr(settings, "RPS_SAFETY_OPTIONS", {}))
+
+
+def warm_up(selector, history, rounds=None):
+    """
+    過去の時点でどう予測したかをシミュレートしてスコアを復元する。
+    正確な再現は計算コストが高いので、直近 WARMUP_ROUNDS 件で「直近の傾向」だけ掴ませる。
+    再生はスレッドプールを使わず直列に行う (締め切りは本番の予測にだけ適用する)。
+    """
+    if rounds is None:
+        rounds = getattr(settings, "RPS_WARMUP_ROUNDS", WARMUP_ROUNDS)
+    warmup_history = history[-rounds:] if rounds > 0 else []
+    temp_hist = []
+    for h in warmup_history:
+        # select_moveを呼ばないとlast_strategy_movesがセットされない
+        selector.select_move(temp_hist, parallel=False)
+        selector.update_scores(h["user_move"])
+        temp_hist.append(h)
+
+
+def decide(selector, safety, history):
+    """今回のAIの手と、使った戦略名を返す (安全策の介入を含む)"""
+    ai_move, strategy_name = selector.select_move(history)
+
+    override_move, override_strategy = safety.check_override(history)
+    if override_move:
+        ai_move = override_move
+        strategy_name = override_strategy
+    return ai_move, strategy_name
+
+
+def judge(user_move, ai_move):
+    """ユーザーから見た勝敗 ("win", "lose", "draw")"""
+    if user_move == ai_move:
+        return "draw"
+    if (user_move, ai_move) in (("R", "S"), ("P", "R"), ("S", "P")):
+        return "win"
+    return "lose"
+
+
+# 勝敗ごとに加算する Player のカウンタ
+RESULT_COUNTERS = {"win": "wins", "lose": "losses", "draw": "draws"}
+
+
+def apply_result(player, result):
+    """Playerのカウンタに結果を反映する (保存はしない)"""
+    if result == "win":
+        player.wins += 1
+    elif result == "lose":
+        player.losses += 1
+    else:
+        player.draws += 1
+    player.total_games += 1
+
+
+def persist_round(player, user_move, ai_move, result, strategy_name, previous_moves=()):
+    """
+    Player・GameLog・集計テーブルを1トランザクションで保存する。
+    単一ライターモードでは専用スレッドが他のリクエスト分とまとめてコミットする。
+    previous_moves (recent_moves の戻り値) を渡すと、コミット後に n-gram 索引へ今回の手を加える。
+    player を読み込んだ後にリセットされていれば何も保存せず False を返す。
+    """
+    return run_write(_persist_round, player, user_move, ai_move, result, strategy_name, previous_moves)
+
+
+def _persist_round(player, user_move, ai_move, result, strategy_name, previous_moves=()):
+    with transaction.atomic():
+        # カウンタは DB 上で加算する。読み込み時の世代でなければ (リセット済みなら)
+        # 古い値を書き戻さないよう、ログも集計も保存しない
+        updated = Player.objects.filter(pk=player.pk, epoch=player.epoch).update(
+            total_games=F("total_games") + 1,
+            **{RESULT_COUNTERS[result]: F(RESULT_COUNTERS[result]) + 1},
+        )
+        if not updated:
+            return False
+        GameLog.objects.create(
+            player=player,
+            epoch=player.epoch,
+            round_number=player.total_games,
+            user_move=user_move,
+            ai_move=ai_move,
+            result=result,
+            strategy_used=strategy_name
+        )
+        stats.record_round(player, result, strategy_name)
+        index = population_index()
+        if index is not None:
+            moves = NgramIndex.encode([*previous_moves, user_move])
+            transaction.on_commit(lambda: index.add(moves))
+    return True
+
+
+def round_payload(player, result, ai_move, strategy_name, model_version=None):
+    """
+    play API と同じ形式のレスポンス。model_version はこのラウンドの手を決めたモデルの版
+    (定跡表で決めたラウンドはレジストリの定跡表の版、それ以外は RNN の重みの版)
+    """
+    decided = player.wins + player.losses
+    return {
+        "result": result,
+        "ai_move": ai_move,
+        "player_id": str(player.id),
+        "stats": {
+            "total": player.total_games,
+            "wins": player.wins,
+            "losses": player.losses,
+            "draws": player.draws,
+            "win_rate": player.wins / decided if decided > 0 else 0,
+            "ai_win_rate": player.losses / decided if decided > 0 else 0
+        },
+        "strategy": strategy_name,
+        "model_version": model_version,
+    }
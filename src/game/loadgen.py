@@ -0,0 +1,306 @@
+import json
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+MOVES = ["R", "P", "S"]
+BEATS = {"R": "P", "P": "S", "S": "R"}
+
+
+# --- 擬似プレイヤーの手の出し方 ---
+
+class MoveBehavior(ABC):
+    """擬似プレイヤーの手の出し方の基底クラス"""
+    name = "base"
+
+    @abstractmethod
+    def next_move(self, last_move, last_response):
+        """
+        次に出す手 ("R", "P", "S") を返す
+
+        Args:
+            last_move (str | None): 前回出した手 (初回は None)
+            last_response (dict | None): 前回のラウンドのレスポンス
+        """
+        pass
+
+
+class RandomBehavior(MoveBehavior):
+    """完全ランダム"""
+    name = "random"
+
+    def next_move(self, last_move, last_response):
+        return random.choice(MOVES)
+
+
+class ConstantBehavior(MoveBehavior):
+    """常に同じ手 (Anti-Spam の発動を誘発する)"""
+    name = "constant"
+
+    def __init__(self):
+        self.move = random.choice(MOVES)
+
+    def next_move(self, last_move, last_response):
+        return self.move
+
+
+class CycleBehavior(MoveBehavior):
+    """R -> P -> S の循環"""
+    name = "cycle"
+
+    def __init__(self):
+        self.index = random.randrange(3)
+
+    def next_move(self, last_move, last_response):
+        move = MOVES[self.index % 3]
+        self.index += 1
+        return move
+
+
+class BiasedBehavior(MoveBehavior):
+    """特定の手に偏る (7割)"""
+    name = "biased"
+
+    def __init__(self, bias=0.7):
+        self.favorite = random.choice(MOVES)
+        self.bias = bias
+
+    def next_move(self, last_move, last_response):
+        if random.random() < self.bias:
+            return self.favorite
+        return random.choice(MOVES)
+
+
+class WinStayLoseShiftBehavior(MoveBehavior):
+    """勝ったら同じ手、負けたらAIの手に勝つ手へ切り替える"""
+    name = "wsls"
+
+    def next_move(self, last_move, last_response):
+        if not last_move or not last_response:
+            return random.choice(MOVES)
+        if last_response.get("result") == "win":
+            return last_move
+        return BEATS.get(last_response.get("ai_move"), random.choice(MOVES))
+
+
+BEHAVIORS = {
+    cls.name: cls
+    for cls in (RandomBehavior, ConstantBehavior, CycleBehavior, BiasedBehavior, WinStayLoseShiftBehavior)
+}
+
+
+def build_behavior(name, index):
+    """名前から手の出し方を生成する。"mixed" はプレイヤーごとに順番に割り当てる"""
+    if name == "mixed":
+        names = sorted(BEHAVIORS)
+        name = names[index % len(names)]
+    return BEHAVIORS[name]()
+
+
+# --- 送信先 ---
+
+class InProcessTransport:
+    """Django テストクライアント経由でプロセス内のアプリを直接叩く"""
+    def __init__(self, path="/api/play/"):
+        from django.conf import settings
+        from django.test import Client
+
+        host = next((h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"), "localhost")
+        self.client = Client(raise_request_exception=False, HTTP_HOST=host)
+        self.path = path
+
+    def post(self, payload):
+        response = self.client.post(self.path, payload, content_type="application/json")
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+    def close(self):
+        from django.db import connections
+        connections.close_all()
+
+
+class HttpTransport:
+    """ローカルで起動済みのサーバーに HTTP で送信する"""
+    def __init__(self, url, timeout=30.0):
+        self.url = url
+        self.timeout = timeout
+
+    def post(self, payload):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, json.loads(response.read() or b"null")
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+    def close(self):
+        pass
+
+
+# --- 集計 ---
+
+def percentile(sorted_values, q):
+    """ソート済みリストの q パーセンタイル (nearest-rank)"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-q * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples, elapsed):
+    """(latency_ms, ok) のリストから統計を算出する"""
+    latencies = sorted(s[0] for s in samples)
+    errors = sum(1 for s in samples if not s[1])
+    count = len(samples)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": errors / count if count else 0,
+        "throughput_rps": count / elapsed if elapsed > 0 else 0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else None,
+    }
+
+
+class LoadResult:
+    """全プレイヤーの計測結果 (スレッドセーフ)"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (round_index, started_at, latency_ms, ok)
+        self.samples = []
+
+    def add(self, round_index, started_at, latency_ms, ok):
+        with self._lock:
+            self.samples.append((round_index, started_at, latency_ms, ok))
+
+    def report(self, elapsed, window):
+        """
+        全体の統計と、履歴長 (ラウンド番号) ごとのウィンドウ統計を返す。
+        プレイヤーの履歴が伸びるにつれてレイテンシがどう変化するかを見るためのもの。
+        """
+        buckets = {}
+        for round_index, started_at, latency_ms, ok in self.samples:
+            buckets.setdefault(round_index // window, []).append((started_at, latency_ms, ok))
+
+        timeline = []
+        for bucket in sorted(buckets):
+            rows = buckets[bucket]
+            span = max(r[0] + r[1] / 1000 for r in rows) - min(r[0] for r in rows)
+            stats = summarize([(r[1], r[2]) for r in rows], span)
+            stats["rounds"] = [bucket * window + 1, (bucket + 1) * window]
+            timeline.append(stats)
+
+        return {
+            "overall": summarize([(s[2], s[3]) for s in self.samples], elapsed),
+            "by_history_length": timeline,
+        }
+
+
+# --- 実行 ---
+
+def run_player(index, transport_factory, behavior_name, rounds, think_time, result, start_time):
+    """1人の擬似プレイヤーを rounds 回プレイさせる"""
+    transport = transport_factory()
+    behavior = build_behavior(behavior_name, index)
+    player_id = None
+    last_move = None
+    last_response = None
+    try:
+        for round_index in range(rounds):
+            move = behavior.next_move(last_move, last_response)
+            payload = {"move": move}
+            if player_id:
+                payload["player_id"] = player_id
+
+            started = time.perf_counter()
+            try:
+                status, body = transport.post(payload)
+            except Exception:
+                status, body = None, None
+            latency_ms = (time.perf_counter() - started) * 1000
+
+            ok = status == 200 and isinstance(body, dict)
+            result.add(round_index, started - start_time, latency_ms, ok)
+            if ok:
+                player_id = body.get("player_id", player_id)
+                last_move, last_response = move, body
+
+            if think_time > 0:
+                # 思考時間は ±50% の揺らぎを持たせる
+                time.sleep(think_time * random.uniform(0.5, 1.5))
+    finally:
+        transport.close()
+
+
+def git_revision():
+    """比較用に現在のコードのリビジョンを返す (取得できなければ None)"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_load(players, rounds, concurrency, behavior, think_time=0.0, url=None, window=10):
+    """
+    負荷テストを実行してレポート (dict) を返す
+
+    Args:
+        players (int): 擬似プレイヤー数
+        rounds (int): 1プレイヤーあたりのラウンド数
+        concurrency (int): 同時に動かすプレイヤー数 (スレッド数)
+        behavior (str): 手の出し方 (BEHAVIORS のキー、または "mixed")
+        think_time (float): ラウンド間の平均待ち時間 (秒)
+        url (str | None): 指定があればそのURLへHTTP送信、なければプロセス内で実行
+        window (int): 履歴長ごとの集計幅 (ラウンド数)
+    """
+    if url:
+        transport_factory = lambda: HttpTransport(url)
+    else:
+        transport_factory = InProcessTransport
+
+    result = LoadResult()
+    started_at = datetime.now(timezone.utc)
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(run_player, i, transport_factory, behavior, rounds, think_time, result, start_time)
+            for i in range(players)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start_time
+
+    report = result.report(elapsed, window)
+    report["config"] = {
+        "players": players,
+        "rounds": rounds,
+        "concurrency": concurrency,
+        "behavior": behavior,
+        "think_time": think_time,
+        "target": url or "in-process",
+        "window": window,
+    }
+    report["meta"] = {
+        "started_at": started_at.isoformat(),
+        "elapsed_s": elapsed,
+        "git_revision": git_revision(),
+    }
+    return report
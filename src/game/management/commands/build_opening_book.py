@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from game.models import GameLog, MOVE_LABELS
+from game.db_routers import analytics_reads
+from game.ai.opening import OpeningBook
+
+
+class Command(BaseCommand):
+    help = "全プレイヤーの序盤の手順を集計し、新規プレイヤー向けの定跡ファイルを作る"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="書き出す定跡ファイルのパス (.npz)")
+        parser.add_argument("--depth", type=int, default=5, help="定跡を使う手数 (この手数未満の履歴に適用)")
+        parser.add_argument("--min-count", type=int, default=20, help="手を登録するのに必要な出現回数")
+
+    def handle(self, *args, **options):
+        depth = options["depth"]
+        if not 1 <= depth <= 12:
+            raise CommandError("--depth は1から12の範囲で指定してください")
+
+        sequences = {}
+        logs = (
+            GameLog.objects.filter(round_number__lte=depth)
+            .order_by("player_id", "epoch", "round_number")
+            .values_list("player_id", "epoch", "round_number", "user_move_code")
+        )
+        with analytics_reads():
+            for player_id, epoch, round_number, move in logs.iterator(chunk_size=10000):
+                sequence = sequences.setdefault((player_id, epoch), [])
+                # 圧縮などで序盤が欠けている世代は使わない
+                if len(sequence) == round_number - 1:
+                    sequence.append(MOVE_LABELS[move])
+
+        book = OpeningBook.build(sequences.values(), depth, min_count=options["min_count"])
+        book.save(options["output"])
+
+        filled = int((book.table >= 0).sum())
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(sequences)} openings, {filled}/{len(book.table)} entries written to {options['output']}"
+        ))
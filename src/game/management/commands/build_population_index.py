@@ -0,0 +1,58 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.models import GameLog
+from game.db_routers import analytics_reads
+from game.ai.population import NgramIndex
+
+
+class Command(BaseCommand):
+    help = "全プレイヤーの手の並びから n-gram 出現回数の索引ファイルを作る"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="書き出す索引ファイルのパス (.npy)")
+        parser.add_argument("--order", type=int, default=6, help="数える手順の最大長")
+
+    def handle(self, *args, **options):
+        order = options["order"]
+        if not 1 <= order <= 12:
+            raise CommandError("--order は1から12の範囲で指定してください")
+
+        # 一時ファイルをメモリマップで開いて数え、書き終えてから出力先と置き換える
+        output = options["output"]
+        tmp = f"{output}.building"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        index = NgramIndex.open(tmp, order=order)
+        sequences = 0
+        sequence = []
+        current = None
+
+        def add_sequence(sequence):
+            nonlocal sequences
+            if sequence:
+                index.add_sequence(sequence)
+                sequences += 1
+
+        logs = (
+            GameLog.objects.order_by("player_id", "epoch", "round_number")
+            .values_list("player_id", "epoch", "user_move_code")
+        )
+        # 手のコード (Move) は索引の手のインデックスと同じ並びなのでそのまま使う
+        with analytics_reads():
+            for player_id, epoch, move in logs.iterator(chunk_size=10000):
+                if (player_id, epoch) != current:
+                    add_sequence(sequence)
+                    current = (player_id, epoch)
+                    sequence = []
+                sequence.append(move)
+            add_sequence(sequence)
+
+        # 最後に加算した分がディスクに書かれてから置き換える。
+        # 稼働中のワーカーは古いファイルを開いたままなので、置き換え後は再起動して読み直す
+        index.flush()
+        os.replace(tmp, output)
+        self.stdout.write(self.style.SUCCESS(
+            f"{int(index.counts[0])} moves from {sequences} sequences written to {output}"
+        ))
@@ -0,0 +1,97 @@
+import json
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from game.models import Player, GameLog, PlayerSummary
+
+
+class Command(BaseCommand):
+    help = "保持期間を過ぎた GameLog をプレイヤーごとのサマリーに畳み込み、元の行をバッチ削除する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-rounds", type=int, default=500, help="プレイヤーごとに生の行として残す直近ラウンド数")
+        parser.add_argument("--older-than-days", type=int, default=None, help="指定日数より古い行のみ圧縮する")
+        parser.add_argument("--batch-size", type=int, default=1000, help="1トランザクションで処理する行数")
+        parser.add_argument("--archive-dir", default=None, help="削除前に生の行を JSON Lines で書き出すディレクトリ")
+        parser.add_argument("--dry-run", action="store_true", help="対象件数を表示するだけで変更しない")
+
+    def handle(self, *args, **options):
+        keep = options["keep_rounds"]
+        batch_size = options["batch_size"]
+        if keep < 0 or batch_size < 1:
+            raise CommandError("--keep-rounds は0以上、--batch-size は1以上を指定してください")
+
+        cutoff = None
+        if options["older_than_days"] is not None:
+            cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+
+        archive = None
+        if options["archive_dir"] and not options["dry_run"]:
+            archive_dir = Path(options["archive_dir"])
+            archive_dir.mkdir(parents=True, exist_ok=True)
+            archive = open(archive_dir / f"gamelog-{timezone.now():%Y%m%d%H%M%S}.jsonl", "a", encoding="utf-8")
+
+        players = Player.objects.filter(total_games__gt=keep).only("id", "total_games", "epoch")
+        total = 0
+        try:
+            for player in players.iterator():
+                horizon = player.total_games - keep
+                compacted = self._compact_player(player, horizon, cutoff, batch_size, archive, options["dry_run"])
+                if compacted:
+                    total += compacted
+                    self.stdout.write(f"{player.id}: {compacted} rounds compacted")
+        finally:
+            if archive:
+                archive.close()
+
+        verb = "would be" if options["dry_run"] else "were"
+        self.stdout.write(self.style.SUCCESS(f"{total} rounds {verb} compacted"))
+
+    def _compact_player(self, player, horizon, cutoff, batch_size, archive, dry_run):
+        """horizon 以前のラウンドをバッチ単位でサマリーへ移す (中断しても続きから再開できる)"""
+        if dry_run:
+            summary = PlayerSummary.objects.filter(player=player, epoch=player.epoch).first()
+            return self._pending(player, summary.last_round_number if summary else 0, horizon, cutoff).count()
+
+        compacted = 0
+        while True:
+            with transaction.atomic():
+                summary, _ = PlayerSummary.objects.get_or_create(player=player, defaults={"epoch": player.epoch})
+                if summary.epoch != player.epoch:
+                    # リセット前の世代のサマリーは破棄して作り直す
+                    summary.restart(player.epoch)
+                logs = self._pending(player, summary.last_round_number, horizon, cutoff)
+                batch = list(logs.select_related("strategy").order_by("round_number")[:batch_size])
+                if not batch:
+                    if summary.compacted_rounds == 0:
+                        summary.delete()
+                    return compacted
+
+                summary.fold(batch)
+                summary.save()
+                if archive:
+                    for log in batch:
+                        archive.write(json.dumps({
+                            "player_id": str(player.id),
+                            "round_number": log.round_number,
+                            "user_move": log.user_move,
+                            "ai_move": log.ai_move,
+                            "result": log.result,
+                            "strategy_used": log.strategy_used,
+                            "timestamp": log.timestamp.isoformat(),
+                        }) + "\n")
+                GameLog.objects.filter(id__in=[log.id for log in batch]).delete()
+                compacted += len(batch)
+
+    def _pending(self, player, last_round_number, horizon, cutoff):
+        logs = GameLog.objects.current(player).filter(
+            round_number__gt=last_round_number,
+            round_number__lte=horizon,
+        )
+        if cutoff is not None:
+            logs = logs.filter(timestamp__lt=cutoff)
+        return logs
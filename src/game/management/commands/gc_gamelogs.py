@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from game.models import GameLog, PlayerSummary
+
+
+class Command(BaseCommand):
+    help = "リセットで参照されなくなった古い世代の GameLog / PlayerSummary を少しずつ削除する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="1トランザクションで削除する行数")
+        parser.add_argument("--max-batches", type=int, default=None, help="この回数で打ち切る (省略時は全件)")
+        parser.add_argument("--sleep", type=float, default=0.0, help="バッチ間の待ち時間 (秒)。書き込みロックを譲るため")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size は1以上を指定してください")
+
+        deleted = 0
+        batches = 0
+        while options["max_batches"] is None or batches < options["max_batches"]:
+            with transaction.atomic():
+                ids = list(GameLog.objects.stale().values_list("id", flat=True)[:batch_size])
+                if not ids:
+                    break
+                GameLog.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+            batches += 1
+            if options["sleep"] > 0:
+                time.sleep(options["sleep"])
+
+        summaries, _ = PlayerSummary.objects.filter(epoch__lt=F("player__epoch")).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{deleted} stale rounds and {summaries} stale summaries deleted in {batches} batches"
+        ))
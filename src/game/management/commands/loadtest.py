@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.loadgen import BEHAVIORS, run_load
+
+
+class Command(BaseCommand):
+    help = "api/play/ に擬似プレイヤーで負荷をかけ、スループット・エラー率・レイテンシ分布を計測する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", type=int, default=10, help="擬似プレイヤー数")
+        parser.add_argument("--rounds", type=int, default=50, help="1プレイヤーあたりのラウンド数")
+        parser.add_argument("--concurrency", type=int, default=None, help="同時実行数 (省略時はプレイヤー数)")
+        parser.add_argument(
+            "--behavior",
+            default="mixed",
+            choices=sorted(BEHAVIORS) + ["mixed"],
+            help="擬似プレイヤーの手の出し方",
+        )
+        parser.add_argument("--think-time", type=float, default=0.0, help="ラウンド間の平均待ち時間 (秒)")
+        parser.add_argument("--url", default=None, help="送信先URL (例: http://127.0.0.1:8000/api/play/)。省略時はプロセス内で実行")
+        parser.add_argument("--window", type=int, default=10, help="履歴長ごとの集計幅 (ラウンド数)")
+        parser.add_argument("--output", default=None, help="結果を書き出すJSONファイル")
+
+    def handle(self, *args, **options):
+        if options["players"] < 1 or options["rounds"] < 1 or options["window"] < 1:
+            raise CommandError("--players, --rounds, --window は1以上を指定してください")
+
+        report = run_load(
+            players=options["players"],
+            rounds=options["rounds"],
+            concurrency=options["concurrency"] or options["players"],
+            behavior=options["behavior"],
+            think_time=options["think_time"],
+            url=options["url"],
+            window=options["window"],
+        )
+
+        overall = report["overall"]
+        self.stdout.write(
+            f"requests={overall['requests']} errors={overall['errors']} "
+            f"error_rate={overall['error_rate']:.2%} throughput={overall['throughput_rps']:.1f} req/s"
+        )
+        self.stdout.write(self._latency_line("overall", overall))
+        for window in report["by_history_length"]:
+            label = f"rounds {window['rounds'][0]}-{window['rounds'][1]}"
+            self.stdout.write(self._latency_line(label, window))
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def _latency_line(self, label, stats):
+        def fmt(value):
+            return "-" if value is None else f"{value:.1f}ms"
+        return (
+            f"{label:>16}: p50={fmt(stats['p50_ms'])} p95={fmt(stats['p95_ms'])} "
+            f"p99={fmt(stats['p99_ms'])} errors={stats['errors']}/{stats['requests']}"
+        )
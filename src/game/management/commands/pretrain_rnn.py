@@ -0,0 +1,76 @@
+import random
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from django.core.management.base import BaseCommand, CommandError
+
+from game.models import GameLog
+from game.db_routers import analytics_reads
+from game.ai.models import RPSLSTM
+from game.ai.shared import save_lstm_weights
+
+
+class Command(BaseCommand):
+    help = "全プレイヤーの GameLog から RPSLSTM を事前学習し、共有用の重みファイルを書き出す"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="書き出す重みファイルのパス")
+        parser.add_argument("--seq-length", type=int, default=10)
+        parser.add_argument("--hidden-size", type=int, default=32)
+        parser.add_argument("--epochs", type=int, default=3)
+        parser.add_argument("--batch-size", type=int, default=256)
+        parser.add_argument("--max-samples", type=int, default=200000, help="学習に使う (系列, 次の手) の最大数")
+
+    def handle(self, *args, **options):
+        seq_length = options["seq_length"]
+        with analytics_reads():
+            samples = self._collect_samples(seq_length, options["max_samples"])
+        if not samples:
+            raise CommandError("学習に使える履歴がありません")
+
+        inputs = torch.nn.functional.one_hot(torch.tensor([s[0] for s in samples]), num_classes=3).float()
+        targets = torch.tensor([s[1] for s in samples], dtype=torch.long)
+
+        model = RPSLSTM(input_size=3, hidden_size=options["hidden_size"], output_size=3)
+        optimizer = optim.Adam(model.parameters(), lr=0.01)
+        criterion = nn.CrossEntropyLoss()
+        batch_size = options["batch_size"]
+
+        model.train()
+        for epoch in range(options["epochs"]):
+            order = torch.randperm(len(samples))
+            total_loss = 0.0
+            for start in range(0, len(samples), batch_size):
+                batch = order[start:start + batch_size]
+                optimizer.zero_grad()
+                loss = criterion(model(inputs[batch]), targets[batch])
+                loss.backward()
+                optimizer.step()
+                total_loss += loss.item() * len(batch)
+            self.stdout.write(f"epoch {epoch + 1}: loss={total_loss / len(samples):.4f}")
+
+        save_lstm_weights(model, options["output"])
+        self.stdout.write(self.style.SUCCESS(f"{len(samples)} samples, weights written to {options['output']}"))
+
+    def _collect_samples(self, seq_length, max_samples):
+        """プレイヤーごとの手の並びから (直前 seq_length 手, 次の手) を切り出す"""
+        samples = []
+        sequence = []
+        current = None
+        logs = (
+            GameLog.objects.order_by("player_id", "epoch", "round_number")
+            .values_list("player_id", "epoch", "user_move_code")
+        )
+        # 手のコード (Move) は RPSLSTM の入力と同じ並び (R, P, S) なのでそのまま使う
+        for player_id, epoch, move in logs.iterator(chunk_size=10000):
+            if (player_id, epoch) != current:
+                current = (player_id, epoch)
+                sequence = []
+            if len(sequence) >= seq_length:
+                samples.append((sequence[-seq_length:], move))
+            sequence.append(move)
+
+        if len(samples) > max_samples:
+            samples = random.sample(samples, max_samples)
+        return samples
@@ -0,0 +1,48 @@
+import json
+import pstats
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "収集した play_view のプロファイルを合算し、時間のかかっている関数の上位を表示する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=None, help="プロファイルのディレクトリ (省略時は RPS_PROFILE_DIR)")
+        parser.add_argument("--top", type=int, default=20, help="表示する関数の数")
+        parser.add_argument("--sort", default="tottime", choices=["tottime", "cumulative", "ncalls"], help="並び順")
+        parser.add_argument("--player", default=None, help="指定したプレイヤーのプロファイルだけを集計する")
+
+    def handle(self, *args, **options):
+        directory = Path(options["dir"] or getattr(settings, "RPS_PROFILE_DIR", "profiles"))
+        if not directory.is_dir():
+            raise CommandError(f"{directory} が見つかりません")
+
+        profiles = []
+        metas = []
+        for meta_path in sorted(directory.glob("*.json")):
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if options["player"] and meta.get("player_id") != options["player"]:
+                continue
+            prof_path = meta_path.with_suffix(".prof")
+            if prof_path.exists():
+                profiles.append(str(prof_path))
+                metas.append(meta)
+
+        if not profiles:
+            raise CommandError("対象のプロファイルがありません")
+
+        elapsed = sorted(m["elapsed_ms"] for m in metas)
+        histories = [m.get("history_length", 0) for m in metas]
+        predictors = Counter(p for m in metas for p in m.get("predictors", []))
+        self.stdout.write(
+            f"{len(profiles)} profiles: elapsed median={elapsed[len(elapsed) // 2]:.1f}ms "
+            f"max={elapsed[-1]:.1f}ms, history length max={max(histories)}"
+        )
+        self.stdout.write("predictors: " + ", ".join(f"{name}={count}" for name, count in predictors.most_common()))
+
+        stats = pstats.Stats(*profiles, stream=self.stdout)
+        stats.strip_dirs().sort_stats(options["sort"]).print_stats(options["top"])
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from game.ai.registry import ModelRegistry, RegistryError
+
+
+class Command(BaseCommand):
+    help = "成果物 (RNN の重み・定跡表など) をモデルレジストリに新しい版として登録し、有効にする"
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", help="成果物の名前 (rnn / opening_book)")
+        parser.add_argument("path", help="登録するファイル")
+        parser.add_argument("--model-version", default=None, help="版の名前 (省略時は日時とチェックサムから作る)")
+        parser.add_argument("--no-activate", action="store_true", help="登録だけして有効にしない")
+        parser.add_argument("--registry", default=None, help="レジストリのディレクトリ (省略時は RPS_MODEL_REGISTRY)")
+
+    def handle(self, *args, **options):
+        root = options["registry"] or getattr(settings, "RPS_MODEL_REGISTRY", None)
+        if not root:
+            raise CommandError("RPS_MODEL_REGISTRY が設定されていません (--registry で指定できます)")
+
+        registry = ModelRegistry(root)
+        try:
+            version = registry.publish(
+                options["name"], options["path"], version=options["model_version"], activate=not options["no_activate"]
+            )
+        except (RegistryError, OSError) as e:
+            raise CommandError(str(e))
+
+        state = "published" if options["no_activate"] else "published and activated"
+        self.stdout.write(self.style.SUCCESS(f"{options['name']} {version} {state}"))
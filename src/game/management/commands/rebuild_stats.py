@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+
+from game.models import Player, GameLog, PlayerSummary, PlayerStats
+from game import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "現在の世代の GameLog / PlayerSummary から集計テーブル (PlayerStats / GlobalStats / StrategyUsage) を作り直す。"
+        "集計テーブルの追加前から対戦していたプレイヤーの分を反映するときに使う"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="一度に読み込むプレイヤー数")
+        parser.add_argument("--sleep", type=float, default=0.0, help="プレイヤー間の待ち時間 (秒)。書き込みロックを譲るため")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size は1以上を指定してください")
+
+        # 対戦記録か集計の行があるプレイヤーだけを対象にする (1人ずつ別のトランザクションで作り直す)
+        players = Player.objects.filter(
+            Exists(GameLog.objects.filter(player=OuterRef("pk")))
+            | Exists(PlayerSummary.objects.filter(player=OuterRef("pk")))
+            | Exists(PlayerStats.objects.filter(player=OuterRef("pk")))
+        ).only("id", "epoch")
+        count = 0
+        rounds = 0
+        for player in players.iterator(chunk_size=batch_size):
+            rounds += stats.rebuild_player(player)
+            count += 1
+            if options["sleep"] > 0:
+                time.sleep(options["sleep"])
+        stats.rebuild_global()
+
+        self.stdout.write(self.style.SUCCESS(f"Stats rebuilt for {count} players ({rounds} rounds)"))
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from game.ai.registry import ModelRegistry, RegistryError
+
+
+class Command(BaseCommand):
+    help = "モデルレジストリで有効な版を前の版 (または指定の版) に戻す"
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", help="成果物の名前 (rnn / opening_book)")
+        parser.add_argument("--to", default=None, help="戻す版 (省略時は現在の版の1つ前に登録された版)")
+        parser.add_argument("--list", action="store_true", help="登録済みの版を表示するだけで戻さない")
+        parser.add_argument("--registry", default=None, help="レジストリのディレクトリ (省略時は RPS_MODEL_REGISTRY)")
+
+    def handle(self, *args, **options):
+        root = options["registry"] or getattr(settings, "RPS_MODEL_REGISTRY", None)
+        if not root:
+            raise CommandError("RPS_MODEL_REGISTRY が設定されていません (--registry で指定できます)")
+
+        registry = ModelRegistry(root)
+        name = options["name"]
+        if options["list"]:
+            current = registry.current(name)
+            for manifest in registry.versions(name):
+                marker = "*" if manifest["version"] == current else " "
+                self.stdout.write(f"{marker} {manifest['version']}  {manifest['published_at']}  sha256={manifest['sha256'][:12]}")
+            return
+
+        try:
+            version = registry.rollback(name, version=options["to"])
+        except RegistryError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"{name} rolled back to {version}"))
@@ -0,0 +1,103 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.models import GameLog
+from game.db_routers import analytics_reads
+from game.ai.sweep import MODES, PARAMS, configurations, run_sweep
+
+
+class Command(BaseCommand):
+    help = "記録済みの対戦を再生して StrategySelector / SafetyMechanism のパラメーターを探索し、AIの勝率と計算時間で順位付けする"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "grid",
+            help="探索するパラメーターのグリッド (JSON 文字列または JSON ファイルのパス)。"
+                 f"例: '{{\"warmup_rounds\": [20, 50], \"score_decay\": [null, 0.95]}}'。"
+                 f"使えるパラメーター: {', '.join(PARAMS)}",
+        )
+        parser.add_argument("--samples", type=int, default=None, help="グリッドからランダムに選ぶ設定の数 (省略時は全組み合わせ)")
+        parser.add_argument("--mode", default="stateless", choices=MODES, help="stateless: play_view と同じ再生 / session: WebSocket と同じ再生")
+        parser.add_argument("--players", type=int, default=50, help="再生に使うプレイヤー (世代) 数")
+        parser.add_argument("--min-rounds", type=int, default=20, help="この手数未満の履歴は使わない")
+        parser.add_argument("--max-rounds", type=int, default=100, help="1人あたり再生する最大の手数 (先頭から)")
+        parser.add_argument("--workers", type=int, default=None, help="ワーカープロセス数 (省略時は CPU 数)")
+        parser.add_argument("--chunk-size", type=int, default=10, help="1タスクで再生するプレイヤー数")
+        parser.add_argument("--rnn-weights", default=None, help="RNNPredictor の土台にする重みファイル")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--top", type=int, default=20, help="表示する設定の数")
+        parser.add_argument("--output", default=None, help="全設定の結果を書き出すJSONファイル")
+
+    def handle(self, *args, **options):
+        try:
+            grid = self._load_grid(options["grid"])
+            configs = configurations(grid, samples=options["samples"], seed=options["seed"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        with analytics_reads():
+            sequences = self._load_sequences(options["players"], options["min_rounds"], options["max_rounds"])
+        if not sequences:
+            raise CommandError("再生に使える履歴がありません")
+
+        rounds = sum(len(s) for s in sequences)
+        self.stdout.write(f"{len(configs)} configurations x {len(sequences)} players ({rounds} rounds), mode={options['mode']}")
+        results = run_sweep(
+            sequences,
+            configs,
+            mode=options["mode"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            rnn_weights=options["rnn_weights"],
+            seed=options["seed"],
+        )
+
+        for i, result in enumerate(results[:options["top"]], start=1):
+            marker = "*" if result["pareto"] else " "
+            self.stdout.write(
+                f"{i:>3}{marker} win_rate={result['ai_win_rate']:.3f} "
+                f"cost={result['ms_per_round']:.2f}ms/round {json.dumps(result['config'])}"
+            )
+        self.stdout.write("(* = 勝率と計算時間の両方で他の設定に負けていない設定)")
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def _load_grid(self, value):
+        if os.path.exists(value):
+            with open(value, encoding="utf-8") as f:
+                value = f.read()
+        try:
+            grid = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"グリッドを JSON として読めません: {e}")
+        if not isinstance(grid, dict) or not all(isinstance(v, list) and v for v in grid.values()):
+            raise ValueError("グリッドは {パラメーター名: [値, ...]} の形式で指定してください")
+        return grid
+
+    def _load_sequences(self, players, min_rounds, max_rounds):
+        """プレイヤー (世代) ごとの手のコードの並びを、序盤から max_rounds 手まで読み込む"""
+        sequences = []
+        sequence = []
+        current = None
+        logs = (
+            GameLog.objects.filter(round_number__lte=max_rounds)
+            .order_by("player_id", "epoch", "round_number")
+            .values_list("player_id", "epoch", "user_move_code")
+        )
+        for player_id, epoch, move in logs.iterator(chunk_size=10000):
+            if (player_id, epoch) != current:
+                if len(sequence) >= min_rounds:
+                    sequences.append(sequence)
+                    if len(sequences) >= players:
+                        return sequences
+                current = (player_id, epoch)
+                sequence = []
+            sequence.append(move)
+        if len(sequence) >= min_rounds:
+            sequences.append(sequence)
+        return sequences
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from game.db_routers import ANALYTICS_DB, analytics_configured, copy_sqlite_database
+
+
+class Command(BaseCommand):
+    help = "default の SQLite データベースを分析用の複製 (analytics) にコピーする"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=256, help="1ステップでコピーするページ数")
+        parser.add_argument("--sleep", type=float, default=0.01, help="ステップ間の待ち時間 (秒)")
+        parser.add_argument("--interval", type=float, default=None, help="指定した秒数ごとに繰り返し同期する")
+
+    def handle(self, *args, **options):
+        if not analytics_configured():
+            raise CommandError("DATABASES に analytics が設定されていません (RPS_ANALYTICS_DB_NAME)")
+
+        databases = settings.DATABASES
+        for alias in ("default", ANALYTICS_DB):
+            if databases[alias]["ENGINE"] != "django.db.backends.sqlite3":
+                raise CommandError("このコマンドは SQLite 同士の同期にのみ対応しています")
+        source = str(databases["default"]["NAME"])
+        target = str(databases[ANALYTICS_DB]["NAME"])
+
+        while True:
+            started = time.perf_counter()
+            copy_sqlite_database(source, target, pages=options["pages"], sleep=options["sleep"])
+            self.stdout.write(self.style.SUCCESS(
+                f"Synced {source} -> {target} in {time.perf_counter() - started:.2f}s"
+            ))
+            if options["interval"] is None:
+                break
+            time.sleep(options["interval"])
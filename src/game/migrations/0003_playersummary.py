@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0002_gamelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerSummary',
+            fields=[
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='game.player')),
+                ('compacted_rounds', models.IntegerField(default=0)),
+                ('last_round_number', models.IntegerField(default=0)),
+                ('last_user_move', models.CharField(blank=True, default='', max_length=1)),
+                ('move_counts', models.JSONField(default=dict)),
+                ('transition_counts', models.JSONField(default=dict)),
+                ('result_counts', models.JSONField(default=dict)),
+                ('strategy_counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
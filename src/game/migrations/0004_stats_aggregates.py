@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0003_playersummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GlobalStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rounds', models.IntegerField(default=0)),
+                ('ai_wins', models.IntegerField(default=0)),
+                ('ai_losses', models.IntegerField(default=0)),
+                ('draws', models.IntegerField(default=0)),
+                ('safety_overrides', models.IntegerField(default=0)),
+                ('players', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='game.player')),
+                ('rounds', models.IntegerField(default=0)),
+                ('wins', models.IntegerField(default=0)),
+                ('losses', models.IntegerField(default=0)),
+                ('draws', models.IntegerField(default=0)),
+                ('safety_overrides', models.IntegerField(default=0)),
+                ('win_rate', models.FloatField(db_index=True, default=0)),
+                ('timeline', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StrategyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('strategy', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('player', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='game.player')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['player', 'strategy'], name='game_strate_player__045b37_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_stats_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamelog',
+            name='epoch',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='epoch',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playersummary',
+            name='epoch',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='gamelog',
+            index=models.Index(fields=['player', 'epoch', 'round_number'], name='game_gamelo_player__101efc_idx'),
+        ),
+    ]
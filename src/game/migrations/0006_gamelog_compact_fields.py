@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_player_epoch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Strategy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='gamelog',
+            name='ai_move_code',
+            field=models.SmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='gamelog',
+            name='result_code',
+            field=models.SmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='gamelog',
+            name='user_move_code',
+            field=models.SmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='gamelog',
+            name='strategy',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='game.strategy'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+"""
+GameLog の文字列の列 (user_move / ai_move / result / strategy_used) を
+小さな整数のコードと Strategy への参照に移す。
+
+行数が多いテーブル向けに、BATCH_SIZE 件ずつ別々のトランザクションでコミットする (atomic = False)。
+途中で止まっても、もう一度 migrate すれば未変換の行から再開する。
+"""
+from django.db import migrations, transaction
+
+BATCH_SIZE = 5000
+
+MOVE_CODES = {"R": 0, "P": 1, "S": 2}
+RESULT_CODES = {"win": 0, "lose": 1, "draw": 2}
+
+
+def _code(codes, value, log):
+    try:
+        return codes[value]
+    except KeyError:
+        raise ValueError(f"GameLog {log.id}: unexpected value {value!r}") from None
+
+
+def _batches(queryset):
+    """id 順に BATCH_SIZE 件ずつ返す (最初の対象行から始め、先頭からの再走査を避ける)"""
+    first = queryset.order_by("id").values_list("id", flat=True).first()
+    if first is None:
+        return
+    last_id = first - 1
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by("id")[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+def encode_logs(apps, schema_editor):
+    db = schema_editor.connection.alias
+    GameLog = apps.get_model("game", "GameLog")
+    Strategy = apps.get_model("game", "Strategy")
+    strategies = dict(Strategy.objects.using(db).values_list("name", "id"))
+
+    pending = GameLog.objects.using(db).filter(strategy__isnull=True).only(
+        "id", "user_move", "ai_move", "result", "strategy_used"
+    )
+    for batch in _batches(pending):
+        with transaction.atomic(using=db):
+            for log in batch:
+                if log.strategy_used not in strategies:
+                    strategies[log.strategy_used] = Strategy.objects.using(db).create(name=log.strategy_used).id
+                log.user_move_code = _code(MOVE_CODES, log.user_move, log)
+                log.ai_move_code = _code(MOVE_CODES, log.ai_move, log)
+                log.result_code = _code(RESULT_CODES, log.result, log)
+                log.strategy_id = strategies[log.strategy_used]
+            GameLog.objects.using(db).bulk_update(
+                batch, ["user_move_code", "ai_move_code", "result_code", "strategy"]
+            )
+
+
+def decode_logs(apps, schema_editor):
+    db = schema_editor.connection.alias
+    GameLog = apps.get_model("game", "GameLog")
+    Strategy = apps.get_model("game", "Strategy")
+    strategies = dict(Strategy.objects.using(db).values_list("id", "name"))
+    moves = {code: move for move, code in MOVE_CODES.items()}
+    results = {code: result for result, code in RESULT_CODES.items()}
+
+    pending = GameLog.objects.using(db).filter(strategy_used="", strategy__isnull=False).only(
+        "id", "user_move_code", "ai_move_code", "result_code", "strategy"
+    )
+    for batch in _batches(pending):
+        with transaction.atomic(using=db):
+            for log in batch:
+                log.user_move = moves[log.user_move_code]
+                log.ai_move = moves[log.ai_move_code]
+                log.result = results[log.result_code]
+                log.strategy_used = strategies[log.strategy_id]
+            GameLog.objects.using(db).bulk_update(batch, ["user_move", "ai_move", "result", "strategy_used"])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('game', '0006_gamelog_compact_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(encode_logs, decode_logs),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.migrations.operations.base import Operation
+
+OPERATIONS = [
+    # 巻き戻したときに既存の行へ列を追加し直せるよう、削除前に既定値を付けておく
+    # (値は 0007 の巻き戻しでコードから書き戻す)
+    migrations.AlterField(
+        model_name='gamelog',
+        name='user_move',
+        field=models.CharField(max_length=1, default=''),
+    ),
+    migrations.AlterField(
+        model_name='gamelog',
+        name='ai_move',
+        field=models.CharField(max_length=1, default=''),
+    ),
+    migrations.AlterField(
+        model_name='gamelog',
+        name='result',
+        field=models.CharField(max_length=10, default=''),
+    ),
+    migrations.AlterField(
+        model_name='gamelog',
+        name='strategy_used',
+        field=models.CharField(max_length=50, default=''),
+    ),
+    migrations.RemoveField(
+        model_name='gamelog',
+        name='ai_move',
+    ),
+    migrations.RemoveField(
+        model_name='gamelog',
+        name='result',
+    ),
+    migrations.RemoveField(
+        model_name='gamelog',
+        name='strategy_used',
+    ),
+    migrations.RemoveField(
+        model_name='gamelog',
+        name='user_move',
+    ),
+    migrations.AlterField(
+        model_name='gamelog',
+        name='ai_move_code',
+        field=models.SmallIntegerField(choices=[(0, 'R'), (1, 'P'), (2, 'S')]),
+    ),
+    migrations.AlterField(
+        model_name='gamelog',
+        name='result_code',
+        field=models.SmallIntegerField(choices=[(0, 'win'), (1, 'lose'), (2, 'draw')]),
+    ),
+    migrations.AlterField(
+        model_name='gamelog',
+        name='strategy',
+        field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='game.strategy'),
+    ),
+    migrations.AlterField(
+        model_name='gamelog',
+        name='user_move_code',
+        field=models.SmallIntegerField(choices=[(0, 'R'), (1, 'P'), (2, 'S')]),
+    ),
+]
+
+
+def _states(app_label, state):
+    """OPERATIONS を1つずつ適用した途中の状態 (先頭は state)"""
+    states = [state]
+    for operation in OPERATIONS:
+        state = state.clone()
+        operation.state_forwards(app_label, state)
+        states.append(state)
+    return states
+
+
+class CompactGameLogTable(Operation):
+    """
+    OPERATIONS をまとめて適用する。SQLite は列の削除・変更のたびにテーブル全体を作り直すので、
+    行数の多い GameLog では変更後の定義で1回だけ作り直す (他のデータベースでは各操作をそのまま実行する)。
+    """
+    reversible = True
+
+    def state_forwards(self, app_label, state):
+        for operation in OPERATIONS:
+            operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "sqlite":
+            # 変更後の列だけを古いテーブルから写す (NOT NULL への変更もここで検査される)
+            schema_editor._remake_table(to_state.apps.get_model(app_label, "gamelog"))
+            return
+        states = _states(app_label, from_state)
+        for operation, before, after in zip(OPERATIONS, states, states[1:]):
+            operation.database_forwards(app_label, schema_editor, before, after)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        # 巻き戻しはまれなので、どのデータベースでも各操作を逆順に戻す
+        states = _states(app_label, to_state)
+        for operation, before, after in reversed(list(zip(OPERATIONS, states, states[1:]))):
+            operation.database_backwards(app_label, schema_editor, after, before)
+
+    def describe(self):
+        return "Drop GameLog character columns and require the compact codes"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_gamelog_compact_data'),
+    ]
+
+    operations = [
+        CompactGameLogTable(),
+    ]
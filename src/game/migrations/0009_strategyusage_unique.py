@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:35
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    """一意制約を付ける前に、同時に作られた重複行を回数を合算して1行にまとめる"""
+    StrategyUsage = apps.get_model("game", "StrategyUsage")
+    duplicates = (
+        StrategyUsage.objects.values("player", "strategy")
+        .annotate(rows=Count("id"), total=Sum("count"))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        usages = StrategyUsage.objects.filter(player=row["player"], strategy=row["strategy"]).order_by("id")
+        keep = usages.first()
+        usages.exclude(id=keep.id).delete()
+        StrategyUsage.objects.filter(id=keep.id).update(count=row["total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0008_gamelog_drop_char_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='strategyusage',
+            name='game_strate_player__045b37_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='strategyusage',
+            constraint=models.UniqueConstraint(fields=('player', 'strategy'), name='unique_strategy_usage'),
+        ),
+        migrations.AddConstraint(
+            model_name='strategyusage',
+            constraint=models.UniqueConstraint(condition=models.Q(('player__isnull', True)), fields=('strategy',), name='unique_global_strategy_usage'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 import uuid
 
 class Player(models.Model):
@@ -9,18 +9,235 @@ class Player(models.Model):
     losses = models.IntegerField(default=0)
     draws = models.IntegerField(default=0)
     current_phase = models.IntegerField(default=1)
+    # リセットごとに進める世代番号。履歴は現在の世代のものだけを参照する
+    epoch = models.IntegerField(default=0)
 
     def __str__(self):
         return f"Player {self.id}"
 
+class Move(models.IntegerChoices):
+    """手のコード (game.ai の MOVE_TO_IDX と同じ並び)"""
+    ROCK = 0, "R"
+    PAPER = 1, "P"
+    SCISSORS = 2, "S"
+
+class Result(models.IntegerChoices):
+    """ユーザーから見た勝敗のコード"""
+    WIN = 0, "win"
+    LOSE = 1, "lose"
+    DRAW = 2, "draw"
+
+MOVE_CODES = {label: value for value, label in Move.choices}
+MOVE_LABELS = dict(Move.choices)
+RESULT_CODES = {label: value for value, label in Result.choices}
+RESULT_LABELS = dict(Result.choices)
+
+def _encode(codes, value, kind):
+    try:
+        return codes[value]
+    except KeyError:
+        raise ValueError(f"Invalid {kind}: {value!r}") from None
+
+class Strategy(models.Model):
+    """GameLog から参照する戦略名の表 ("Pattern_P1", "Safety_StopLoss" など)"""
+    name = models.CharField(max_length=50, unique=True)
+
+    # 戦略名と id の対応のプロセス内キャッシュ (ラウンドごとのクエリを避ける)。
+    # 行は削除しない (GameLog から PROTECT) ので、コミット済みの対応は変わらない
+    _ids = {}
+    _names = {}
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def id_for(cls, name):
+        """戦略名の id (なければ作る)"""
+        strategy_id = cls._ids.get(name)
+        if strategy_id is None:
+            strategy = cls.objects.get_or_create(name=name)[0]
+            strategy_id = strategy.id
+            cls._remember(strategy.id, name)
+        return strategy_id
+
+    @classmethod
+    def name_for(cls, strategy_id):
+        name = cls._names.get(strategy_id)
+        if name is None:
+            name = cls.objects.values_list("name", flat=True).get(id=strategy_id)
+            cls._remember(strategy_id, name)
+        return name
+
+    @classmethod
+    def _remember(cls, strategy_id, name):
+        # ロールバックされた行を覚えないよう、コミットされてからキャッシュする
+        def remember():
+            cls._ids[name] = strategy_id
+            cls._names[strategy_id] = name
+        transaction.on_commit(remember)
+
+    @classmethod
+    def clear_cache(cls):
+        """テーブルを空にしたとき (テストの flush など) に呼ぶ"""
+        cls._ids.clear()
+        cls._names.clear()
+
+class GameLogQuerySet(models.QuerySet):
+    def current(self, player):
+        """プレイヤーの現在の世代 (最後のリセット以降) のログ (戦略名も同じクエリで読む)"""
+        return self.filter(player=player, epoch=player.epoch).select_related("strategy")
+
+    def stale(self):
+        """リセットにより参照されなくなった古い世代のログ"""
+        return self.filter(epoch__lt=models.F("player__epoch"))
+
 class GameLog(models.Model):
+    """
+    1ラウンドの記録。行数が非常に多くなるため、手と勝敗は小さな整数、戦略名は Strategy への参照で持つ。
+    user_move / ai_move / result / strategy_used は従来通り文字列で読み書きできる (create の引数にも使える)。
+    クエリで絞り込むときは *_code / strategy を使うこと。
+    """
     player = models.ForeignKey(Player, on_delete=models.CASCADE)
+    epoch = models.IntegerField(default=0)
     round_number = models.IntegerField()
-    user_move = models.CharField(max_length=1)  # "R", "P", "S"
-    ai_move = models.CharField(max_length=1)    # "R", "P", "S"
-    result = models.CharField(max_length=10)    # "win", "lose", "draw"
-    strategy_used = models.CharField(max_length=50)
+    user_move_code = models.SmallIntegerField(choices=Move.choices)
+    ai_move_code = models.SmallIntegerField(choices=Move.choices)
+    result_code = models.SmallIntegerField(choices=Result.choices)
+    strategy = models.ForeignKey(Strategy, on_delete=models.PROTECT)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    objects = GameLogQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=["player", "epoch", "round_number"])]
+
+    @property
+    def user_move(self):
+        return MOVE_LABELS.get(self.user_move_code)
+
+    @user_move.setter
+    def user_move(self, value):
+        self.user_move_code = _encode(MOVE_CODES, value, "move")
+
+    @property
+    def ai_move(self):
+        return MOVE_LABELS.get(self.ai_move_code)
+
+    @ai_move.setter
+    def ai_move(self, value):
+        self.ai_move_code = _encode(MOVE_CODES, value, "move")
+
+    @property
+    def result(self):
+        return RESULT_LABELS.get(self.result_code)
+
+    @result.setter
+    def result(self, value):
+        self.result_code = _encode(RESULT_CODES, value, "result")
+
+    @property
+    def strategy_used(self):
+        # 参照先を select_related などで読み込み済みでなければ、行ごとに取りに行かずキャッシュから引く
+        if GameLog.strategy.is_cached(self):
+            return self.strategy.name
+        return Strategy.name_for(self.strategy_id)
+
+    @strategy_used.setter
+    def strategy_used(self, value):
+        self.strategy_id = Strategy.id_for(value)
+
     def __str__(self):
         return f"GameLog {self.id} for {self.player}"
+
+class PlayerSummary(models.Model):
+    """保持期間を過ぎて圧縮された GameLog をプレイヤーごとに集約したもの"""
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, primary_key=True, related_name="summary")
+    epoch = models.IntegerField(default=0)  # 集計対象の世代 (Player.epoch と異なれば無効)
+    compacted_rounds = models.IntegerField(default=0)
+    last_round_number = models.IntegerField(default=0)  # 圧縮済みの最終ラウンド
+    last_user_move = models.CharField(max_length=1, blank=True, default="")
+    move_counts = models.JSONField(default=dict)        # {"R": 10, "P": 3, ...}
+    transition_counts = models.JSONField(default=dict)  # {"RP": 4, ...} (直前の手 + 次の手)
+    result_counts = models.JSONField(default=dict)      # {"win": 5, "lose": 7, "draw": 1}
+    strategy_counts = models.JSONField(default=dict)    # {"Pattern_P0": 3, ...}
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def restart(self, epoch):
+        """新しい世代のサマリーとして空にする"""
+        self.epoch = epoch
+        self.compacted_rounds = 0
+        self.last_round_number = 0
+        self.last_user_move = ""
+        self.move_counts = {}
+        self.transition_counts = {}
+        self.result_counts = {}
+        self.strategy_counts = {}
+
+    def fold(self, logs):
+        """
+        ラウンド順に並んだ GameLog をサマリーに畳み込む
+        (直前の圧縮分との境界の遷移も数える)
+        """
+        prev_move = self.last_user_move
+        for log in logs:
+            _increment(self.move_counts, log.user_move)
+            _increment(self.result_counts, log.result)
+            _increment(self.strategy_counts, log.strategy_used)
+            if prev_move:
+                _increment(self.transition_counts, prev_move + log.user_move)
+            prev_move = log.user_move
+            self.last_round_number = log.round_number
+            self.compacted_rounds += 1
+        self.last_user_move = prev_move
+
+    def __str__(self):
+        return f"PlayerSummary for {self.player} ({self.compacted_rounds} rounds)"
+
+
+class PlayerStats(models.Model):
+    """プレイヤーごとの集計。ラウンドの記録と同じトランザクションで更新する"""
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    rounds = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+    losses = models.IntegerField(default=0)
+    draws = models.IntegerField(default=0)
+    safety_overrides = models.IntegerField(default=0)
+    win_rate = models.FloatField(default=0, db_index=True)  # ランキング用 (wins / (wins + losses))
+    timeline = models.JSONField(default=list)  # [[wins, losses, draws], ...] 一定ラウンドごとの推移
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"PlayerStats for {self.player}"
+
+class GlobalStats(models.Model):
+    """全プレイヤー合計の集計 (pk=1 の1行のみ)"""
+    rounds = models.IntegerField(default=0)
+    ai_wins = models.IntegerField(default=0)
+    ai_losses = models.IntegerField(default=0)
+    draws = models.IntegerField(default=0)
+    safety_overrides = models.IntegerField(default=0)
+    players = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"GlobalStats ({self.rounds} rounds)"
+
+class StrategyUsage(models.Model):
+    """戦略ごとの使用回数。player が None の行は全体の集計"""
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, null=True, blank=True)
+    strategy = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["player", "strategy"], name="unique_strategy_usage"),
+            # NULL 同士は重複とみなされないので、全体の集計の行は別に一意にする
+            models.UniqueConstraint(fields=["strategy"], condition=models.Q(player__isnull=True),
+                                    name="unique_global_strategy_usage"),
+        ]
+
+    def __str__(self):
+        return f"{self.strategy}: {self.count}"
+
+
+def _increment(counts, key):
+    counts[key] = counts.get(key, 0) + 1
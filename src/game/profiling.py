@@ -0,0 +1,115 @@
+"""
+play_view のオンデマンド・プロファイリング。
+
+設定 (RPS_PROFILE_*) で有効化するか、一定割合でサンプリングするか、
+トークン付きのリクエストヘッダーを送ったリクエストだけを cProfile (と torch.profiler) で計測し、
+レポートをローカルのディレクトリへ書き出す。集計は profile_summary コマンドで行う。
+"""
+import cProfile
+import functools
+import json
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+
+PROFILE_HEADER = "X-RPS-Profile"
+
+# cProfile はプロセス内で同時に1つしか有効にできないので、計測は1リクエストずつ行う
+_profile_lock = threading.Lock()
+
+
+def _should_profile(request):
+    if getattr(settings, "RPS_PROFILE_ENABLED", False):
+        return True
+    token = getattr(settings, "RPS_PROFILE_TOKEN", None)
+    if token and request.headers.get(PROFILE_HEADER) == token:
+        return True
+    rate = getattr(settings, "RPS_PROFILE_SAMPLE_RATE", 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def active(request):
+    """このリクエストがプロファイル対象か"""
+    return hasattr(request, "_rps_profile_tags")
+
+
+def tag(request, **tags):
+    """レポートに付けるタグを追加する (プロファイル対象でなければ何もしない)"""
+    if active(request):
+        request._rps_profile_tags.update(tags)
+
+
+@contextmanager
+def torch_section(request, enabled=True):
+    """
+    RNN を動かす区間だけを torch.profiler で計測する
+    (プロファイル対象のリクエストで、RPS_PROFILE_TORCH が有効なときだけ)。
+    """
+    if not (enabled and active(request) and getattr(settings, "RPS_PROFILE_TORCH", True)):
+        yield
+        return
+    import torch.profiler
+    with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU]) as torch_profiler:
+        yield
+    request._rps_torch_profiler = torch_profiler
+
+
+def profile_view(view):
+    """ビューをプロファイル対象にするデコレーター"""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _should_profile(request):
+            return view(request, *args, **kwargs)
+        # 他のリクエストを計測中なら、このリクエストは計測せずに処理する
+        if not _profile_lock.acquire(blocking=False):
+            return view(request, *args, **kwargs)
+
+        try:
+            request._rps_profile_tags = {}
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                profiler.disable()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            _write_report(request, profiler, elapsed_ms, response.status_code)
+        finally:
+            _profile_lock.release()
+        return response
+    return wrapper
+
+
+def _write_report(request, profiler, elapsed_ms, status):
+    directory = Path(getattr(settings, "RPS_PROFILE_DIR", "profiles"))
+    directory.mkdir(parents=True, exist_ok=True)
+
+    tags = request._rps_profile_tags
+    now = datetime.now(timezone.utc)
+    name = f"{now:%Y%m%d-%H%M%S}-{tags.get('player_id', 'unknown')}-{uuid.uuid4().hex[:8]}"
+
+    profiler.dump_stats(directory / f"{name}.prof")
+
+    meta = {
+        "path": request.path,
+        "status": status,
+        "elapsed_ms": elapsed_ms,
+        "recorded_at": now.isoformat(),
+        **tags,
+    }
+    # RNNが動いたリクエストだけ torch 側の演算子ごとの内訳も残す (torch_section を参照)
+    torch_profiler = getattr(request, "_rps_torch_profiler", None)
+    if torch_profiler is not None:
+        table = torch_profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=30)
+        (directory / f"{name}.torch.txt").write_text(table, encoding="utf-8")
+        meta["torch_report"] = f"{name}.torch.txt"
+
+    (directory / f"{name}.json").write_text(json.dumps(meta, indent=2, ensure_ascii=False), encoding="utf-8")
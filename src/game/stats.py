@@ -0,0 +1,235 @@
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import Player, GameLog, PlayerSummary, PlayerStats, GlobalStats, StrategyUsage, RESULT_LABELS
+
+# 勝率推移を記録する単位 (ラウンド数)
+TIMELINE_BUCKET = 50
+
+GLOBAL_STATS_ID = 1
+
+
+def _rate(numerator, denominator):
+    return numerator / denominator if denominator > 0 else 0
+
+
+def record_round(player, result, strategy_name):
+    """
+    1ラウンド分の結果を集計テーブルへ反映する。
+    play_view のラウンド保存と同じトランザクション内で呼ぶこと。
+    """
+    is_override = strategy_name.startswith("Safety_")
+
+    # プレイヤー集計
+    stats, created = PlayerStats.objects.select_for_update().get_or_create(player=player)
+    bucket = stats.rounds // TIMELINE_BUCKET
+    if len(stats.timeline) <= bucket:
+        stats.timeline.append([0, 0, 0])
+    column = {"win": 0, "lose": 1, "draw": 2}[result]
+    stats.timeline[bucket][column] += 1
+
+    stats.rounds += 1
+    if result == "win":
+        stats.wins += 1
+    elif result == "lose":
+        stats.losses += 1
+    else:
+        stats.draws += 1
+    if is_override:
+        stats.safety_overrides += 1
+    stats.win_rate = _rate(stats.wins, stats.wins + stats.losses)
+    stats.save()
+
+    # 全体集計 (同時更新で値を失わないよう F 式で加算する)
+    GlobalStats.objects.get_or_create(id=GLOBAL_STATS_ID)
+    GlobalStats.objects.filter(id=GLOBAL_STATS_ID).update(
+        rounds=F("rounds") + 1,
+        ai_wins=F("ai_wins") + (1 if result == "lose" else 0),
+        ai_losses=F("ai_losses") + (1 if result == "win" else 0),
+        draws=F("draws") + (1 if result == "draw" else 0),
+        safety_overrides=F("safety_overrides") + (1 if is_override else 0),
+        players=F("players") + (1 if created else 0),
+    )
+
+    # 戦略ごとの使用回数 (プレイヤー別・全体)
+    # 行があれば UPDATE 1回で済ませ、初回だけ一意制約に任せて作成する
+    # (同時に作成しようとした側は update_or_create が既存の行の加算に切り替える)
+    for owner in (player, None):
+        updated = StrategyUsage.objects.filter(player=owner, strategy=strategy_name).update(count=F("count") + 1)
+        if not updated:
+            StrategyUsage.objects.update_or_create(
+                player=owner, strategy=strategy_name,
+                defaults={"count": F("count") + 1}, create_defaults={"count": 1},
+            )
+
+
+def reset_player(player):
+    """プレイヤーのリセット時に、そのプレイヤー分の集計を初期化する (全体集計は残す)"""
+    PlayerStats.objects.filter(player=player).update(
+        rounds=0, wins=0, losses=0, draws=0, safety_overrides=0, win_rate=0, timeline=[],
+    )
+    StrategyUsage.objects.filter(player=player).delete()
+
+
+def rebuild_player(player):
+    """
+    現在の世代の GameLog と PlayerSummary から、プレイヤー別の集計を作り直す (rebuild_stats 用)。
+    圧縮済みのラウンドは順序が分からないので、勝率推移 (timeline) には含めない。
+    集計したラウンド数を返す。
+    """
+    with transaction.atomic():
+        # 同時に記録されるラウンドと重ならないよう、先に集計の行をロックしてから読む
+        stats, created = PlayerStats.objects.select_for_update().get_or_create(player=player)
+        player = Player.objects.get(pk=player.pk)
+        results = {"win": 0, "lose": 0, "draw": 0}
+        strategies = {}
+        rounds = 0
+
+        summary = PlayerSummary.objects.filter(player=player, epoch=player.epoch).first()
+        if summary:
+            rounds += summary.compacted_rounds
+            for result, count in summary.result_counts.items():
+                results[result] += count
+            for strategy, count in summary.strategy_counts.items():
+                strategies[strategy] = strategies.get(strategy, 0) + count
+
+        logs = GameLog.objects.filter(player=player, epoch=player.epoch)
+        for row in logs.values("result_code").annotate(total=Count("id")):
+            results[RESULT_LABELS[row["result_code"]]] += row["total"]
+            rounds += row["total"]
+        for row in logs.values("strategy__name").annotate(total=Count("id")):
+            strategies[row["strategy__name"]] = strategies.get(row["strategy__name"], 0) + row["total"]
+
+        if created and rounds == 0:
+            stats.delete()
+            return 0
+
+        # record_round と同じく、round_number 番目のラウンドは (round_number - 1) // TIMELINE_BUCKET 番目に数える
+        timeline = [[0, 0, 0] for _ in range((rounds + TIMELINE_BUCKET - 1) // TIMELINE_BUCKET)]
+        for round_number, result_code in logs.values_list("round_number", "result_code").iterator():
+            bucket = (round_number - 1) // TIMELINE_BUCKET
+            while len(timeline) <= bucket:
+                timeline.append([0, 0, 0])
+            timeline[bucket][result_code] += 1  # 列の並び (勝ち・負け・引き分け) は Result のコードと同じ
+
+        stats.rounds = rounds
+        stats.wins = results["win"]
+        stats.losses = results["lose"]
+        stats.draws = results["draw"]
+        stats.safety_overrides = sum(count for name, count in strategies.items() if name.startswith("Safety_"))
+        stats.win_rate = _rate(stats.wins, stats.wins + stats.losses)
+        stats.timeline = timeline
+        stats.save()
+
+        StrategyUsage.objects.filter(player=player).delete()
+        StrategyUsage.objects.bulk_create(
+            StrategyUsage(player=player, strategy=name, count=count) for name, count in strategies.items()
+        )
+        return rounds
+
+
+def rebuild_global():
+    """全体の集計をプレイヤー別の集計の合計で作り直す (rebuild_player の後に呼ぶ)"""
+    with transaction.atomic():
+        totals = PlayerStats.objects.aggregate(
+            rounds=Sum("rounds"), wins=Sum("wins"), losses=Sum("losses"), draws=Sum("draws"),
+            safety_overrides=Sum("safety_overrides"), players=Count("player"),
+        )
+        GlobalStats.objects.update_or_create(id=GLOBAL_STATS_ID, defaults={
+            "rounds": totals["rounds"] or 0,
+            "ai_wins": totals["losses"] or 0,
+            "ai_losses": totals["wins"] or 0,
+            "draws": totals["draws"] or 0,
+            "safety_overrides": totals["safety_overrides"] or 0,
+            "players": totals["players"],
+        })
+        StrategyUsage.objects.filter(player=None).delete()
+        rows = StrategyUsage.objects.filter(player__isnull=False).values("strategy").annotate(total=Sum("count"))
+        StrategyUsage.objects.bulk_create(
+            StrategyUsage(player=None, strategy=row["strategy"], count=row["total"]) for row in rows
+        )
+
+
+def _strategy_usage(player):
+    rows = (
+        StrategyUsage.objects.filter(player=player)
+        .values("strategy")
+        .annotate(total=Sum("count"))
+    )
+    return {row["strategy"]: row["total"] for row in rows}
+
+
+def player_stats(player):
+    """プレイヤー別の集計を返す (クエリ2回)"""
+    stats = PlayerStats.objects.filter(player=player).first() or PlayerStats(player=player)
+    return {
+        "player_id": str(player.id),
+        "rounds": stats.rounds,
+        "wins": stats.wins,
+        "losses": stats.losses,
+        "draws": stats.draws,
+        "win_rate": stats.win_rate,
+        "ai_win_rate": _rate(stats.losses, stats.wins + stats.losses),
+        "safety_overrides": stats.safety_overrides,
+        "safety_override_rate": _rate(stats.safety_overrides, stats.rounds),
+        "timeline": [
+            {
+                "rounds": [i * TIMELINE_BUCKET + 1, (i + 1) * TIMELINE_BUCKET],
+                "wins": wins,
+                "losses": losses,
+                "draws": draws,
+                "win_rate": _rate(wins, wins + losses),
+            }
+            for i, (wins, losses, draws) in enumerate(stats.timeline)
+        ],
+        "strategy_usage": _strategy_usage(player),
+    }
+
+
+def global_stats():
+    """全体の集計を返す (クエリ2回)"""
+    stats = GlobalStats.objects.filter(id=GLOBAL_STATS_ID).first() or GlobalStats()
+    return {
+        "rounds": stats.rounds,
+        "players": stats.players,
+        "ai_wins": stats.ai_wins,
+        "ai_losses": stats.ai_losses,
+        "draws": stats.draws,
+        "ai_win_rate": _rate(stats.ai_wins, stats.ai_wins + stats.ai_losses),
+        "safety_overrides": stats.safety_overrides,
+        "safety_override_rate": _rate(stats.safety_overrides, stats.rounds),
+        "strategy_usage": _strategy_usage(None),
+    }
+
+
+def leaderboard(page=1, page_size=20, min_rounds=10):
+    """
+    ユーザー勝率のランキングを返す。
+    win_rate にはインデックスがあるため、ページ単位の読み出しで済む。
+    """
+    queryset = (
+        PlayerStats.objects.filter(rounds__gte=min_rounds)
+        .order_by("-win_rate", "-rounds", "player_id")
+        .values("player_id", "rounds", "wins", "losses", "draws", "win_rate")
+    )
+    paginator = Paginator(queryset, page_size)
+    page_obj = paginator.get_page(page)
+    offset = (page_obj.number - 1) * page_size
+    return {
+        "page": page_obj.number,
+        "num_pages": paginator.num_pages,
+        "total": paginator.count,
+        "results": [
+            {
+                "rank": offset + i + 1,
+                "player_id": str(row["player_id"]),
+                "rounds": row["rounds"],
+                "wins": row["wins"],
+                "losses": row["losses"],
+                "draws": row["draws"],
+                "win_rate": row["win_rate"],
+            }
+            for i, row in enumerate(page_obj.object_list)
+        ],
+    }
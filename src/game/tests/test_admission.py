@@ -0,0 +1,64 @@
+import pytest
+from django.test import Client
+from django.urls import reverse
+from game import admission
+from game.admission import AdmissionController, LEVEL_HEADER
+from game.ai.strategy import StrategySelector, DEGRADE_NO_RNN_TRAINING, DEGRADE_NO_RNN, DEGRADE_CHEAP_ONLY
+
+
+class TestAdmissionController:
+    def test_levels_follow_in_flight_requests(self):
+        """処理中のリクエスト数に応じて縮退レベルが上がり、上限を超えたら断るか"""
+        controller = AdmissionController(inflight_levels=(2, 3, 4), max_inflight=4)
+        levels = [controller.enter() for _ in range(5)]
+        assert levels == [0, 1, 2, 3, None]
+        assert controller.metrics()["rejected"] == 1
+
+        for _ in range(4):
+            controller.leave(0.01)
+        assert controller.enter() == 0
+
+    def test_levels_follow_latency(self):
+        """処理中の数が少なくてもレイテンシが悪化すれば縮退するか"""
+        controller = AdmissionController(latency_levels=(0.5, 1.0, 2.0), alpha=1.0)
+        controller.enter()
+        controller.leave(1.5)
+        assert controller.level() == 2
+        controller.enter()
+        controller.leave(0.1)
+        assert controller.level() == 0
+
+
+class TestDegrade:
+    def test_degrade_removes_predictors_step_by_step(self):
+        selector = StrategySelector()
+        selector.degrade(DEGRADE_NO_RNN_TRAINING)
+        assert selector.predictors["RNN"].train_online is False
+
+        selector.degrade(DEGRADE_NO_RNN)
+        assert "RNN" not in selector.predictors
+
+        selector.degrade(DEGRADE_CHEAP_ONLY)
+        assert set(selector.predictors) == {"Random", "Markov", "Frequency"}
+        history = [{"user_move": "R", "result": "draw"}] * 20
+        move, strategy = selector.select_move(history)
+        assert strategy.split("_")[0] in selector.predictors
+
+
+@pytest.mark.django_db
+class TestPlayAdmission:
+    def test_play_reports_degradation_level(self, monkeypatch):
+        monkeypatch.setattr(admission, "_controller", AdmissionController(inflight_levels=(1, 1, 1)))
+        response = Client().post(reverse("api_play"), {"move": "R"}, content_type="application/json")
+        assert response.status_code == 200
+        assert response[LEVEL_HEADER] == "3"
+        assert response.json()["degradation_level"] == 3
+        assert admission.admission_metrics()["in_flight"] == 0
+
+    def test_play_rejects_past_hard_limit(self, monkeypatch):
+        """上限を超えたら 503 と Retry-After を返すか"""
+        monkeypatch.setattr(admission, "_controller", AdmissionController(max_inflight=0, retry_after=3))
+        response = Client().post(reverse("api_play"), {"move": "R"}, content_type="application/json")
+        assert response.status_code == 503
+        assert response["Retry-After"] == "3"
+        assert response[LEVEL_HEADER] == "reject"
@@ -0,0 +1,73 @@
+import json
+import pytest
+from django.core.management import call_command
+from game.models import Player, GameLog, PlayerSummary
+from game.ai.predictors import MarkovPredictor, FrequencyPredictor
+
+
+def make_logs(player, moves):
+    for i, move in enumerate(moves, start=1):
+        GameLog.objects.create(
+            player=player, round_number=i, user_move=move, ai_move="R",
+            result="draw" if move == "R" else ("win" if move == "P" else "lose"),
+            strategy_used="Markov_P0",
+        )
+    player.total_games = len(moves)
+    player.save()
+
+
+@pytest.mark.django_db
+class TestCompaction:
+    def test_compact_keeps_recent_rounds(self, tmp_path):
+        """保持ラウンド数を超えた分がサマリーへ畳み込まれ、削除されるか"""
+        player = Player.objects.create()
+        make_logs(player, "RP" * 15)
+
+        call_command("compact_gamelogs", keep_rounds=10, batch_size=7, archive_dir=str(tmp_path))
+
+        remaining = GameLog.objects.filter(player=player).order_by("round_number")
+        assert remaining.count() == 10
+        assert remaining.first().round_number == 21
+
+        summary = PlayerSummary.objects.get(player=player)
+        assert summary.compacted_rounds == 20
+        assert summary.last_round_number == 20
+        assert summary.move_counts == {"R": 10, "P": 10}
+        assert summary.transition_counts == {"RP": 10, "PR": 9}
+        assert summary.strategy_counts == {"Markov_P0": 20}
+
+        archived = [json.loads(line) for f in tmp_path.iterdir() for line in f.read_text().splitlines()]
+        assert len(archived) == 20
+
+    def test_compact_is_resumable(self):
+        """2回目の実行では圧縮済みの行を二重に数えないか"""
+        player = Player.objects.create()
+        make_logs(player, "RPS" * 5)
+
+        call_command("compact_gamelogs", keep_rounds=5)
+        call_command("compact_gamelogs", keep_rounds=5)
+
+        assert PlayerSummary.objects.get(player=player).compacted_rounds == 10
+        assert GameLog.objects.filter(player=player).count() == 5
+
+    def test_dry_run(self):
+        player = Player.objects.create()
+        make_logs(player, "R" * 8)
+        call_command("compact_gamelogs", keep_rounds=3, dry_run=True)
+        assert GameLog.objects.count() == 8
+        assert not PlayerSummary.objects.exists()
+
+
+class TestSeededPredictors:
+    def test_markov_uses_summary(self):
+        """履歴が空でも、サマリーの遷移回数から予測できるか"""
+        summary = PlayerSummary(transition_counts={"RS": 5, "RP": 1}, last_user_move="R")
+        predictor = MarkovPredictor()
+        predictor.seed(summary)
+        assert predictor.predict([]) == "S"
+
+    def test_frequency_uses_summary(self):
+        summary = PlayerSummary(move_counts={"P": 10})
+        predictor = FrequencyPredictor()
+        predictor.seed(summary)
+        assert predictor.predict([{"user_move": "R"}, {"user_move": "S"}]) == "P"
@@ -0,0 +1,45 @@
+import sqlite3
+from game import db_routers
+from game.db_routers import AnalyticsRouter, analytics_reads, copy_sqlite_database
+from game.models import GameLog
+
+
+class TestAnalyticsRouter:
+    def test_reads_stay_on_default_without_replica(self):
+        router = AnalyticsRouter()
+        with analytics_reads():
+            assert router.db_for_read(GameLog) == "default"
+
+    def test_analytics_reads_use_replica(self, monkeypatch):
+        """分析用DBが設定されていれば、analytics_reads() 内の読み取りだけがそちらへ向くか"""
+        monkeypatch.setattr(db_routers, "analytics_configured", lambda: True)
+        router = AnalyticsRouter()
+
+        assert router.db_for_read(GameLog) == "default"
+        with analytics_reads():
+            assert router.db_for_read(GameLog) == "analytics"
+            # 書き込みは常に default
+            assert router.db_for_write(GameLog) == "default"
+        assert router.db_for_read(GameLog) == "default"
+
+
+def test_copy_sqlite_database(tmp_path):
+    """SQLite ファイル同士で複製され、既存の複製は置き換えられるか"""
+    source = tmp_path / "primary.sqlite3"
+    target = tmp_path / "analytics.sqlite3"
+
+    conn = sqlite3.connect(source)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(1000)])
+    conn.commit()
+
+    copy_sqlite_database(source, target, pages=2, sleep=0)
+    conn.execute("INSERT INTO t VALUES (1000)")
+    conn.commit()
+    copy_sqlite_database(source, target, pages=2, sleep=0)
+    conn.close()
+
+    replica = sqlite3.connect(target)
+    assert replica.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1001
+    replica.close()
+    assert not (tmp_path / "analytics.sqlite3.tmp").exists()
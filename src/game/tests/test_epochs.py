@@ -0,0 +1,66 @@
+import pytest
+from django.urls import reverse
+from django.test import Client
+from django.core.management import call_command
+from game import engine
+from game.models import Player, GameLog, PlayerSummary, PlayerStats
+
+
+@pytest.mark.django_db
+class TestEpochReset:
+    def setup_method(self):
+        self.client = Client()
+
+    def test_reset_hides_history_without_deleting(self):
+        """リセットは世代を進めるだけで、削除は GC に任せるか"""
+        player = Player.objects.create(total_games=3)
+        for i in range(3):
+            GameLog.objects.create(player=player, round_number=i + 1, user_move="R", ai_move="S", result="win", strategy_used="Random")
+
+        response = self.client.post(reverse('api_reset'), {"player_id": str(player.id)}, content_type="application/json")
+        assert response.status_code == 200
+
+        player.refresh_from_db()
+        assert player.epoch == 1
+        assert GameLog.objects.current(player).count() == 0
+        assert GameLog.objects.stale().count() == 3
+
+        # リセット後の対戦は新しい世代として記録される
+        self.client.post(reverse('api_play'), {"player_id": str(player.id), "move": "P"}, content_type="application/json")
+        log = GameLog.objects.current(player).get()
+        assert log.epoch == 1
+        assert log.round_number == 1
+
+    def test_concurrent_round_does_not_undo_reset(self):
+        """リセット前に読み込んだ Player でラウンドを保存しても、世代もカウンタも戻らないか"""
+        player = Player.objects.create()
+        for _ in range(5):
+            engine.apply_result(player, "win")
+            assert engine.persist_round(player, "R", "S", "win", "Random_P0")
+        stale = Player.objects.get(id=player.id)
+
+        self.client.post(reverse('api_reset'), {"player_id": str(player.id)}, content_type="application/json")
+        engine.apply_result(stale, "win")
+        assert not engine.persist_round(stale, "R", "S", "win", "Random_P0")
+
+        player.refresh_from_db()
+        assert player.epoch == 1
+        assert (player.total_games, player.wins) == (0, 0)
+        assert GameLog.objects.current(player).count() == 0
+        stats = PlayerStats.objects.get(player=player)
+        assert (stats.rounds, stats.wins) == (0, 0)
+
+    def test_gc_deletes_stale_epochs_in_batches(self):
+        player = Player.objects.create(epoch=2)
+        for epoch in range(3):
+            for i in range(5):
+                GameLog.objects.create(player=player, epoch=epoch, round_number=i + 1, user_move="R", ai_move="S", result="win", strategy_used="Random")
+        PlayerSummary.objects.create(player=player, epoch=1, compacted_rounds=10)
+
+        call_command("gc_gamelogs", batch_size=3, max_batches=2)
+        assert GameLog.objects.stale().count() == 4
+
+        call_command("gc_gamelogs", batch_size=3)
+        assert GameLog.objects.stale().count() == 0
+        assert GameLog.objects.current(player).count() == 5
+        assert not PlayerSummary.objects.exists()
@@ -0,0 +1,49 @@
+import json
+import pytest
+from django.core.management import call_command
+from game.loadgen import percentile, build_behavior, BEHAVIORS, LoadResult
+from game.models import Player, GameLog
+
+
+class TestLoadGenHelpers:
+    def test_percentile(self):
+        """nearest-rank でパーセンタイルが計算されるか"""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile(values, 100) == 100
+        assert percentile([], 50) is None
+
+    def test_behaviors(self):
+        """すべての手の出し方が R/P/S を返すか"""
+        for i, name in enumerate(list(BEHAVIORS) + ["mixed"]):
+            behavior = build_behavior(name, i)
+            last_move, last_response = None, None
+            for _ in range(5):
+                move = behavior.next_move(last_move, last_response)
+                assert move in ["R", "P", "S"]
+                last_move, last_response = move, {"result": "lose", "ai_move": "P"}
+
+    def test_report_windows(self):
+        """履歴長ごとにウィンドウ集計されるか"""
+        result = LoadResult()
+        for i in range(20):
+            result.add(i, i * 0.01, 5.0, i != 3)
+        report = result.report(elapsed=1.0, window=10)
+        assert report["overall"]["requests"] == 20
+        assert report["overall"]["errors"] == 1
+        assert [w["rounds"] for w in report["by_history_length"]] == [[1, 10], [11, 20]]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_loadtest_command_in_process(tmp_path):
+    """プロセス内モードで実行し、JSONレポートが出力されるか"""
+    output = tmp_path / "report.json"
+    call_command("loadtest", players=2, rounds=3, concurrency=1, behavior="cycle", output=str(output))
+
+    report = json.loads(output.read_text())
+    assert report["overall"]["requests"] == 6
+    assert report["overall"]["errors"] == 0
+    assert report["config"]["target"] == "in-process"
+    assert Player.objects.count() == 2
+    assert GameLog.objects.count() == 6
@@ -0,0 +1,69 @@
+from game.ai.memo import PredictionCache
+from game.ai.models import RPSLSTM
+from game.ai.predictors import MarkovPredictor, RNNPredictor
+from game.ai.strategy import StrategySelector
+
+
+class TestPredictionCache:
+    def test_lru_eviction(self):
+        cache = PredictionCache(max_entries=2, ttl=None)
+        cache.put("a", "R")
+        cache.put("b", None)
+        assert cache.get("a") == (True, "R")
+        cache.put("c", "S")
+        # 最も古く使われた "b" が捨てられる
+        assert cache.get("b") == (False, None)
+        assert cache.get("c") == (True, "S")
+        metrics = cache.metrics()
+        assert metrics["evictions"] == 1
+        assert metrics["hit_rate"] == 2 / 3
+
+    def test_ttl_expiry(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr("game.ai.memo.time.monotonic", lambda: now[0])
+        cache = PredictionCache(ttl=10)
+        cache.put("a", "R")
+        now[0] = 111.0
+        assert cache.get("a") == (False, None)
+        assert cache.metrics()["expirations"] == 1
+
+
+class TestMemoKeys:
+    def test_markov_key_depends_on_short_history_only(self):
+        predictor = MarkovPredictor()
+        assert predictor.memo_key([{"user_move": "R"}, {"user_move": "P"}]) == "RP"
+        assert predictor.memo_key([{"user_move": "R"}] * 20) is None
+        predictor.prior_transitions = {"RP": 3}
+        assert predictor.memo_key([{"user_move": "R"}]) is None
+
+    def test_rnn_key_requires_shared_untrained_model(self):
+        base = RPSLSTM(input_size=3, hidden_size=8, output_size=3)
+        history = [{"user_move": m} for m in "RPSRPSRPSRPS"]
+        assert RNNPredictor(seq_length=5).memo_key(history[:5]) is None
+
+        predictor = RNNPredictor(seq_length=5, base_model=base, model_version="v1")
+        assert predictor.memo_key(history[:5]) == ("v1", "RPSRP")
+        # 学習が走る長さの履歴、学習後の予測器はキャッシュしない
+        assert predictor.memo_key(history) is None
+        predictor.predict(history)
+        predictor.train_online = False
+        assert predictor.memo_key(history) is None
+
+
+def test_selectors_share_cached_predictions():
+    """別のプレイヤーの選択器が同じ短い履歴で予測すると、キャッシュから引かれるか"""
+    cache = PredictionCache()
+    history = [{"user_move": m, "result": "draw"} for m in "RPRPRPR"]
+
+    first = StrategySelector(prediction_cache=cache)
+    first.select_move(history)
+    misses = cache.metrics()["misses"]
+    assert cache.metrics()["hits"] == 0
+
+    second = StrategySelector(prediction_cache=cache)
+    second.select_move(history)
+    metrics = cache.metrics()
+    assert metrics["misses"] == misses
+    assert metrics["hits"] == 3  # Markov, Frequency, Pattern
+    for name in ("Markov", "Frequency", "Pattern"):
+        assert second.last_strategy_moves[f"{name}_P0"] == first.last_strategy_moves[f"{name}_P0"]
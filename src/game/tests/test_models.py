@@ -48,3 +48,78 @@ def test_create_gamelog():
     # 逆参照 (player.gamelog_set) が機能するか
     assert player.gamelog_set.count() == 1
     assert player.gamelog_set.first() == log
+
+@pytest.mark.django_db
+def test_gamelog_compact_encoding():
+    """手・勝敗は整数コード、戦略名は Strategy への参照として保存され、文字列でも読み書きできるか"""
+    from game.models import GameLog, Strategy, Move, Result
+
+    player = Player.objects.create()
+    for i in range(2):
+        GameLog.objects.create(player=player, round_number=i + 1, user_move="P", ai_move="S", result="lose", strategy_used="Pattern_P1")
+
+    log = GameLog.objects.first()
+    assert (log.user_move_code, log.ai_move_code, log.result_code) == (Move.PAPER, Move.SCISSORS, Result.LOSE)
+    assert Strategy.objects.get().name == "Pattern_P1"
+    assert GameLog.objects.filter(strategy__name="Pattern_P1", result_code=Result.LOSE).count() == 2
+
+    log.strategy_used = "Safety_StopLoss"
+    log.save()
+    assert GameLog.objects.get(id=log.id).strategy_used == "Safety_StopLoss"
+    with pytest.raises(ValueError):
+        log.user_move = "X"
+
+
+@pytest.mark.django_db
+def test_strategy_names_are_cached(django_capture_on_commit_callbacks, django_assert_num_queries):
+    """コミット済みの戦略名は、保存でも読み出しでも Strategy を引き直さないか"""
+    from game.models import GameLog, Strategy
+
+    player = Player.objects.create()
+    fields = dict(player=player, user_move="R", ai_move="P", result="lose")
+    try:
+        with django_capture_on_commit_callbacks(execute=True):
+            GameLog.objects.create(round_number=1, strategy_used="Markov_P0", **fields)
+        with django_assert_num_queries(1):
+            GameLog.objects.create(round_number=2, strategy_used="Markov_P0", **fields)
+        with django_assert_num_queries(1):
+            assert {log.strategy_used for log in GameLog.objects.current(player)} == {"Markov_P0"}
+        with django_assert_num_queries(1):
+            assert {log.strategy_used for log in GameLog.objects.filter(player=player)} == {"Markov_P0"}
+    finally:
+        # テストのロールバックで消える行なので覚えたままにしない
+        Strategy.clear_cache()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_gamelog_compact_data_migration():
+    """既存の文字列の行がバッチごとに別トランザクションで変換されるか"""
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+    import importlib
+    data_migration = importlib.import_module("game.migrations.0007_gamelog_compact_data")
+
+    executor = MigrationExecutor(connection)
+    executor.migrate([("game", "0006_gamelog_compact_fields")])
+    apps = executor.loader.project_state([("game", "0006_gamelog_compact_fields")]).apps
+    OldPlayer = apps.get_model("game", "Player")
+    OldGameLog = apps.get_model("game", "GameLog")
+    player = OldPlayer.objects.create()
+    for i, (move, result, strategy) in enumerate([("R", "win", "Random"), ("P", "lose", "Markov_P0"), ("S", "draw", "Random")]):
+        OldGameLog.objects.create(player=player, round_number=i + 1, user_move=move, ai_move="R", result=result, strategy_used=strategy)
+
+    try:
+        original = data_migration.BATCH_SIZE
+        data_migration.BATCH_SIZE = 2
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+    finally:
+        data_migration.BATCH_SIZE = original
+
+    from game.models import GameLog
+    logs = GameLog.objects.order_by("round_number")
+    assert [(log.user_move, log.result, log.strategy_used) for log in logs] == [
+        ("R", "win", "Random"), ("P", "lose", "Markov_P0"), ("S", "draw", "Random"),
+    ]
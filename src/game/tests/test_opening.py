@@ -0,0 +1,56 @@
+import pytest
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from game.ai.opening import OpeningBook, load_opening_book
+from game.models import Player, GameLog
+
+
+class TestOpeningBook:
+    def test_build_and_lookup(self):
+        """手順ごとに最も多い次の手に勝つ手が登録されるか"""
+        # 最初は R が多く、R の次は S が多い
+        sequences = ["RSP", "RSR", "RPS", "PSS"]
+        book = OpeningBook.build(sequences, depth=3, min_count=2)
+
+        assert len(book.table) == 1 + 3 + 9
+        assert book.lookup([]) == "P"                     # R に勝つ手
+        assert book.lookup([{"user_move": "R"}]) == "R"   # S に勝つ手
+        # データ不足の手順・定跡の手数以上の履歴には使わない
+        assert book.lookup([{"user_move": "S"}]) is None
+        assert book.lookup([{"user_move": "R"}] * 3) is None
+
+    def test_save_and_load(self, tmp_path):
+        book = OpeningBook.build(["RR", "RR"], depth=2, min_count=1)
+        path = tmp_path / "book.npz"
+        book.save(path)
+        loaded = OpeningBook.load(path)
+        assert loaded.depth == 2
+        assert (loaded.table == book.table).all()
+
+
+@pytest.mark.django_db
+class TestOpeningBookIntegration:
+    def test_build_command_and_play(self, settings, tmp_path):
+        """GameLog から定跡を作り、新規プレイヤーの初手で使われるか"""
+        for _ in range(3):
+            player = Player.objects.create()
+            for i, move in enumerate("RRS", start=1):
+                GameLog.objects.create(player=player, round_number=i, user_move=move, ai_move="R", result="draw", strategy_used="Random")
+
+        path = tmp_path / "book.npz"
+        call_command("build_opening_book", str(path), depth=2, min_count=1)
+        settings.RPS_OPENING_BOOK = str(path)
+        load_opening_book.cache_clear()
+
+        client = Client()
+        body = client.post(reverse('api_play'), {"move": "R"}, content_type="application/json").json()
+        assert body["strategy"] == "OpeningBook"
+        assert body["ai_move"] == "P"
+
+        body = client.post(reverse('api_play'), {"player_id": body["player_id"], "move": "R"}, content_type="application/json").json()
+        assert body["strategy"] == "OpeningBook"
+
+        # 定跡の手数を過ぎたら通常の予測に戻る
+        body = client.post(reverse('api_play'), {"player_id": body["player_id"], "move": "R"}, content_type="application/json").json()
+        assert body["strategy"] != "OpeningBook"
@@ -0,0 +1,93 @@
+from io import StringIO
+import pytest
+import numpy as np
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from game.ai.population import NgramIndex, load_population_index
+from game.ai.predictors import PopulationPriorPredictor
+from game.ai.strategy import StrategySelector
+from game.models import Player, GameLog, Strategy
+
+
+def encode(moves):
+    return NgramIndex.encode(moves)
+
+
+class TestNgramIndex:
+    def test_incremental_add_matches_bulk_build(self):
+        """1手ずつの加算と、手の並び全体からの構築が同じ結果になるか"""
+        moves = encode("RPSRRPSPSSRP")
+        bulk = NgramIndex.empty(3)
+        bulk.add_sequence(moves)
+
+        incremental = NgramIndex.empty(3)
+        for i in range(len(moves)):
+            incremental.add(moves[:i + 1])
+
+        assert len(bulk.counts) == 1 + 3 + 9 + 27
+        assert bulk.counts[0] == len(moves)
+        assert (bulk.counts == incremental.counts).all()
+
+    def test_next_counts_backs_off_to_shorter_context(self):
+        index = NgramIndex.empty(3)
+        index.add_sequence(encode("RPRPRPRS"))
+        # "RP" の次は R が3回
+        assert list(index.next_counts(encode("RP"))) == [3, 0, 0]
+        # "SS" は一度も出ていないので "S" → "" と短くして探す
+        assert list(index.next_counts(encode("SS"))) == [4, 3, 1]
+        assert index.next_counts(encode("SS"), min_count=100) is None
+
+    def test_memory_mapped_file_is_shared(self, tmp_path):
+        """同じファイルを開いた索引同士で加算が見えるか (ワーカー間の共有)"""
+        path = str(tmp_path / "ngram.npy")
+        writer = NgramIndex.open(path, order=2)
+        reader = NgramIndex.open(path)
+        assert isinstance(reader.counts, np.memmap)
+        writer.add(encode("RP"))
+        assert reader.order == 2
+        assert list(reader.next_counts(encode("R"))) == [0, 1, 0]
+
+
+def test_population_prior_predictor():
+    index = NgramIndex.empty(2)
+    index.add_sequence(encode("RSRSRSRS"))
+    predictor = PopulationPriorPredictor(index, min_count=2)
+    assert predictor.predict([{"user_move": "R"}]) == "S"
+    assert predictor.predict([]) in ["R", "P", "S"]
+
+    selector = StrategySelector(population_index=index)
+    assert "Population" in selector.predictors
+
+
+@pytest.mark.django_db
+class TestPopulationIntegration:
+    def test_build_command_and_commit_updates(self, settings, tmp_path, django_capture_on_commit_callbacks):
+        """GameLog から索引を作り、対戦のコミットごとに加算されるか"""
+        player = Player.objects.create()
+        for i, move in enumerate("RPS", start=1):
+            GameLog.objects.create(player=player, round_number=i, user_move=move, ai_move="R", result="draw", strategy_used="Random")
+
+        path = tmp_path / "ngram.npy"
+        out = StringIO()
+        call_command("build_population_index", str(path), order=3, stdout=out)
+        assert "3 moves from 1 sequences" in out.getvalue()
+        assert not (tmp_path / "ngram.npy.building").exists()
+        settings.RPS_POPULATION_INDEX = str(path)
+        load_population_index.cache_clear()
+        try:
+            index = load_population_index(str(path), order=3)
+            assert index.counts[0] == 3
+
+            client = Client()
+            with django_capture_on_commit_callbacks(execute=True):
+                body = client.post(reverse('api_play'), {"move": "R"}, content_type="application/json").json()
+            with django_capture_on_commit_callbacks(execute=True):
+                client.post(reverse('api_play'), {"move": "S", "player_id": body["player_id"]}, content_type="application/json")
+
+            assert index.counts[0] == 5
+            assert list(index.next_counts(encode("R"))) == [0, 1, 1]
+        finally:
+            load_population_index.cache_clear()
+            # 実行したコミット後の処理で覚えた戦略名は、テストのロールバックで消える行のもの
+            Strategy.clear_cache()
@@ -3,7 +3,8 @@ from game.ai.predictors import (
     RandomPredictor,
     MarkovPredictor,
     FrequencyPredictor,
-    PatternMatcherPredictor
+    PatternMatcherPredictor,
+    ContextTreePredictor
 )
 
 class TestPredictors:
@@ -72,3 +73,79 @@ class TestPredictors:
         predictors = [RandomPredictor(), MarkovPredictor(), FrequencyPredictor()]
         for p in predictors:
             assert p.predict([]) in ["R", "P", "S"]
+
+class TestContextTreePredictor:
+    def test_learns_higher_order_pattern(self):
+        """1次の遷移では曖昧でも、2次の文脈で次の手を当てられるか"""
+        # R の次は P のことも S のこともあるが、"RR" の次は必ず S
+        predictor = ContextTreePredictor(max_depth=4)
+        moves = "RRSRPS" * 6 + "RR"
+        history = [{"user_move": m} for m in moves]
+        assert predictor.predict(history) == "S"
+
+    def test_incremental_matches_rebuild(self):
+        """1手ずつ取り込んだ木と、まとめて作り直した木が一致するか"""
+        moves = "RPSSRPRRSPSPRRSP" * 3
+        history = [{"user_move": m} for m in moves]
+
+        incremental = ContextTreePredictor(max_depth=3)
+        for i in range(len(history) + 1):
+            incremental.predict(history[:i])
+
+        rebuilt = ContextTreePredictor(max_depth=3)
+        rebuilt.predict(history)
+        assert incremental.size == rebuilt.size
+        assert (incremental.counts[:rebuilt.size] == rebuilt.counts[:rebuilt.size]).all()
+
+        # 履歴が差し替わったら作り直される
+        assert incremental.predict(history[5:]) in ["R", "P", "S"]
+        assert incremental.seen == len(history) - 5
+
+    def test_node_cap_is_respected(self):
+        """ノード数の上限を超えず、枝刈りが行われるか"""
+        import random as rnd
+        rng = rnd.Random(0)
+        predictor = ContextTreePredictor(max_depth=8, max_nodes=64)
+        history = [{"user_move": rng.choice("RPS")} for _ in range(500)]
+        assert predictor.predict(history) in ["R", "P", "S"]
+        assert predictor.size <= 64
+        assert predictor.prunes > 0
+
+    def test_tiny_node_cap(self):
+        """ノード数の上限が文脈1本分しかなくても枝刈りが終わるか"""
+        with pytest.raises(ValueError):
+            ContextTreePredictor(max_depth=4, max_nodes=4)
+        predictor = ContextTreePredictor(max_depth=4, max_nodes=5)
+        history = [{"user_move": m} for m in "RPSSRPRRSPSP" * 5]
+        assert predictor.predict(history) in ["R", "P", "S"]
+        assert predictor.size <= 5
+
+    def test_checkpoint_skips_rebuild_after_warm_up(self, monkeypatch):
+        """ウォームアップで別の履歴を見た後でも、保存済みの状態から差分だけ取り込むか"""
+        history = [{"user_move": m} for m in "RPSSRPRRSPSPRRSP" * 3]
+        saved = ContextTreePredictor(max_depth=3)
+        saved.predict(history[:-2])
+
+        predictor = ContextTreePredictor(max_depth=3, checkpoint=saved.dumps())
+        # ウォームアップ (直近の履歴だけを先頭から順に見る)
+        for i in range(10):
+            predictor.predict(history[-10:][:i])
+        monkeypatch.setattr(predictor, "_clear", lambda: pytest.fail("rebuilt from scratch"))
+        predictor.predict(history)
+
+        rebuilt = ContextTreePredictor(max_depth=3)
+        rebuilt.predict(history)
+        assert predictor.seen == len(history)
+        assert predictor.checkpoint is None
+        assert predictor.size == rebuilt.size
+        assert (predictor.counts[:rebuilt.size] == rebuilt.counts[:rebuilt.size]).all()
+
+    def test_serialization_roundtrip(self):
+        predictor = ContextTreePredictor(max_depth=3)
+        history = [{"user_move": m} for m in "RPSRPSRP"]
+        expected = predictor.predict(history)
+
+        restored = ContextTreePredictor.loads(predictor.dumps())
+        assert restored.seen == predictor.seen
+        assert restored.tail == predictor.tail
+        assert restored.predict(history) == expected
@@ -0,0 +1,74 @@
+import json
+from io import StringIO
+import pytest
+from django.core.management import call_command
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from game import profiling
+
+
+@pytest.mark.django_db
+class TestProfiling:
+    def setup_method(self):
+        self.client = Client()
+
+    def play(self, **headers):
+        return self.client.post(reverse('api_play'), {"move": "R"}, content_type="application/json", headers=headers)
+
+    def test_profile_written_when_enabled(self, settings, tmp_path):
+        """有効化されていればプロファイルとタグ付きのメタ情報が書き出されるか"""
+        settings.RPS_PROFILE_ENABLED = True
+        settings.RPS_PROFILE_DIR = tmp_path
+
+        response = self.play()
+        assert response.status_code == 200
+
+        metas = list(tmp_path.glob("*.json"))
+        assert len(metas) == 1
+        meta = json.loads(metas[0].read_text())
+        assert meta["player_id"] == response.json()["player_id"]
+        assert meta["history_length"] == 0
+        assert "Markov" in meta["predictors"]
+        assert metas[0].with_suffix(".prof").exists()
+        # RNN が動いたので torch.profiler の内訳もある
+        assert (tmp_path / meta["torch_report"]).exists()
+
+        out = StringIO()
+        call_command("profile_summary", dir=str(tmp_path), top=5, stdout=out)
+        assert "1 profiles" in out.getvalue()
+
+    def test_header_token(self, settings, tmp_path):
+        """トークン付きヘッダーのリクエストだけが計測されるか"""
+        settings.RPS_PROFILE_TOKEN = "secret"
+        settings.RPS_PROFILE_DIR = tmp_path
+
+        self.play()
+        self.play(**{"X-RPS-Profile": "wrong"})
+        assert not list(tmp_path.glob("*.prof"))
+
+        self.play(**{"X-RPS-Profile": "secret"})
+        assert len(list(tmp_path.glob("*.prof"))) == 1
+
+    def test_busy_profiler_serves_unprofiled(self, settings, tmp_path):
+        """他のリクエストを計測中なら、計測せずに通常どおり応答するか"""
+        settings.RPS_PROFILE_ENABLED = True
+        settings.RPS_PROFILE_DIR = tmp_path
+
+        with profiling._profile_lock:
+            response = self.play()
+        assert response.status_code == 200
+        assert not list(tmp_path.glob("*.prof"))
+
+        self.play()
+        assert len(list(tmp_path.glob("*.prof"))) == 1
+
+    def test_torch_section_only_when_rnn_runs(self):
+        request = RequestFactory().post("/")
+        request._rps_profile_tags = {}
+        with profiling.torch_section(request, enabled=False):
+            pass
+        assert not hasattr(request, "_rps_torch_profiler")
+
+        with profiling.torch_section(request):
+            pass
+        assert request._rps_torch_profiler is not None
@@ -0,0 +1,93 @@
+import pytest
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from game import engine
+from game.models import Player, GameLog
+from game.ai.models import RPSLSTM
+from game.ai.registry import ModelRegistry, RegistryError
+from game.ai.shared import save_lstm_weights, get_shared_lstm, set_shared_lstm
+
+
+def write_weights(path, hidden_size=8):
+    save_lstm_weights(RPSLSTM(input_size=3, hidden_size=hidden_size, output_size=3), path)
+    return path
+
+
+class TestModelRegistry:
+    def test_publish_activate_and_rollback(self, tmp_path):
+        registry = ModelRegistry(tmp_path / "registry")
+        v1 = registry.publish("rnn", write_weights(tmp_path / "a.pt"), version="v1")
+        v2 = registry.publish("rnn", write_weights(tmp_path / "b.pt"), version="v2")
+        assert registry.current("rnn") == "v2"
+        assert [m["version"] for m in registry.versions("rnn")] == [v1, v2]
+
+        assert registry.rollback("rnn") == "v1"
+        assert registry.current("rnn") == "v1"
+        with pytest.raises(RegistryError):
+            registry.rollback("rnn")
+        with pytest.raises(RegistryError):
+            registry.publish("rnn", tmp_path / "a.pt", version="v1")
+
+    def test_corrupted_artifact_is_rejected(self, tmp_path):
+        registry = ModelRegistry(tmp_path)
+        registry.publish("rnn", write_weights(tmp_path / "a.pt"), version="v1", activate=False)
+        (tmp_path / "rnn" / "versions" / "v1" / "a.pt").write_bytes(b"broken")
+        with pytest.raises(RegistryError):
+            registry.activate("rnn", "v1")
+        assert registry.current("rnn") is None
+
+
+@pytest.mark.django_db
+class TestHotReload:
+    def test_play_switches_model_between_requests(self, settings, tmp_path):
+        """有効な版を切り替えると、再起動なしで次のリクエストから新しい重みが使われ、版が報告されるか"""
+        settings.RPS_MODEL_REGISTRY = str(tmp_path / "registry")
+        settings.RPS_MODEL_REGISTRY_POLL_INTERVAL = 0
+        try:
+            call_command("publish_model", "rnn", str(write_weights(tmp_path / "a.pt")), model_version="v1")
+            client = Client()
+            body = client.post(reverse("api_play"), {"move": "R"}, content_type="application/json").json()
+            assert body["model_version"] == "v1"
+            first_model = get_shared_lstm()[1]
+
+            call_command("publish_model", "rnn", str(write_weights(tmp_path / "b.pt", hidden_size=4)), model_version="v2")
+            body = client.post(reverse("api_play"), {"move": "P", "player_id": body["player_id"]}, content_type="application/json").json()
+            assert body["model_version"] == "v2"
+            assert get_shared_lstm()[1] is not first_model
+            assert get_shared_lstm()[1].hidden_size == 4
+
+            call_command("rollback_model", "rnn")
+            engine.refresh_models()
+            assert get_shared_lstm()[0] == "v1"
+            assert engine.model_metrics()["registry"]["reloads"] == 3
+        finally:
+            set_shared_lstm(None)
+
+    def test_opening_book_rounds_report_book_version(self, settings, tmp_path):
+        """レジストリの定跡表で手を決めたラウンドは、その定跡表の版を報告するか"""
+        settings.RPS_MODEL_REGISTRY = str(tmp_path / "registry")
+        settings.RPS_MODEL_REGISTRY_POLL_INTERVAL = 0
+        player = Player.objects.create()
+        GameLog.objects.create(player=player, round_number=1, user_move="R", ai_move="R", result="draw", strategy_used="Random")
+        call_command("build_opening_book", str(tmp_path / "book.npz"), depth=1, min_count=1)
+        call_command("publish_model", "opening_book", str(tmp_path / "book.npz"), model_version="book-v1")
+
+        body = Client().post(reverse("api_play"), {"move": "R"}, content_type="application/json").json()
+        assert body["strategy"] == engine.OPENING_BOOK_STRATEGY
+        assert body["model_version"] == "book-v1"
+
+    def test_failed_load_keeps_current_model(self, settings, tmp_path):
+        settings.RPS_MODEL_REGISTRY = str(tmp_path / "registry")
+        settings.RPS_MODEL_REGISTRY_POLL_INTERVAL = 0
+        try:
+            call_command("publish_model", "rnn", str(write_weights(tmp_path / "a.pt")), model_version="v1")
+            engine.refresh_models()
+            bad = tmp_path / "bad.pt"
+            bad.write_bytes(b"not a checkpoint")
+            call_command("publish_model", "rnn", str(bad), model_version="v2")
+            engine.refresh_models()
+            assert get_shared_lstm()[0] == "v1"
+            assert "v2" in engine.model_metrics()["registry"]["last_error"]
+        finally:
+            set_shared_lstm(None)
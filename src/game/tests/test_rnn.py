@@ -3,6 +3,15 @@ import torch
 import numpy as np
 from game.ai.models import RPSLSTM
 from game.ai.predictors import RNNPredictor
+from game.ai.shared import (
+    save_lstm_weights,
+    load_lstm_weights,
+    load_shared_lstm,
+    get_shared_lstm,
+    set_shared_lstm,
+)
+from game.ai import trainer as trainer_module
+from game.ai.trainer import BackgroundTrainer
 
 class TestRPSLSTM:
     def test_model_structure(self):
@@ -52,3 +61,96 @@ class TestRNNPredictor:
         moves = ['R', 'P', 'S']
         tensor = predictor._moves_to_tensor(moves)
         assert tensor.shape == (1, 3, 3) # Batch 1, Seq 3, Feat 3
+
+class TestSharedWeights:
+    def test_predictors_share_lstm_weights(self, tmp_path):
+        """共有モデルの LSTM 層は複製されず、学習は出力層だけに反映されるか"""
+        path = tmp_path / "rnn.pt"
+        save_lstm_weights(RPSLSTM(input_size=3, hidden_size=8, output_size=3), path)
+        base = load_lstm_weights(path, mode="mmap")
+        base_fc = base.fc.weight.clone()
+
+        a = RNNPredictor(seq_length=5, base_model=base)
+        b = RNNPredictor(seq_length=5, base_model=base)
+        assert a.model.lstm.weight_ih_l0.data_ptr() == base.lstm.weight_ih_l0.data_ptr()
+        assert b.model.lstm.weight_ih_l0.data_ptr() == base.lstm.weight_ih_l0.data_ptr()
+        assert a.model.fc.weight.data_ptr() != base.fc.weight.data_ptr()
+
+        lstm_before = base.lstm.weight_hh_l0.clone()
+        history = [{'user_move': m} for m in "RPSRPSRPSRPS"]
+        assert a.predict(history) in ['R', 'P', 'S']
+        assert torch.equal(base.lstm.weight_hh_l0, lstm_before)
+        assert torch.equal(base.fc.weight, base_fc)
+        assert not torch.equal(a.model.fc.weight, base_fc)
+
+    def test_shm_mode(self, tmp_path):
+        path = tmp_path / "rnn.pt"
+        save_lstm_weights(RPSLSTM(input_size=3, hidden_size=8, output_size=3), path)
+        model = load_shared_lstm(path, mode="shm", version="v1")
+        assert model.lstm.weight_ih_l0.is_shared()
+        assert get_shared_lstm() == ("v1", model)
+        set_shared_lstm(None)
+
+class TestBackgroundTrainer:
+    def test_batch_is_published_as_new_shared_model(self):
+        """ミニバッチ学習の結果が新しい共有モデルとして公開され、公開済みのモデルは書き換わらないか"""
+        base = RPSLSTM(input_size=3, hidden_size=8, output_size=3)
+        base.requires_grad_(False)
+        set_shared_lstm(base, version="v1")
+        before = base.fc.weight.clone()
+        try:
+            trainer = BackgroundTrainer(seq_length=5, publish_every=1, lr=0.1)
+            trainer.train_batch([([0, 1, 2, 0, 1], 2), ([1, 2, 0, 1, 2], 0)])
+
+            version, published = get_shared_lstm()
+            assert version == "v1+online1"
+            assert published is not base
+            assert not published.fc.weight.requires_grad
+            assert torch.equal(base.fc.weight, before)
+            assert not torch.equal(published.fc.weight, before)
+            assert trainer.metrics()["samples"] == 2
+        finally:
+            set_shared_lstm(None)
+
+    def test_submit_drops_when_queue_is_full(self, monkeypatch):
+        trainer = BackgroundTrainer(seq_length=3, max_queue=1)
+        monkeypatch.setattr(trainer, "_ensure_started", lambda: None)
+        assert not trainer.submit(list("RP"))
+        assert trainer.submit(list("RPSR"))
+        assert not trainer.submit(list("RPSR"))
+        assert trainer.metrics()["dropped"] == 1
+
+    def test_engine_uses_configured_rnn_options(self, settings, monkeypatch):
+        """学習スレッドが本番の RNNPredictor と同じ手数・隠れ層の大きさ (RPS_SELECTOR_OPTIONS) を使うか"""
+        from game import engine
+
+        settings.RPS_RNN_BACKGROUND_TRAINING = True
+        settings.RPS_SELECTOR_OPTIONS = {"rnn_seq_length": 4, "rnn_hidden_size": 8}
+        monkeypatch.setattr(trainer_module, "_trainer", None)
+        monkeypatch.setattr(BackgroundTrainer, "_ensure_started", lambda self: None)
+
+        engine.submit_training([{"user_move": m} for m in "RPSRP"], "S")
+        trainer = trainer_module._trainer
+        assert trainer.seq_length == 4
+        assert trainer._queue.get_nowait() == ([1, 2, 0, 1], 2)
+
+        # 共有モデルがなければ、設定した大きさのモデルを作って学習する
+        monkeypatch.setattr(trainer_module, "get_shared_lstm", lambda: (None, None))
+        trainer.train_batch([([1, 2, 0, 1], 2)])
+        assert trainer.model.hidden_size == 8
+        assert trainer.version is None  # publish_every ステップまでは公開しない
+
+@pytest.mark.django_db
+def test_pretrain_command_writes_loadable_weights(tmp_path):
+    """事前学習コマンドの出力が共有モデルとして読み込めるか"""
+    from django.core.management import call_command
+    from game.models import Player, GameLog
+
+    player = Player.objects.create()
+    for i, move in enumerate("RPS" * 8, start=1):
+        GameLog.objects.create(player=player, round_number=i, user_move=move, ai_move="R", result="draw", strategy_used="Random")
+
+    path = tmp_path / "rnn.pt"
+    call_command("pretrain_rnn", str(path), seq_length=5, hidden_size=8, epochs=1)
+    model = load_lstm_weights(path)
+    assert model.hidden_size == 8
@@ -0,0 +1,123 @@
+import pytest
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from django.test import Client
+from django.core.management import call_command
+from game.models import Player, GameLog, PlayerSummary, PlayerStats, GlobalStats, StrategyUsage
+from game.stats import record_round
+
+
+@pytest.mark.django_db
+class TestStatsAggregates:
+    def setup_method(self):
+        self.client = Client()
+
+    def play(self, player_id, move):
+        data = {"player_id": player_id, "move": move}
+        return self.client.post(reverse('api_play'), data, content_type="application/json").json()
+
+    def test_play_updates_aggregates(self):
+        """対戦ごとにプレイヤー別・全体の集計が更新されるか"""
+        player_id = self.play(None, "R")["player_id"]
+        for move in "PSRP":
+            self.play(player_id, move)
+
+        player_stats = PlayerStats.objects.get(player_id=player_id)
+        assert player_stats.rounds == 5
+        assert player_stats.wins + player_stats.losses + player_stats.draws == 5
+        assert sum(sum(bucket) for bucket in player_stats.timeline) == 5
+
+        global_stats = GlobalStats.objects.get()
+        assert global_stats.rounds == 5
+        assert global_stats.players == 1
+        assert sum(u.count for u in StrategyUsage.objects.filter(player=None)) == 5
+
+    def test_strategy_usage_is_unique(self):
+        """戦略ごとの使用回数は (プレイヤー, 戦略) ごと・全体の戦略ごとに1行だけか"""
+        player = Player.objects.create()
+        for _ in range(3):
+            record_round(player, "win", "Markov_P0")
+        assert StrategyUsage.objects.get(player=player, strategy="Markov_P0").count == 3
+        assert StrategyUsage.objects.get(player=None, strategy="Markov_P0").count == 3
+
+        for owner in (player, None):
+            with pytest.raises(IntegrityError), transaction.atomic():
+                StrategyUsage.objects.create(player=owner, strategy="Markov_P0", count=1)
+
+    def test_stats_endpoints(self):
+        player_id = self.play(None, "R")["player_id"]
+
+        res = self.client.get(reverse('api_player_stats', args=[player_id]))
+        assert res.status_code == 200
+        assert res.json()["rounds"] == 1
+        assert sum(res.json()["strategy_usage"].values()) == 1
+
+        res = self.client.get(reverse('api_global_stats'))
+        assert res.status_code == 200
+        assert res.json()["rounds"] == 1
+
+    def test_reset_clears_player_stats(self):
+        player_id = self.play(None, "R")["player_id"]
+        self.client.post(reverse('api_reset'), {"player_id": player_id}, content_type="application/json")
+
+        assert PlayerStats.objects.get(player_id=player_id).rounds == 0
+        assert not StrategyUsage.objects.filter(player_id=player_id).exists()
+        # 全体の集計は残る
+        assert GlobalStats.objects.get().rounds == 1
+
+    def test_rebuild_stats_from_existing_logs(self):
+        """集計テーブルがない頃の対戦 (ログとサマリー) から集計を作り直せるか"""
+        player = Player.objects.create(epoch=1, total_games=60, wins=40, losses=15, draws=5)
+        # リセット前の世代のログは数えない
+        GameLog.objects.create(player=player, epoch=0, round_number=1, user_move="R", ai_move="P", result="lose", strategy_used="Random")
+        PlayerSummary.objects.create(
+            player=player, epoch=1, compacted_rounds=50, last_round_number=50,
+            result_counts={"win": 30, "lose": 15, "draw": 5},
+            strategy_counts={"Markov_P0": 45, "Safety_StopLoss": 5},
+        )
+        for i in range(10):
+            GameLog.objects.create(player=player, epoch=1, round_number=51 + i, user_move="R", ai_move="S", result="win", strategy_used="Markov_P0")
+        # 対戦していないプレイヤーには集計の行を作らない
+        Player.objects.create()
+
+        call_command("rebuild_stats", batch_size=1)
+        call_command("rebuild_stats")  # 何度実行しても同じ結果になる
+
+        body = self.client.get(reverse('api_player_stats', args=[player.id])).json()
+        assert (body["rounds"], body["wins"], body["losses"], body["draws"]) == (60, 40, 15, 5)
+        assert body["safety_overrides"] == 5
+        assert body["strategy_usage"] == {"Markov_P0": 55, "Safety_StopLoss": 5}
+        # 圧縮済みのラウンドは推移に含めない
+        assert [t["wins"] for t in body["timeline"]] == [0, 10]
+
+        body = self.client.get(reverse('api_global_stats')).json()
+        assert (body["rounds"], body["players"], body["ai_wins"], body["ai_losses"]) == (60, 1, 15, 40)
+        assert body["strategy_usage"] == {"Markov_P0": 55, "Safety_StopLoss": 5}
+
+        body = self.client.get(reverse('api_leaderboard')).json()
+        assert [r["player_id"] for r in body["results"]] == [str(player.id)]
+
+        # 作り直した後も、新しいラウンドは続きとして記録される
+        record_round(player, "win", "Markov_P0")
+        stats = PlayerStats.objects.get(player=player)
+        assert stats.rounds == 61
+        assert stats.timeline[1][0] == 11
+
+    def test_leaderboard_pagination(self):
+        """勝率順に並び、ページ分割されるか"""
+        for wins in range(5):
+            player = Player.objects.create()
+            PlayerStats.objects.create(player=player, rounds=10, wins=wins, losses=10 - wins, win_rate=wins / 10)
+
+        res = self.client.get(reverse('api_leaderboard'), {"page": 1, "page_size": 2})
+        body = res.json()
+        assert body["total"] == 5
+        assert body["num_pages"] == 3
+        assert [r["wins"] for r in body["results"]] == [4, 3]
+
+        body = self.client.get(reverse('api_leaderboard'), {"page": 3, "page_size": 2}).json()
+        assert [r["rank"] for r in body["results"]] == [5]
+
+    def test_leaderboard_invalid_params(self):
+        res = self.client.get(reverse('api_leaderboard'), {"page_size": "x"})
+        assert res.status_code == 400
@@ -1,6 +1,8 @@
+import time
 import pytest
-from game.ai.strategy import StrategySelector
-from game.ai.predictors import RandomPredictor
+from game import engine
+from game.ai.strategy import StrategySelector, predictor_metrics
+from game.ai.predictors import BasePredictor, RandomPredictor
 
 class TestStrategySelector:
     def test_initialization(self):
@@ -29,3 +31,132 @@ class TestStrategySelector:
         
         # 例: RandomPredictorだけのシンプルな状態で確認したいが、
         # ここではブラックボックステストとして「エラーなく動くか」を重視
+
+class SlowPredictor(BasePredictor):
+    """締め切り超過を再現するための遅い予測器"""
+    def __init__(self, delay):
+        self.delay = delay
+
+    def predict(self, history):
+        time.sleep(self.delay)
+        return "R"
+
+class TestParallelSelection:
+    def test_deadline_miss_is_skipped_then_cached(self):
+        """締め切りに遅れた予測器は除外され、終わった結果は次回の代用に使われるか"""
+        selector = StrategySelector(deadlines={"default": 1.0, "Slow": 0.05})
+        selector.predictors = {"Random": RandomPredictor(), "Slow": SlowPredictor(0.3)}
+        selector.scores = {"Random_P0": 0, "Random_P1": 0, "Slow_P0": 5, "Slow_P1": 0}
+
+        started = time.monotonic()
+        move, strategy = selector.select_move([])
+        assert time.monotonic() - started < 0.25
+        # Slow の戦略はスコア最大だが、予測がないので選ばれない
+        assert strategy.startswith("Random")
+        assert selector.deadline_misses["Slow"] == 1
+
+        # 前回の実行が終わっていれば、その予測を代用する
+        time.sleep(0.35)
+        selector.predictors["Slow"].delay = 1.0
+        move, strategy = selector.select_move([])
+        assert strategy == "Slow_P0"
+        assert move == "P"
+        assert selector.deadline_misses["Slow"] == 2
+        assert predictor_metrics()["fallbacks"]["Slow"] >= 1
+
+    def test_parallel_matches_serial(self):
+        """締め切り内に終わる場合は直列実行と同じ予測になるか"""
+        history = [{"user_move": m} for m in "RPSRPSRP"]
+        serial = StrategySelector()
+        parallel = StrategySelector(deadlines={"default": None})
+        assert serial._collect_predictions(history).keys() == parallel._collect_predictions(history).keys()
+        assert parallel.select_move(history)[0] in ["R", "P", "S"]
+
+    def test_warm_up_runs_serially(self):
+        """ウォームアップの再生には締め切りを適用せず、本番の予測にだけ適用するか"""
+        selector = StrategySelector(deadlines={"default": 0.01})
+        selector.predictors = {"Random": RandomPredictor(), "Slow": SlowPredictor(0.02)}
+        selector.scores = {"Random_P0": 0, "Random_P1": 0, "Slow_P0": 0, "Slow_P1": 0}
+        history = [{"user_move": m} for m in "RPSR"]
+
+        engine.warm_up(selector, history, rounds=3)
+        assert selector.deadline_misses["Slow"] == 0
+        assert "Slow" in selector.last_predicted
+
+        # 本番で締め切りに間に合わなくても、ウォームアップ時の予測で代用する
+        selector.select_move(history)
+        assert selector.deadline_misses["Slow"] == 1
+        assert "Slow" in selector.last_predicted
+        assert set(selector.last_strategy_moves) == set(selector.scores)
+
+class CyclePredictor(BasePredictor):
+    """決まった順に手を予測し続ける予測器"""
+    def __init__(self, moves):
+        self.moves = moves
+        self.calls = 0
+
+    def predict(self, history):
+        move = self.moves[self.calls % len(self.moves)]
+        self.calls += 1
+        return move
+
+class TestPredictorPruning:
+    def play(self, selector, rounds):
+        history = []
+        for _ in range(rounds):
+            selector.select_move(history)
+            selector.update_scores("R")
+            history.append({"user_move": "R"})
+
+    def make_selector(self, **options):
+        selector = StrategySelector(**options)
+        # ユーザーがずっと "R" のとき、Leader の戦略はどちらもスコアが減らず、
+        # Stale の戦略は毎ラウンドどちらか一方のスコアが 1 減る
+        selector.predictors = {"Leader": CyclePredictor("S"), "Stale": CyclePredictor("RP")}
+        selector.scores = {"Leader_P0": 0, "Leader_P1": 0, "Stale_P0": 0, "Stale_P1": 0}
+        return selector
+
+    def test_disabled_by_default(self):
+        selector = self.make_selector()
+        self.play(selector, 20)
+        assert not selector.suspended
+        assert "Stale" in selector.last_predicted
+        # 設定の既定値でも刈り込まない
+        assert engine.pruning_options() == {}
+
+    def test_dominated_predictor_is_suspended_and_probed(self):
+        """劣勢が続いた予測器は休止し、一定ラウンドごとに1ラウンドだけ実行し直されるか"""
+        selector = self.make_selector(prune_margin=3, prune_patience=2, prune_probe_interval=5)
+        # 6ラウンド目で差が 3 になり、7ラウンド目で2ラウンド連続の劣勢になる
+        self.play(selector, 7)
+        assert selector.suspended == {"Stale": 12}
+        calls = selector.predictors["Stale"].calls
+
+        self.play(selector, 5)
+        assert selector.predictors["Stale"].calls == calls
+        assert selector.pruned_rounds["Stale"] == 5
+        assert selector.last_predicted == ["Leader"]
+
+        # 13ラウンド目は様子見で実行し、まだ劣勢なのですぐ休止に戻る
+        self.play(selector, 1)
+        assert "Stale" in selector.last_predicted
+        assert selector.suspended == {"Stale": 18}
+
+        metrics = predictor_metrics()["pruning"]
+        assert metrics["suspensions"]["Stale"] >= 2
+        assert metrics["skipped_rounds"]["Stale"] >= 5
+        assert metrics["estimated_saved_ms"]["Stale"] >= 0
+        assert "Leader" in metrics["avg_cost_ms"]
+
+    def test_resumes_when_leader_falls(self):
+        """最良の戦略のスコアが落ちていれば、様子見のラウンドの後も実行を続けるか"""
+        selector = self.make_selector(prune_margin=3, prune_patience=2, prune_probe_interval=5)
+        self.play(selector, 7)
+        assert "Stale" in selector.suspended
+
+        # プレイヤーの傾向が変わって Leader のスコアが落ちた状態
+        selector.scores["Leader_P0"] = selector.scores["Leader_P1"] = -3
+        self.play(selector, 6)
+        assert not selector.suspended
+        self.play(selector, 1)
+        assert "Stale" in selector.last_predicted
@@ -0,0 +1,74 @@
+import json
+import pytest
+from django.core.management import call_command
+from game.ai.safety import SafetyMechanism
+from game.ai.strategy import StrategySelector
+from game.ai.sweep import configurations, rank, replay, run_sweep
+from game.models import Player, GameLog
+
+
+class TestParameters:
+    def test_safety_windows(self):
+        history = [{"user_move": "R", "result": "draw"}] * 4
+        assert SafetyMechanism().check_override(history) == (None, None)
+        assert SafetyMechanism(spam_window=4, spam_threshold=3).check_override(history) == ("P", "Safety_AntiSpam")
+
+    def test_score_decay(self):
+        selector = StrategySelector(score_decay=0.5)
+        selector.select_move([{"user_move": "R"}] * 5)
+        selector.update_scores("R")
+        assert all(abs(score) <= 0.5 for score in selector.scores.values())
+        assert StrategySelector(pattern_max_length=4).predictors["Pattern"].max_length == 4
+
+
+class TestSweep:
+    def test_configurations(self):
+        grid = {"warmup_rounds": [10, 50], "score_decay": [None, 0.9]}
+        assert len(configurations(grid)) == 4
+        assert len(configurations(grid, samples=3)) == 3
+        with pytest.raises(ValueError):
+            configurations({"unknown": [1]})
+
+    def test_rank_marks_pareto_front(self):
+        results = rank([
+            {"config": {"a": 1}, "ai_win_rate": 0.6, "ms_per_round": 5.0},
+            {"config": {"a": 2}, "ai_win_rate": 0.6, "ms_per_round": 1.0},
+            {"config": {"a": 3}, "ai_win_rate": 0.5, "ms_per_round": 2.0},
+            {"config": {"a": 4}, "ai_win_rate": 0.4, "ms_per_round": 0.5},
+        ])
+        assert [r["config"]["a"] for r in results] == [2, 1, 3, 4]
+        assert [r["pareto"] for r in results] == [True, False, False, True]
+
+    def test_replay_is_reproducible(self):
+        """同じシードなら同じ結果になり、AIは固定の手に勝ち越すか"""
+        moves = [0] * 30
+        config = {"warmup_rounds": 5, "rnn_hidden_size": 4}
+        first = replay(moves, config, mode="stateless", seed=1)
+        assert first[:3] == replay(moves, config, mode="stateless", seed=1)[:3]
+        assert sum(first[:3]) == 30
+        assert first[0] > first[1]
+
+    def test_run_sweep_across_processes(self):
+        """共有メモリ上の履歴をワーカープロセスで再生し、設定ごとに合算されるか"""
+        sequences = [[0, 1, 2] * 8, [0] * 20, [2, 2, 1] * 5]
+        configs = configurations({"warmup_rounds": [0, 10], "rnn_hidden_size": [4]})
+        results = run_sweep(sequences, configs, mode="session", workers=2, chunk_size=2)
+        assert len(results) == 2
+        assert all(r["rounds"] == 24 + 20 + 15 for r in results)
+        assert any(r["pareto"] for r in results)
+
+
+@pytest.mark.django_db
+def test_sweep_command(tmp_path):
+    player = Player.objects.create()
+    for i, move in enumerate("RPS" * 10, start=1):
+        GameLog.objects.create(player=player, round_number=i, user_move=move, ai_move="R", result="draw", strategy_used="Random")
+
+    output = tmp_path / "sweep.json"
+    call_command(
+        "sweep", json.dumps({"stop_loss_window": [10, 20], "rnn_hidden_size": [4]}),
+        mode="session", workers=1, min_rounds=10, output=str(output),
+    )
+    results = json.loads(output.read_text())
+    assert len(results) == 2
+    assert results[0]["rounds"] == 30
@@ -1,6 +1,8 @@
 import pytest
 from django.urls import reverse
 from game.models import Player, GameLog
+from game import engine
+from game.ai.predictors import ContextTreePredictor
 import json
 from django.test import Client
 
@@ -73,8 +75,8 @@ class TestGameAPI:
         assert player.total_games == 0
         assert player.wins == 0
         
-        # ログが消えているか
-        assert GameLog.objects.filter(player=player).count() == 0
+        # ログが消えているか (リセット後の世代からは見えない)
+        assert GameLog.objects.current(player).count() == 0
 
     def test_index_view(self):
         """トップページが正しく表示されるか"""
@@ -114,3 +116,23 @@ class TestGameAPI:
             # 旧ロジック (wins / total) と一致しないことを確認 (勝率が0でなければ)
             if wins > 0:
                  assert win_rate != (wins / stats["total"])
+
+    def test_context_tree_is_carried_over(self):
+        """ContextTreePredictor の木が保存され、次のリクエストで引き継がれるか"""
+        store = engine.context_tree_store()
+        hits = store.metrics()["hits"]
+        player_id = None
+        for move in "RPSR":
+            data = {"move": move, "player_id": player_id}
+            player_id = self.client.post(reverse('api_play'), data, content_type="application/json").json()["player_id"]
+
+        assert store.metrics()["hits"] - hits == 3
+        found, checkpoint = store.get((player_id, 0, 0))
+        assert found
+        assert ContextTreePredictor.loads(checkpoint).seen == 3
+
+    def test_metrics_view(self):
+        """ワーカーの実行時メトリクスが取得できるか"""
+        response = self.client.get(reverse('api_metrics'))
+        assert response.status_code == 200
+        assert "deadline_misses" in response.json()["predictors"]
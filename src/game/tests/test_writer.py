@@ -0,0 +1,79 @@
+import threading
+import pytest
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from game import engine, writer
+from game.models import Player, GameLog
+from game.writer import CommitQueue, CommitTimeout, run_write
+
+
+@pytest.mark.django_db(transaction=True)
+class TestCommitQueue:
+    def test_batches_writes_and_isolates_failures(self):
+        """複数の書き込みが1トランザクションにまとめられ、失敗した1件だけがエラーになるか"""
+        commit_queue = CommitQueue(max_batch=10, max_wait=0.2)
+        players = [Player.objects.create() for _ in range(3)]
+
+        def create_log(player):
+            return GameLog.objects.create(player=player, round_number=1, user_move="R", ai_move="P", result="lose", strategy_used="Random").id
+
+        def fail():
+            raise ValueError("boom")
+
+        futures = [commit_queue.submit(create_log, p) for p in players]
+        failing = commit_queue.submit(fail)
+
+        assert all(isinstance(f.result(timeout=5), int) for f in futures)
+        with pytest.raises(ValueError):
+            failing.result(timeout=5)
+        assert GameLog.objects.count() == 3
+        assert commit_queue.metrics()["commits"] == 1
+        assert commit_queue.metrics()["largest_batch"] == 4
+
+    def test_persist_round_through_single_writer(self, settings):
+        """単一ライターモードで並行リクエストのラウンドがすべて保存されるか"""
+        settings.RPS_SQLITE_SINGLE_WRITER = True
+        players = [Player.objects.create() for _ in range(8)]
+
+        def play(player):
+            try:
+                engine.apply_result(player, "win")
+                engine.persist_round(player, "R", "S", "win", "Markov_P0")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=play, args=(p,)) for p in players]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert GameLog.objects.count() == 8
+        assert all(p.total_games == 1 for p in Player.objects.all())
+
+    def test_timed_out_write_is_cancelled(self, settings, monkeypatch):
+        """待ち時間内に始まらなかった書き込みは取り消され、後からコミットされないか"""
+        settings.RPS_SQLITE_SINGLE_WRITER = True
+        settings.RPS_COMMIT_QUEUE_TIMEOUT = 0.1
+        commit_queue = CommitQueue(max_batch=1, max_wait=0)
+        monkeypatch.setattr(writer, "_commit_queue", commit_queue)
+        release = threading.Event()
+        ran = []
+
+        blocking = commit_queue.submit(release.wait, 5)
+        with pytest.raises(CommitTimeout):
+            run_write(ran.append, "late")
+        release.set()
+        blocking.result(timeout=5)
+        assert run_write(ran.append, "next") is None
+        assert ran == ["next"]
+
+    def test_play_returns_busy_on_commit_timeout(self, monkeypatch):
+        def timeout(*args, **kwargs):
+            raise CommitTimeout("busy")
+
+        monkeypatch.setattr(engine, "persist_round", timeout)
+        response = Client().post(reverse('api_play'), {"move": "R"}, content_type="application/json")
+        assert response.status_code == 503
+        assert response["Retry-After"]
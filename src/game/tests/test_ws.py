@@ -0,0 +1,64 @@
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from game.models import Player, GameLog
+from game import ws
+
+
+def connect(path="/ws/play/", query_string=b""):
+    scope = {"type": "websocket", "path": path, "query_string": query_string}
+    return ApplicationCommunicator(ws.websocket_application, scope)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestPlaySocket:
+    def test_play_session(self):
+        """接続中に複数ラウンド対戦でき、切断時にすべて保存されるか"""
+        async def scenario():
+            comm = connect()
+            await comm.send_input({"type": "websocket.connect"})
+            assert (await comm.receive_output(5))["type"] == "websocket.accept"
+            hello = json.loads((await comm.receive_output(5))["text"])
+
+            for move in "RPS":
+                await comm.send_input({"type": "websocket.receive", "text": json.dumps({"move": move})})
+                body = json.loads((await comm.receive_output(5))["text"])
+                assert body["ai_move"] in ["R", "P", "S"]
+                assert body["player_id"] == hello["player_id"]
+
+            await comm.send_input({"type": "websocket.receive", "text": json.dumps({"move": "X"})})
+            assert json.loads((await comm.receive_output(5))["text"]) == {"error": "Invalid move"}
+
+            await comm.send_input({"type": "websocket.disconnect", "code": 1000})
+            await comm.wait(5)
+            return hello["player_id"]
+
+        player_id = async_to_sync(scenario)()
+        player = Player.objects.get(id=player_id)
+        assert player.total_games == 3
+        assert [log.user_move for log in GameLog.objects.current(player).order_by("round_number")] == ["R", "P", "S"]
+        assert ws.active_sessions() == 0
+
+    def test_connection_cap(self, settings):
+        """接続数の上限を超えると受け付けないか"""
+        settings.RPS_WS_MAX_CONNECTIONS = 0
+
+        async def scenario():
+            comm = connect()
+            await comm.send_input({"type": "websocket.connect"})
+            return await comm.receive_output(5)
+
+        assert async_to_sync(scenario)() == {"type": "websocket.close", "code": ws.CLOSE_TRY_AGAIN_LATER}
+
+    def test_idle_timeout(self, settings):
+        settings.RPS_WS_IDLE_TIMEOUT = 0.1
+
+        async def scenario():
+            comm = connect()
+            await comm.send_input({"type": "websocket.connect"})
+            outputs = [await comm.receive_output(5) for _ in range(3)]
+            await comm.wait(5)
+            return outputs[-1]
+
+        assert async_to_sync(scenario)() == {"type": "websocket.close", "code": ws.CLOSE_IDLE}
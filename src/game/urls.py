@@ -5,4 +5,8 @@ urlpatterns = [
     path('', views.index_view, name='index'),
     path('api/play/', views.play_view, name='api_play'),
     path('api/reset/', views.reset_view, name='api_reset'),
+    path('api/stats/global/', views.global_stats_view, name='api_global_stats'),
+    path('api/stats/<uuid:player_id>/', views.player_stats_view, name='api_player_stats'),
+    path('api/leaderboard/', views.leaderboard_view, name='api_leaderboard'),
+    path('api/metrics/', views.metrics_view, name='api_metrics'),
 ]
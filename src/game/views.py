@@ -1,13 +1,22 @@
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
+from django.db.models import F
 import json
 import uuid
-from .models import Player, GameLog
-from .ai.strategy import StrategySelector
-from .ai.safety import SafetyMechanism
+from .models import Player
+from . import admission, engine, profiling, stats
+from .admission import admission_metrics
+from .db_routers import analytics_reads
+from .writer import CommitTimeout, commit_queue_metrics
+from .ai.trainer import trainer_metrics
+from .ai.memo import prediction_cache_metrics
+from .ai.strategy import predictor_metrics
 
 @csrf_exempt
+@admission.admission_control
+@profiling.profile_view
 def play_view(request):
     if request.method != "POST":
         return JsonResponse({"error": "Method not allowed"}, status=405)
@@ -24,98 +33,70 @@ def play_view(request):
 
 
     # 1. Playerの取得または作成
-    player = None
-    if player_id:
-        try:
-            player = Player.objects.get(id=player_id)
-        except Player.DoesNotExist:
-            pass # Invalid IDなら新規作成へ
-            
-    if not player:
-        player = Player.objects.create()
+    player = engine.get_or_create_player(player_id)
 
     # 2. 履歴の取得 (AI入力用)
-    # 古い順に取得
-    logs = GameLog.objects.filter(player=player).order_by('timestamp')
-    history = [{"user_move": log.user_move, "result": log.result} for log in logs]
-
-    # 3. AIの初期化とウォームアップ (ステートレス対応)
-    selector = StrategySelector()
-    safety = SafetyMechanism()
-    
-    # 過去の履歴を使ってスコアを復元 (直近50件程度で十分)
-    # 注意: 全履歴を入れると重くなる可能性がある
-    warmup_history = history[-50:] if len(history) > 50 else history
-    
-    # ウォームアップ: 過去の時点でどう予測したかをシミュレートしてスコア更新
-    # しかし、正確にやるには「その時点でのhistory」が必要。
-    # ここでは簡易的に、現在のhistoryから直近N個を使って学習させる。
-    # 正確な再現は計算コストが高いので、今回は「直近の傾向」だけ掴ませる。
-    
-    temp_hist = []
-    # warmup_historyの最初から順番に見ていく
-    for h in warmup_history:
-        # この時点での手を選ぶ (スコア更新用データをセットするため)
-        # 実際にはここでは予測結果を使わないが、select_moveを呼ばないとlast_strategy_movesがセットされない
-        selector.select_move(temp_hist)
-        
-        # ユーザーの手でスコア更新
-        selector.update_scores(h["user_move"])
-        
-        # 履歴に追加
-        temp_hist.append(h)
+    history = engine.load_history(player)
 
-    # 4. 今の手を決定
-    ai_move, strategy_name = selector.select_move(history)
+    # レジストリで新しい版のモデルが有効になっていれば、このリクエストから切り替える
+    engine.refresh_models()
 
-    # 安全策チェック
-    override_move, override_strategy = safety.check_override(history)
-    if override_move:
-        ai_move = override_move
-        strategy_name = override_strategy
+    # 混雑時は予測器を減らして応答する (縮退レベルは admission_control が決める)
+    level = admission.degradation_level(request)
 
-    # 5. 勝敗判定
-    result = "draw"
-    if user_move == ai_move:
-        result = "draw"
-        player.draws += 1
-    elif (user_move == "R" and ai_move == "S") or \
-         (user_move == "P" and ai_move == "R") or \
-         (user_move == "S" and ai_move == "P"):
-        result = "win" # User win
-        player.wins += 1
+    # 3. 序盤は定跡表から直接手を決める (予測器は使わない)
+    ai_move, model_version = engine.opening_move(player, history)
+    if ai_move:
+        strategy_name = engine.OPENING_BOOK_STRATEGY
+        predicted = []
     else:
-        result = "lose" # User lose
-        player.losses += 1
-    
-    player.total_games += 1
-    player.save()
-
-    # 6. ログ保存
-    GameLog.objects.create(
-        player=player,
-        round_number=player.total_games,
-        user_move=user_move,
-        ai_move=ai_move,
-        result=result,
-        strategy_used=strategy_name
+        # AIの初期化とウォームアップ (ステートレス対応)
+        # (プロファイル時は予測器も計測できるよう、リクエストのスレッドで直列に実行する)
+        selector = engine.build_selector(
+            player, parallel=not profiling.active(request), degradation_level=level, history=history
+        )
+        safety = engine.build_safety()
+        # RNN を使うときだけ torch.profiler でも計測する (プロファイル対象のリクエストのみ)
+        with profiling.torch_section(request, enabled="RNN" in selector.predictors):
+            engine.warm_up(selector, history)
+
+            # 4. 今の手を決定 (安全策チェックを含む)
+            ai_move, strategy_name = engine.decide(selector, safety, history)
+        engine.save_context_tree(selector, player, history)
+        predicted = selector.last_predicted
+        model_version = selector.model_version if "RNN" in selector.predictors else None
+    profiling.tag(
+        request,
+        player_id=str(player.id),
+        history_length=len(history),
+        predictors=predicted,
+        strategy=strategy_name,
+        degradation_level=level,
+        model_version=model_version,
     )
 
+    # 5. 勝敗判定
+    result = engine.judge(user_move, ai_move)
+    engine.apply_result(player, result)
+
+    # 6. ログ保存 (集計テーブルも同じトランザクションで更新)
+    try:
+        recorded = engine.persist_round(player, user_move, ai_move, result, strategy_name,
+                                        previous_moves=engine.recent_moves(history))
+    except CommitTimeout:
+        # 書き込みは取り消されているので、このラウンドはなかったことになる
+        response = JsonResponse({"error": "Server busy"}, status=503)
+        response["Retry-After"] = str(admission.get_controller().retry_after)
+        return response
+    if not recorded:
+        # 対戦中にリセットされたラウンドは保存しない。レスポンスにはリセット後のカウンタを返す
+        player.refresh_from_db(fields=["epoch", "total_games", "wins", "losses", "draws"])
+    engine.submit_training(history, user_move)
+
     # 7. レスポンス
-    return JsonResponse({
-        "result": result,
-        "ai_move": ai_move,
-        "player_id": str(player.id),
-        "stats": {
-            "total": player.total_games,
-            "wins": player.wins,
-            "losses": player.losses,
-            "draws": player.draws,
-            "win_rate": player.wins / (player.wins + player.losses) if (player.wins + player.losses) > 0 else 0,
-            "ai_win_rate": player.losses / (player.wins + player.losses) if (player.wins + player.losses) > 0 else 0
-        },
-        "strategy": strategy_name
-    })
+    payload = engine.round_payload(player, result, ai_move, strategy_name, model_version=model_version)
+    payload["degradation_level"] = level
+    return JsonResponse(payload)
 
 def index_view(request):
     return render(request, 'game/index.html')
@@ -136,16 +117,67 @@ def reset_view(request):
 
     try:
         player = Player.objects.get(id=player_id)
-        # ログ削除
-        GameLog.objects.filter(player=player).delete()
-        # カウンタ類リセット
-        player.total_games = 0
-        player.wins = 0
-        player.losses = 0
-        player.draws = 0
-        player.current_phase = 1
-        player.save()
+        with transaction.atomic():
+            # 世代を進めて過去のログを参照対象外にする (ログ・サマリーの削除は gc_gamelogs で行う)。
+            # 同時に保存されるラウンドに古い世代で上書きされないよう、DB 上で加算する
+            Player.objects.filter(pk=player.pk).update(
+                epoch=F("epoch") + 1,
+                # カウンタ類リセット
+                total_games=0, wins=0, losses=0, draws=0, current_phase=1,
+            )
+            stats.reset_player(player)
         
         return JsonResponse({"status": "success", "message": "Memory erased."})
     except Player.DoesNotExist:
         return JsonResponse({"error": "Player not found"}, status=404)
+
+def player_stats_view(request, player_id):
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    # 統計の読み取りは分析用DBで行い、対戦の書き込みと競合させない
+    with analytics_reads():
+        try:
+            player = Player.objects.get(id=player_id)
+        except Player.DoesNotExist:
+            return JsonResponse({"error": "Player not found"}, status=404)
+
+        return JsonResponse(stats.player_stats(player))
+
+def global_stats_view(request):
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    with analytics_reads():
+        return JsonResponse(stats.global_stats())
+
+def leaderboard_view(request):
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    try:
+        page = int(request.GET.get("page", 1))
+        page_size = min(int(request.GET.get("page_size", 20)), 100)
+        min_rounds = int(request.GET.get("min_rounds", 10))
+    except ValueError:
+        return JsonResponse({"error": "Invalid query parameter"}, status=400)
+    if page_size < 1:
+        return JsonResponse({"error": "Invalid query parameter"}, status=400)
+
+    with analytics_reads():
+        return JsonResponse(stats.leaderboard(page=page, page_size=page_size, min_rounds=min_rounds))
+
+def metrics_view(request):
+    """このワーカープロセスの実行時メトリクス"""
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    return JsonResponse({
+        "predictors": predictor_metrics(),
+        "commit_queue": commit_queue_metrics(),
+        "admission": admission_metrics(),
+        "rnn_trainer": trainer_metrics(),
+        "prediction_cache": prediction_cache_metrics(),
+        "models": engine.model_metrics(),
+        "context_trees": engine.context_tree_metrics(),
+    })
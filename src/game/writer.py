@@ -0,0 +1,145 @@
+"""
+SQLite 向けの単一ライター・コミットキュー。
+
+SQLite は同時に1つの書き込みトランザクションしか持てないため、リクエストごとにコミットすると
+ロック待ちや "database is locked" が起きやすい。ラウンドの保存を専用スレッド1本に集約し、
+短い間に届いた複数リクエスト分を1トランザクションでまとめてコミットする。
+各リクエストの処理はセーブポイントで区切るので、1件の失敗が他のラウンドを巻き込まない。
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class CommitTimeout(Exception):
+    """コミットキューが混んでいて、待ち時間内に書き込みを始められなかった (書き込みは取り消し済み)"""
+    pass
+
+
+class CommitQueue:
+    def __init__(self, max_batch=64, max_wait=0.002):
+        """
+        Args:
+            max_batch (int): 1トランザクションにまとめる最大件数
+            max_wait (float): 最初の1件が届いてから後続を待つ最大時間 (秒)
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self.commits = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """fn をライタースレッドのトランザクション内で実行する。結果は Future で返す"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                "commits": self.commits,
+                "items": self.items,
+                "largest_batch": self.largest_batch,
+                "avg_batch": self.items / self.commits if self.commits else 0,
+                "pending": self._queue.qsize(),
+            }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="rps-commit-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        done = []
+        try:
+            with transaction.atomic():
+                for fn, args, kwargs, future in batch:
+                    # 待ちきれずに取り消された書き込みは実行しない
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic():
+                            done.append((future, fn(*args, **kwargs)))
+                    except Exception as e:
+                        future.set_exception(e)
+        except Exception as e:
+            # コミット自体に失敗した場合は、このバッチのすべてを失敗扱いにする
+            logger.exception("Commit of %d queued writes failed", len(batch))
+            connection.close()
+            for future, _ in done:
+                future.set_exception(e)
+            return
+
+        with self._metrics_lock:
+            self.commits += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+        for future, result in done:
+            future.set_result(result)
+
+
+_commit_queue = None
+_commit_queue_lock = threading.Lock()
+
+
+def get_commit_queue():
+    """プロセス内で共有するコミットキュー"""
+    global _commit_queue
+    with _commit_queue_lock:
+        if _commit_queue is None:
+            _commit_queue = CommitQueue(
+                max_batch=getattr(settings, "RPS_COMMIT_QUEUE_MAX_BATCH", 64),
+                max_wait=getattr(settings, "RPS_COMMIT_QUEUE_MAX_WAIT", 0.002),
+            )
+        return _commit_queue
+
+
+def run_write(fn, *args, **kwargs):
+    """
+    書き込み処理を実行する。RPS_SQLITE_SINGLE_WRITER が有効ならライタースレッド経由で実行し、
+    コミットされるまで待つ。無効なら呼び出し元のスレッドでそのまま実行する。
+    RPS_COMMIT_QUEUE_TIMEOUT 秒待っても書き込みが始まらなければ、取り消して CommitTimeout を送出する。
+    """
+    if not getattr(settings, "RPS_SQLITE_SINGLE_WRITER", False):
+        return fn(*args, **kwargs)
+    timeout = getattr(settings, "RPS_COMMIT_QUEUE_TIMEOUT", 30)
+    future = get_commit_queue().submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        # まだ始まっていなければ取り消す (後から黙ってコミットされないように)
+        if future.cancel():
+            raise CommitTimeout(f"Write not started within {timeout}s") from None
+    # すでに実行中のバッチに入っているので、コミットされるまで待つ
+    return future.result()
+
+
+def commit_queue_metrics():
+    return _commit_queue.metrics() if _commit_queue is not None else None
@@ -0,0 +1,175 @@
+"""
+WebSocket での対戦セッション (ASGI)。
+
+接続中はプレイヤーの StrategySelector・SafetyMechanism・直近の履歴をメモリに保持し、
+1手ごとの履歴取得やウォームアップを省く。ラウンドの保存は接続ごとの書き込みタスクで非同期に行う。
+"""
+import asyncio
+import copy
+import json
+import logging
+import threading
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import engine
+
+logger = logging.getLogger(__name__)
+
+PLAY_PATH = "/ws/play/"
+
+# クローズコード
+CLOSE_NOT_FOUND = 4404
+CLOSE_IDLE = 4408
+CLOSE_TRY_AGAIN_LATER = 1013
+
+_active_lock = threading.Lock()
+_active_sessions = 0
+
+
+def active_sessions():
+    return _active_sessions
+
+
+def _acquire_slot():
+    """ワーカーあたりの同時接続数の上限内なら枠を確保する"""
+    global _active_sessions
+    with _active_lock:
+        if _active_sessions >= getattr(settings, "RPS_WS_MAX_CONNECTIONS", 200):
+            return False
+        _active_sessions += 1
+        return True
+
+
+def _release_slot():
+    global _active_sessions
+    with _active_lock:
+        _active_sessions -= 1
+
+
+class PlaySession:
+    """1接続分の対戦状態"""
+    def __init__(self, player, history, selector):
+        self.player = player
+        self.history = history
+        self.selector = selector
+        self.safety = engine.build_safety()
+        self.history_limit = getattr(settings, "RPS_WS_HISTORY_LIMIT", 1000)
+        self.model_version = None  # 直前のラウンドの手を決めたモデルの版 (round_payload を参照)
+
+    @classmethod
+    def open(cls, player_id):
+        """プレイヤーの履歴を読み込み、AIを一度だけウォームアップする"""
+        player = engine.get_or_create_player(player_id)
+        history = engine.load_history(player)
+        # 接続中は接続時の版のモデルを使い続ける (切り替えは次の接続から)
+        engine.refresh_models()
+        selector = engine.build_selector(player, history=history)
+        engine.warm_up(selector, history)
+        return cls(player, history, selector)
+
+    def play(self, user_move):
+        """1ラウンド進める (DBアクセスなし)"""
+        ai_move, self.model_version = engine.opening_move(self.player, self.history)
+        if ai_move:
+            strategy_name = engine.OPENING_BOOK_STRATEGY
+            # 予測器を使っていないラウンドはスコアを更新しない
+            self.selector.last_strategy_moves = {}
+        else:
+            ai_move, strategy_name = engine.decide(self.selector, self.safety, self.history)
+            self.model_version = self.selector.model_version
+        result = engine.judge(user_move, ai_move)
+        engine.apply_result(self.player, result)
+        engine.submit_training(self.history, user_move)
+
+        # 接続中はスコアを毎ラウンド更新し続ける (ウォームアップ不要)
+        self.selector.update_scores(user_move)
+        self.history.append({"user_move": user_move, "result": result})
+        if len(self.history) > self.history_limit * 2:
+            # 毎ラウンド切り詰めると差分更新する予測器が作り直しになるので、まとめて捨てる
+            del self.history[:-self.history_limit]
+        return ai_move, strategy_name, result
+
+
+async def _send_json(send, data):
+    await send({"type": "websocket.send", "text": json.dumps(data)})
+
+
+async def _writer(queue):
+    """ラウンドを受け取った順に保存する"""
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        try:
+            if not await sync_to_async(engine.persist_round)(*item):
+                logger.info("Dropped round for player %s reset during the session", item[0].id)
+        except Exception:
+            logger.exception("Failed to persist round for player %s", item[0].id)
+
+
+async def websocket_application(scope, receive, send):
+    """ws/play/ 用の ASGI アプリケーション"""
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+    if scope.get("path") != PLAY_PATH:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+    if not _acquire_slot():
+        await send({"type": "websocket.close", "code": CLOSE_TRY_AGAIN_LATER})
+        return
+
+    try:
+        await _run_session(scope, receive, send)
+    finally:
+        _release_slot()
+
+
+async def _run_session(scope, receive, send):
+    params = parse_qs(scope.get("query_string", b"").decode())
+    player_id = params.get("player_id", [None])[0]
+    session = await sync_to_async(PlaySession.open)(player_id)
+
+    await send({"type": "websocket.accept"})
+    await _send_json(send, {"type": "session", "player_id": str(session.player.id)})
+
+    idle_timeout = getattr(settings, "RPS_WS_IDLE_TIMEOUT", 300)
+    queue = asyncio.Queue()
+    writer = asyncio.create_task(_writer(queue))
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(receive(), timeout=idle_timeout)
+            except asyncio.TimeoutError:
+                await send({"type": "websocket.close", "code": CLOSE_IDLE})
+                break
+
+            if message["type"] == "websocket.disconnect":
+                break
+            if message["type"] != "websocket.receive":
+                continue
+
+            try:
+                data = json.loads(message.get("text") or message.get("bytes") or b"")
+                user_move = data.get("move")
+            except (json.JSONDecodeError, AttributeError):
+                await _send_json(send, {"error": "Invalid JSON"})
+                continue
+            if user_move not in ["R", "P", "S"]:
+                await _send_json(send, {"error": "Invalid move"})
+                continue
+
+            previous_moves = engine.recent_moves(session.history)
+            ai_move, strategy_name, result = await asyncio.to_thread(session.play, user_move)
+            # 次のラウンドでカウンタが変わる前の状態を保存用に写しておく
+            await queue.put((copy.copy(session.player), user_move, ai_move, result, strategy_name, previous_moves))
+            await _send_json(send, engine.round_payload(
+                session.player, result, ai_move, strategy_name, model_version=session.model_version
+            ))
+    finally:
+        # 未保存のラウンドを書き切ってから終了する
+        await queue.put(None)
+        await writer
@@ -2,6 +2,8 @@
 ASGI config for rps_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections go to the game's play session
+handler (``game.ws``). Run it with an ASGI server such as uvicorn or daphne.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rps_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Import after Django is set up: game.ws uses the ORM and settings.
+from game.ws import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        return await websocket_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -77,9 +78,40 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # SQLite tuning for concurrent requests: IMMEDIATE transactions take the write
+        # lock up front (no lock-upgrade deadlocks), and timeout (the sqlite3 busy
+        # timeout, in seconds) waits for the lock instead of failing.
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
     }
 }
 
+# WAL lets readers run alongside the writer. Unlike the pragmas above it is stored
+# in the database file itself, so it is opt-in for deployments (RPS_SQLITE_WAL=1)
+# and never rewrites the checked-in development database.
+if os.environ.get('RPS_SQLITE_WAL', '') == '1':
+    DATABASES['default']['OPTIONS']['init_command'] = (
+        'PRAGMA journal_mode=WAL;' + DATABASES['default']['OPTIONS']['init_command']
+    )
+
+# Read-only copy for analytics, export and stats reads (see game.db_routers).
+# Set RPS_ANALYTICS_DB_NAME to a second SQLite file and keep it fresh with
+# `manage.py sync_analytics_db`. Without it, every read stays on `default`.
+if os.environ.get('RPS_ANALYTICS_DB_NAME'):
+    DATABASES['analytics'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['RPS_ANALYTICS_DB_NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['game.db_routers.AnalyticsRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -121,3 +153,81 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Evolutionary RPS
+
+# 予測器ごとの応答締め切り (秒)。"default" は個別指定のない予測器に適用される。
+# None にすると予測器を直列に実行する。
+RPS_PREDICTOR_DEADLINES = {"default": 0.25}
+
+# 予測器の並列実行に使うスレッド数
+RPS_PREDICTOR_WORKERS = 8
+
+# 最良の戦略にスコアで margin 以上離された状態が patience ラウンド続いた予測器を休止させ、
+# probe_interval ラウンドごとに1ラウンドだけ実行し直す (プレイヤーごと)。None なら刈り込まない。
+# AI の選ぶ戦略が変わるので、sweep で値を確かめてから有効にする (例: {"margin": 5, "patience": 10, "probe_interval": 20})
+RPS_PREDICTOR_PRUNING = None
+
+# 調整用のパラメーター (sweep コマンドで探索した値をここに設定する)
+RPS_WARMUP_ROUNDS = 50       # play_view のウォームアップに使う直近の履歴数
+RPS_SELECTOR_OPTIONS = {}    # StrategySelector の引数 (pattern_max_length, score_decay, rnn_seq_length, rnn_hidden_size, prune_*)
+RPS_SAFETY_OPTIONS = {}      # SafetyMechanism の引数 (spam_window, spam_threshold, stop_loss_window, stop_loss_min_wins)
+
+# 短い履歴に対する決定的な予測をプレイヤー間で共有するキャッシュ (0 なら使わない)
+RPS_PREDICTION_CACHE_SIZE = 100000   # ワーカーあたりの最大件数 (LRU)
+RPS_PREDICTION_CACHE_TTL = 600       # 登録から捨てるまでの秒数
+
+# プレイヤーごとに ContextTreePredictor の木を保存し、次のリクエストでは新しいラウンドだけを取り込む
+# (0 なら使わず、毎リクエスト全履歴から作り直す)
+RPS_CONTEXT_TREE_CACHE_SIZE = 1000   # ワーカーあたりの最大プレイヤー数 (LRU)
+RPS_CONTEXT_TREE_CACHE_TTL = 3600    # 保存から捨てるまでの秒数
+
+# WebSocket 対戦セッション (ws/play/)
+RPS_WS_IDLE_TIMEOUT = 300        # 無操作で切断するまでの秒数
+RPS_WS_MAX_CONNECTIONS = 200     # ワーカーあたりの同時接続数の上限
+RPS_WS_HISTORY_LIMIT = 1000      # 接続中にメモリへ保持する直近の履歴数
+
+# 学習済み RPSLSTM の重みファイル (None なら各予測器がランダム初期化のモデルを使う)
+RPS_RNN_WEIGHTS = None
+# 重みの共有方法: "mmap" (ファイルをメモリマップ) / "shm" (共有メモリ、--preload で fork する場合)
+RPS_RNN_WEIGHTS_SHARING = "mmap"
+# モデルレジストリのディレクトリ (publish_model / rollback_model で管理)。None なら使わない。
+# 有効な版が切り替わると、各ワーカーが再起動せずにリクエストの合間で読み込み直す
+RPS_MODEL_REGISTRY = None
+RPS_MODEL_REGISTRY_POLL_INTERVAL = 2.0   # 切り替わりを確認する間隔 (秒)
+# RNN の学習をリクエストから切り離し、学習スレッドで全プレイヤー分をまとめてミニバッチ学習する
+# (プレイヤーごとの出力層の追加学習は行わず、共有モデルを更新して公開する)
+RPS_RNN_BACKGROUND_TRAINING = False
+RPS_RNN_TRAINER_BATCH_SIZE = 64      # ミニバッチの最大サンプル数
+RPS_RNN_TRAINER_MAX_QUEUE = 10000    # 学習待ちサンプルの上限 (超えた分は捨てる)
+RPS_RNN_TRAINER_MAX_WAIT = 0.05      # ミニバッチを集めるために待つ最大時間 (秒)
+RPS_RNN_TRAINER_PUBLISH_EVERY = 50   # 何ステップごとに推論側へ重みを公開するか (公開ごとに RNN の予測のキャッシュが無効になる)
+
+# play_view のプロファイリング (レポートは RPS_PROFILE_DIR に書き出す)
+RPS_PROFILE_ENABLED = False          # True なら全リクエストを計測
+RPS_PROFILE_SAMPLE_RATE = 0.0        # 計測するリクエストの割合 (0.0 - 1.0)
+RPS_PROFILE_TOKEN = None             # X-RPS-Profile ヘッダーにこの値を付けたリクエストを計測
+RPS_PROFILE_TORCH = True             # RNN が動いたリクエストでは torch.profiler の内訳も残す
+RPS_PROFILE_DIR = BASE_DIR / 'profiles'
+
+# 序盤定跡ファイル (build_opening_book で作成)。None なら使わない
+RPS_OPENING_BOOK = None
+
+# 全プレイヤー共通の n-gram 索引ファイル (.npy、build_population_index で作成、なければ空で作る)。
+# 各ワーカーがメモリマップで共有し、ラウンドのコミットごとに加算する。None なら使わない
+RPS_POPULATION_INDEX = None
+RPS_POPULATION_ORDER = 6             # 数える手順の最大長 (索引ファイルがあればそちらに従う)
+
+# ラウンドの保存を専用のライタースレッド1本に集約し、複数リクエスト分をまとめてコミットする (SQLite 向け)
+RPS_SQLITE_SINGLE_WRITER = os.environ.get('RPS_SQLITE_SINGLE_WRITER', '') == '1'
+RPS_COMMIT_QUEUE_MAX_BATCH = 64      # 1トランザクションにまとめる最大ラウンド数
+RPS_COMMIT_QUEUE_MAX_WAIT = 0.002    # 後続のラウンドを待つ最大時間 (秒)
+RPS_COMMIT_QUEUE_TIMEOUT = 30        # リクエスト側がコミットを待つ最大時間 (秒)
+
+# play_view の流量制御。負荷に応じて 1: RNN の学習を省く → 2: RNN を使わない → 3: 軽い予測器だけ、と縮退する
+RPS_ADMISSION_ENABLED = True
+RPS_ADMISSION_INFLIGHT_LEVELS = (8, 16, 32)       # 各レベルに入る処理中リクエスト数 (ワーカーあたり)
+RPS_ADMISSION_LATENCY_LEVELS = (0.5, 1.0, 2.0)    # 各レベルに入るレイテンシの移動平均 (秒)
+RPS_ADMISSION_MAX_INFLIGHT = 64                   # これを超えたら 503 (Retry-After 付き) で断る
+RPS_ADMISSION_RETRY_AFTER = 1                     # Retry-After (秒)